@@ -3,6 +3,7 @@ import paho.mqtt.client as mqtt
 import ssl
 import json
 import os
+import sys
 import serial
 import time
 import logging
@@ -12,6 +13,10 @@ from threading import Thread, Event
 from database_sync_manager import DatabaseSyncManager
 from timestamp_utils import now_compact
 
+# Shared gateway modules live in Physical_Devices/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gateway_payload import encode_payload, msgpack_available
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
@@ -50,6 +55,8 @@ CONFIG = {
     'db_path': './data',
     'devices_db': 'devices.json',
     'heartbeat_interval': 30,  
+    # 'json', or 'msgpack' for compact binary payloads with epoch-ms timestamps
+    'payload_format': os.getenv('PAYLOAD_FORMAT', 'json'),
 }
 
 def crc32(data: bytes, poly=0x04C11DB7, init=0xFFFFFFFF, xor_out=0xFFFFFFFF) -> int:
@@ -127,6 +134,8 @@ class DatabaseManager:
 class VPSMQTTManager:
     def __init__(self, config, sync_manager=None):
         self.config = config
+        if not msgpack_available(config.get('payload_format')):
+            logger.warning(" msgpack not installed - publishing JSON payloads")
         self.sync_manager = sync_manager
         self.lora_handler = None
         self.vps_client = None
@@ -238,8 +247,7 @@ class VPSMQTTManager:
             return False
         
         try:
-            payload_str = json.dumps(payload) if isinstance(payload, dict) else str(payload)
-            result = self.vps_client.publish(topic, payload_str, qos=1)
+            result = self.vps_client.publish(topic, encode_payload(payload, self.config.get('payload_format')), qos=1)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
                 logger.debug(f" Published to VPS: {topic}")
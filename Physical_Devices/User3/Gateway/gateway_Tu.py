@@ -2,6 +2,7 @@ import paho.mqtt.client as mqtt
 import ssl
 import json
 import os
+import sys
 import time
 import logging
 from datetime import datetime
@@ -9,6 +10,10 @@ from threading import Thread, Event
 from database_sync_manager import DatabaseSyncManager
 from timestamp_utils import now_compact
 
+# Shared gateway modules live in Physical_Devices/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from gateway_payload import encode_payload, msgpack_available
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
@@ -60,6 +65,8 @@ CONFIG = {
     'logs_db': 'logs.json',
     'settings_db': 'settings.json',
     'heartbeat_interval': 30,  # Changed from 300 to 30 seconds
+    # 'json', or 'msgpack' for compact binary payloads with epoch-ms timestamps
+    'payload_format': os.getenv('PAYLOAD_FORMAT', 'json'),
     
     'automation': {
         'temp_threshold': 30.0,
@@ -138,6 +145,8 @@ class DatabaseManager:
 class MQTTManager:
     def __init__(self, config, db_manager, sync_manager=None):
         self.config = config
+        if not msgpack_available(config.get('payload_format')):
+            logger.warning(" msgpack not installed - publishing JSON payloads")
         self.db_manager = db_manager
         self.sync_manager = sync_manager
         self.local_client = None
@@ -439,8 +448,7 @@ class MQTTManager:
             return False
         
         try:
-            payload_str = json.dumps(payload) if isinstance(payload, dict) else str(payload)
-            result = self.vps_client.publish(topic, payload_str, qos=1)
+            result = self.vps_client.publish(topic, encode_payload(payload, self.config.get('payload_format')), qos=1)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
                 logger.debug(f" Published to VPS: {topic}")
@@ -0,0 +1,44 @@
+"""
+Payload encoding shared by the gateways (User*/Gateway/gateway_*.py).
+
+'json' (default) publishes JSON text. 'msgpack' publishes compact MessagePack
+with ISO timestamps as epoch milliseconds; the server sniffs the format and
+converts them back. Without msgpack installed, JSON is published instead.
+"""
+import json
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:  # Only needed for payload_format='msgpack'
+    msgpack = None
+
+TIMESTAMP_KEYS = ('timestamp', 'time')
+
+def to_epoch_ms(timestamp_str):
+    """ISO timestamp -> epoch milliseconds, None if unparseable"""
+    try:
+        parsed = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return int(parsed.timestamp() * 1000)
+
+def msgpack_available(payload_format):
+    """False when msgpack was asked for but isn't installed"""
+    return payload_format != 'msgpack' or msgpack is not None
+
+def encode_payload(payload, payload_format='json'):
+    """Encode a payload for publishing in the configured format"""
+    if not isinstance(payload, dict):
+        return str(payload)
+
+    if payload_format == 'msgpack' and msgpack:
+        compact = dict(payload)
+        for key in TIMESTAMP_KEYS:
+            if isinstance(compact.get(key), str):
+                epoch_ms = to_epoch_ms(compact[key])
+                if epoch_ms is not None:
+                    compact[key] = epoch_ms
+        return msgpack.packb(compact, use_bin_type=True)
+
+    return json.dumps(payload)
@@ -0,0 +1,155 @@
+"""
+Disk size and dashboard query latency with hypertable chunks in row format vs compressed.
+
+Chunks older than --older-than are first decompressed (the row-format baseline),
+measured, then compressed and measured again, so repeated runs compare the same
+data. They are left compressed, as the compression policies would. Seed enough
+history first (e.g. a fleet_simulator run or a restored backup), otherwise every
+chunk is still too recent to compress.
+
+Usage (from Server_Python/api):
+    python -m benchmarks.compression --user-id 00003 --older-than "1 day" --iterations 20
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from psycopg2.extras import RealDictCursor
+from services.database import db
+from services.telemetry_rollups import series_query
+
+HYPERTABLES = ('telemetry', 'access_logs', 'system_logs', 'command_logs')
+
+def dashboard_queries(user_id, device_id):
+    """(label, SQL, params) for the raw-table reads behind the dashboard and history pages"""
+    now = datetime.now(timezone.utc)
+    yield ('latest readings (1h)',
+           """SELECT DISTINCT ON (device_id) device_id, temperature, humidity, time
+              FROM telemetry WHERE user_id = %s AND time > NOW() - INTERVAL '1 hour'
+              ORDER BY device_id, time DESC""",
+           (user_id,))
+    yield ('telemetry page (7d)',
+           """SELECT * FROM telemetry WHERE user_id = %s AND device_id = %s AND time >= %s
+              ORDER BY time DESC LIMIT 100""",
+           (user_id, device_id, now - timedelta(days=7)))
+    query, params, _ = series_query(30, device_id, user_id=user_id, start=now - timedelta(hours=12))
+    yield ('raw chart (12h @ 30s)', query, params)
+    yield ('device range scan (7d)',
+           """SELECT COUNT(*), AVG(temperature), AVG(humidity) FROM telemetry
+              WHERE device_id = %s AND time >= %s""",
+           (device_id, now - timedelta(days=7)))
+    yield ('recent activities (24h)',
+           """SELECT time, device_id, method, result, rfid_uid, password_id, deny_reason
+              FROM access_logs WHERE user_id = %s AND time > NOW() - INTERVAL '24 hours'
+              ORDER BY time DESC LIMIT 100""",
+           (user_id,))
+    yield ('access history (90d)',
+           """SELECT device_id, result, COUNT(*) FROM access_logs
+              WHERE user_id = %s AND time > NOW() - INTERVAL '90 days'
+              GROUP BY device_id, result""",
+           (user_id,))
+    yield ('recent alerts',
+           """SELECT time, gateway_id, device_id, event, severity, message, value, threshold
+              FROM system_logs WHERE user_id = %s AND log_type = 'alert'
+              ORDER BY time DESC LIMIT 50""",
+           (user_id,))
+
+def table_sizes(cursor):
+    sizes = {}
+    for table in HYPERTABLES:
+        cursor.execute('SELECT hypertable_size(%s) AS size', (table,))
+        sizes[table] = cursor.fetchone()['size'] or 0
+    return sizes
+
+def set_compression(cursor, older_than, compress):
+    """Compress or decompress every chunk older than older_than; returns chunks changed"""
+    function = 'compress_chunk' if compress else 'decompress_chunk'
+    flag = 'if_not_compressed' if compress else 'if_compressed'
+    changed = 0
+    for table in HYPERTABLES:
+        cursor.execute(
+            f'SELECT {function}(chunk, {flag} => TRUE) AS chunk '
+            f'FROM show_chunks(%s, older_than => %s::interval) AS chunk',
+            (table, older_than)
+        )
+        changed += sum(1 for row in cursor.fetchall() if row['chunk'])
+        cursor.execute(f'ANALYZE {table}')
+    return changed
+
+def time_queries(cursor, queries, iterations):
+    results = {}
+    for label, sql, params in queries:
+        for _ in range(2):
+            cursor.execute(sql, params)
+            cursor.fetchall()
+
+        latencies = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            latencies.append(time.perf_counter() - started)
+
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        results[label] = (statistics.median(latencies) * 1000, p95 * 1000)
+    return results
+
+def format_size(size):
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+
+def main():
+    parser = argparse.ArgumentParser(description='Hypertable compression benchmark')
+    parser.add_argument('--user-id', default='00003', help='User whose dashboard queries are timed')
+    parser.add_argument('--older-than', default='2 days', help='Chunks in scope (the telemetry policy uses 2 days)')
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    db.connect(minconn=1, maxconn=1)
+    conn = db.get_connection()
+    conn.autocommit = True
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute('SELECT device_id FROM telemetry WHERE user_id = %s LIMIT 1', (args.user_id,))
+        row = cursor.fetchone()
+        if not row:
+            print(f'No telemetry for user {args.user_id}')
+            return
+        queries = list(dashboard_queries(args.user_id, row['device_id']))
+
+        print(f'Decompressing chunks older than {args.older_than}...')
+        set_compression(cursor, args.older_than, compress=False)
+        row_sizes = table_sizes(cursor)
+        row_latency = time_queries(cursor, queries, args.iterations)
+
+        print('Compressing...')
+        started = time.perf_counter()
+        chunks = set_compression(cursor, args.older_than, compress=True)
+        print(f'Compressed {chunks} chunks in {time.perf_counter() - started:.1f}s')
+        compressed_sizes = table_sizes(cursor)
+        compressed_latency = time_queries(cursor, queries, args.iterations)
+
+        print(f'\n{"table":14} {"rows":>10} {"compressed":>11} {"ratio":>7}')
+        for table in HYPERTABLES + ('total',):
+            if table == 'total':
+                before, after = sum(row_sizes.values()), sum(compressed_sizes.values())
+            else:
+                before, after = row_sizes[table], compressed_sizes[table]
+            ratio = f'{before / after:6.1f}x' if after else '      -'
+            print(f'{table:14} {format_size(before):>10} {format_size(after):>11} {ratio}')
+
+        print(f'\n{"query":26} {"rows p50":>9} {"rows p95":>9} {"comp p50":>9} {"comp p95":>9}  (ms)')
+        for label, _, _ in queries:
+            (row_p50, row_p95), (comp_p50, comp_p95) = row_latency[label], compressed_latency[label]
+            print(f'{label:26} {row_p50:9.2f} {row_p95:9.2f} {comp_p50:9.2f} {comp_p95:9.2f}')
+    finally:
+        cursor.close()
+        conn.autocommit = False
+        db.put_connection(conn)
+        db.close()
+
+if __name__ == '__main__':
+    main()
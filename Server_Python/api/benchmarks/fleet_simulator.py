@@ -0,0 +1,374 @@
+"""
+Synthetic gateway fleet for load testing the VPS ingest path.
+
+Simulates N gateways against a broker using the payload shapes of the real
+gateways:
+- rfid (gateway_Anh.py): RFID access events and gate status
+- passkey (gateway_Thao.py): keypad access events and lock status
+- climate (gateway_Tu.py): temperature/humidity telemetry and sensor status
+
+Gateway i gets profile i % 3. Every gateway also sends heartbeats on
+gateway/<id>/status/gateway. Timestamps keep microseconds (the real gateways
+send whole seconds), so latency can be measured from the payload.
+
+The server drops messages from unknown devices, so run --provision once first.
+It creates a 'sim' user with SimGW#### gateways and devices in Postgres.
+--cleanup removes them again.
+
+Usage (from Server_Python/api):
+    python -m benchmarks.fleet_simulator --provision --gateways 200
+    python -m benchmarks.fleet_simulator --gateways 200 --telemetry-interval 5 --duration 60
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+import paho.mqtt.client as mqtt
+
+SIM_USER_ID = 'sim00'
+PROFILES = ('rfid', 'passkey', 'climate')
+
+# profile -> [(device suffix, device_type, communication)]
+PROFILE_DEVICES = {
+    'rfid': [('rfid_gate_01', 'rfid_gate', 'LoRa')],
+    'passkey': [('passkey_01', 'passkey', 'Wifi')],
+    'climate': [('temp_01', 'temperature sensor', 'Wifi'), ('fan_01', 'fan controller', 'Wifi')]
+}
+
+def gateway_id(index):
+    return f'SimGW{index:04d}'
+
+def device_id(index, suffix):
+    return f'sim{index:04d}_{suffix}'
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+class SimulatedGateway:
+    def __init__(self, index, started_at):
+        self.index = index
+        self.gateway_id = gateway_id(index)
+        self.profile = PROFILES[index % len(PROFILES)]
+        self.devices = [device_id(index, suffix) for suffix, _, _ in PROFILE_DEVICES[self.profile]]
+        self.started_at = started_at
+        self.sequence = itertools.count(1)
+
+    def heartbeat(self):
+        """Same shape as publish_gateway_status()"""
+        return f'gateway/{self.gateway_id}/status/gateway', {
+            'gateway_id': self.gateway_id,
+            'status': 'online',
+            'timestamp': now_iso(),
+            'uptime': time.time() - self.started_at,
+            'local_connected': True,
+            'vps_connected': True,
+            'reconnect_count': 0
+        }
+
+    def telemetry(self):
+        """Only the climate profile has a sensor; shape of forward_telemetry_to_vps()"""
+        if self.profile != 'climate':
+            return None
+        sensor = self.devices[0]
+        return f'gateway/{self.gateway_id}/telemetry/{sensor}', {
+            'gateway_id': self.gateway_id,
+            'device_id': sensor,
+            'timestamp': now_iso(),
+            'data': {
+                'device_id': sensor,
+                'data': {
+                    'temperature': round(random.uniform(24.0, 34.0), 1),
+                    'humidity': round(random.uniform(50.0, 85.0), 1)
+                }
+            }
+        }
+
+    def access(self):
+        """RFID (gateway_Anh.py) or keypad (gateway_Thao.py) access log"""
+        granted = random.random() < 0.8
+        device = self.devices[0]
+
+        if self.profile == 'rfid':
+            payload = {
+                'gateway_id': self.gateway_id,
+                'device_id': device,
+                'rfid_uid': f'{random.getrandbits(32):08x}',
+                'result': 'granted' if granted else 'denied',
+                'method': 'rfid',
+                'deny_reason': None if granted else 'unknown_card',
+                'timestamp': now_iso()
+            }
+        elif self.profile == 'passkey':
+            payload = {
+                'gateway_id': self.gateway_id,
+                'device_id': device,
+                'password_id': 'sim_password' if granted else None,
+                'result': 'granted' if granted else 'denied',
+                'method': 'passkey',
+                'deny_reason': None if granted else 'invalid_password',
+                'timestamp': now_iso()
+            }
+        else:
+            return None
+
+        return f'gateway/{self.gateway_id}/access/{device}', payload
+
+    def device_status(self):
+        """Status of one device, shape of forward_status_to_vps() / publish_gate_status()"""
+        device = random.choice(self.devices)
+        if self.profile == 'rfid':
+            payload = {
+                'gateway_id': self.gateway_id,
+                'device_id': device,
+                'status': 'locked',
+                'sequence': next(self.sequence),
+                'timestamp': now_iso()
+            }
+        else:
+            state = 'online' if self.profile == 'climate' else 'locked'
+            payload = {
+                'gateway_id': self.gateway_id,
+                'device_id': device,
+                'status': state,
+                'timestamp': now_iso(),
+                'metadata': {'device_id': device, 'state': state}
+            }
+        return f'gateway/{self.gateway_id}/status/{device}', payload
+
+class FleetSimulator:
+    def __init__(self, gateways, host='localhost', port=1883, connections=20, qos=1,
+                 heartbeat_interval=30, telemetry_interval=10, access_per_minute=1,
+                 status_interval=30, username=None, password=None):
+        """
+        Args:
+            gateways: Number of simulated gateways
+            connections: MQTT connections shared by the fleet (one per gateway doesn't scale
+                on a single load-generator host)
+            heartbeat_interval: Seconds between gateway heartbeats (real gateways: 30)
+            telemetry_interval: Seconds between readings per climate gateway (0 disables)
+            access_per_minute: Access events per rfid/passkey gateway (0 disables)
+            status_interval: Seconds between device status messages per gateway (0 disables)
+        """
+        self.host = host
+        self.port = port
+        self.qos = qos
+        self.username = username
+        self.password = password
+        self.connection_count = max(1, min(connections, gateways))
+        self.started_at = time.time()
+        self.gateways = [SimulatedGateway(index, self.started_at) for index in range(gateways)]
+
+        # kind -> seconds between events per gateway
+        self.intervals = {
+            'heartbeat': heartbeat_interval,
+            'telemetry': telemetry_interval,
+            'access': 60.0 / access_per_minute if access_per_minute else 0,
+            'device_status': status_interval
+        }
+
+        self.clients = []
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.sent = {kind: 0 for kind in self.intervals}
+        self.errors = 0
+
+    def expected_rate(self):
+        """Messages per second the configured fleet should produce"""
+        rate = 0.0
+        for gateway in self.gateways:
+            for kind, interval in self.intervals.items():
+                if not interval:
+                    continue
+                if kind == 'telemetry' and gateway.profile != 'climate':
+                    continue
+                if kind == 'access' and gateway.profile == 'climate':
+                    continue
+                rate += 1.0 / interval
+        return rate
+
+    def connect(self):
+        for index in range(self.connection_count):
+            client = mqtt.Client(client_id=f'fleet_sim_{int(self.started_at)}_{index}')
+            if self.username:
+                client.username_pw_set(self.username, self.password)
+            client.max_inflight_messages_set(1000)
+            client.max_queued_messages_set(0)
+            client.connect(self.host, self.port, keepalive=60)
+            client.loop_start()
+            self.clients.append(client)
+
+    def disconnect(self):
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+        self.clients = []
+
+    def run(self, duration):
+        """Publish until duration elapses or stop() is called; returns totals per kind"""
+        self.connect()
+        try:
+            self._schedule_loop(duration)
+        finally:
+            # Let in-flight QoS 1 publishes complete before closing
+            time.sleep(1)
+            self.disconnect()
+        return dict(self.sent)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _schedule_loop(self, duration):
+        # Min-heap of (due, tiebreak, gateway, kind); starts are jittered over one interval
+        start = time.monotonic()
+        deadline = start + duration
+        tiebreak = itertools.count()
+        heap = []
+        for gateway in self.gateways:
+            for kind, interval in self.intervals.items():
+                if interval:
+                    heapq.heappush(heap, (start + random.uniform(0, interval), next(tiebreak), gateway, kind))
+
+        while heap and not self.stop_event.is_set():
+            due, _, gateway, kind = heap[0]
+            if due >= deadline:
+                break
+
+            delay = due - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(min(delay, 0.5))
+                continue
+
+            heapq.heappop(heap)
+            self._publish(gateway, kind)
+            heapq.heappush(heap, (due + self.intervals[kind], next(tiebreak), gateway, kind))
+
+    def _publish(self, gateway, kind):
+        message = getattr(gateway, kind)()
+        if message is None:
+            return
+
+        topic, payload = message
+        client = self.clients[gateway.index % len(self.clients)]
+        result = client.publish(topic, json.dumps(payload), qos=self.qos)
+
+        with self.lock:
+            if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                self.sent[kind] += 1
+            else:
+                self.errors += 1
+
+def provision(gateways, user_id=SIM_USER_ID):
+    """Create the simulation user, gateways and devices (idempotent)"""
+    from services.database import db
+
+    db.connect()
+    try:
+        db.query(
+            """
+                INSERT INTO users (user_id, username, email, password_hash, full_name, role, active, created_at, updated_at)
+                VALUES (%s, 'sim', 'sim@bench.local', '!', 'Fleet Simulator', 'owner', TRUE, NOW(), NOW())
+                ON CONFLICT (user_id) DO NOTHING
+            """,
+            (user_id,)
+        )
+
+        gateway_rows = [(gateway_id(i), user_id, f'Simulated {PROFILES[i % 3]} gateway') for i in range(gateways)]
+        db.execute_values(
+            """
+                INSERT INTO gateways (gateway_id, user_id, name, status, created_at, updated_at)
+                VALUES %s
+                ON CONFLICT (gateway_id) DO NOTHING
+            """,
+            gateway_rows, template="(%s, %s, %s, 'offline', NOW(), NOW())"
+        )
+
+        device_rows = [
+            (device_id(i, suffix), gateway_id(i), user_id, device_type, 'Simulated', communication)
+            for i in range(gateways)
+            for suffix, device_type, communication in PROFILE_DEVICES[PROFILES[i % 3]]
+        ]
+        db.execute_values(
+            """
+                INSERT INTO devices (device_id, gateway_id, user_id, device_type, location, communication, status, created_at, updated_at)
+                VALUES %s
+                ON CONFLICT (device_id) DO NOTHING
+            """,
+            device_rows, template="(%s, %s, %s, %s, %s, %s, 'offline', NOW(), NOW())"
+        )
+        print(f'Provisioned {len(gateway_rows)} gateways and {len(device_rows)} devices for user {user_id}')
+    finally:
+        db.close()
+
+def cleanup(user_id=SIM_USER_ID):
+    """Remove the simulation user; gateways and devices cascade"""
+    from services.database import db
+
+    db.connect()
+    try:
+        for table in ('telemetry', 'access_logs', 'system_logs'):
+            db.query(f'DELETE FROM {table} WHERE user_id = %s', (user_id,))
+        db.query('DELETE FROM users WHERE user_id = %s', (user_id,))
+        print(f'Removed simulation user {user_id} and its data')
+    finally:
+        db.close()
+
+def add_fleet_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--gateways', type=int, default=100)
+    parser.add_argument('--connections', type=int, default=20, help='MQTT connections shared by the fleet')
+    parser.add_argument('--qos', type=int, default=1)
+    parser.add_argument('--heartbeat-interval', type=float, default=30)
+    parser.add_argument('--telemetry-interval', type=float, default=10, help='0 disables telemetry')
+    parser.add_argument('--access-per-minute', type=float, default=1, help='0 disables access events')
+    parser.add_argument('--status-interval', type=float, default=30, help='0 disables device status')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to run')
+
+def simulator_from_args(args):
+    return FleetSimulator(
+        args.gateways, host=args.host, port=args.port, connections=args.connections, qos=args.qos,
+        heartbeat_interval=args.heartbeat_interval, telemetry_interval=args.telemetry_interval,
+        access_per_minute=args.access_per_minute, status_interval=args.status_interval,
+        username=args.username, password=args.password
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a fleet of gateways')
+    add_fleet_arguments(parser)
+    parser.add_argument('--provision', action='store_true', help='Create simulated gateways/devices and exit')
+    parser.add_argument('--cleanup', action='store_true', help='Remove simulated gateways/devices and exit')
+    args = parser.parse_args()
+
+    if args.provision:
+        provision(args.gateways)
+        return
+    if args.cleanup:
+        cleanup()
+        return
+
+    simulator = simulator_from_args(args)
+    print(f'Simulating {args.gateways} gateways over {simulator.connection_count} connections, '
+          f'~{simulator.expected_rate():.0f} msgs/s for {args.duration:.0f}s')
+
+    started = time.monotonic()
+    try:
+        sent = simulator.run(args.duration)
+    except KeyboardInterrupt:
+        simulator.stop()
+        sent = dict(simulator.sent)
+    elapsed = time.monotonic() - started
+
+    total = sum(sent.values())
+    print(f'Sent {total} messages in {elapsed:.1f}s ({total / elapsed:.0f} msgs/s), '
+          f'{simulator.errors} publish errors')
+    for kind, count in sent.items():
+        print(f'  {kind:14} {count}')
+
+if __name__ == '__main__':
+    main()
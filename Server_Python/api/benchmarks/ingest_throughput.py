@@ -0,0 +1,215 @@
+"""
+End-to-end ingest benchmark: fleet simulator -> mosquitto -> API -> Postgres/WebSocket.
+
+Runs the fleet simulator against a running API and reports:
+- sustained msgs/s: published, and received by the API (from /metrics)
+- p50/p99 gateway-timestamp -> commit latency (iot_ingest_commit_lag_seconds delta)
+- p50/p99 gateway-timestamp -> WebSocket delivery latency (a client subscribed as the sim user)
+
+The API, broker and benchmark should share a clock (same host), since latencies
+are measured against the timestamps inside the payloads. Metrics are read from
+the API, so this measures INGEST_MODE=embedded; with ingest workers the rows and
+lag live on the workers' metrics ports.
+
+Usage (from Server_Python/api, API on :3000, broker on :1883):
+    python -m benchmarks.fleet_simulator --provision --gateways 500
+    python -m benchmarks.ingest_throughput --gateways 500 --telemetry-interval 2 --duration 60
+"""
+import argparse
+import json
+import re
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import jwt
+import requests
+from websockets.sync.client import connect as ws_connect
+from config.settings import settings
+from benchmarks.fleet_simulator import SIM_USER_ID, add_fleet_arguments, simulator_from_args
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$')
+
+def scrape(api_url):
+    """Parse /metrics into {(name, labels): value}"""
+    response = requests.get(f'{api_url}/metrics', timeout=10)
+    response.raise_for_status()
+
+    samples = {}
+    for line in response.text.splitlines():
+        match = SAMPLE_RE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, labels or '')] = float(value)
+    return samples
+
+def delta(before, after, name, label_filter=''):
+    """Sum of after - before over samples of `name` whose labels contain label_filter"""
+    return sum(
+        value - before.get(key, 0.0)
+        for key, value in after.items()
+        if key[0] == name and label_filter in key[1]
+    )
+
+def histogram_quantile(before, after, name, quantile, label_filter=''):
+    """Quantile of the observations made between two scrapes (linear within a bucket)"""
+    buckets = {}
+    for (sample_name, labels), value in after.items():
+        if sample_name != f'{name}_bucket' or label_filter not in labels:
+            continue
+        bound = re.search(r'[{,]le="([^"]+)"', labels).group(1)
+        bound = float('inf') if bound == '+Inf' else float(bound)
+        buckets[bound] = buckets.get(bound, 0.0) + value - before.get((sample_name, labels), 0.0)
+
+    if not buckets:
+        return None
+
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]]
+    if total <= 0:
+        return None
+
+    rank = quantile * total
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float('inf'):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return previous_bound
+
+class WebSocketProbe:
+    """Collects gateway-timestamp -> delivery latency for the simulated user's events"""
+
+    def __init__(self, api_url):
+        self.url = api_url.replace('http', 'ws', 1) + '/ws?token=' + self._token()
+        self.latencies = []
+        self.messages = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.error = None
+
+    def _token(self):
+        return jwt.encode(
+            {
+                'user_id': SIM_USER_ID,
+                'username': 'sim',
+                'role': 'owner',
+                'exp': datetime.utcnow() + timedelta(hours=1)
+            },
+            settings.JWT_SECRET,
+            algorithm=settings.JWT_ALGORITHM
+        )
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='ws-probe', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        try:
+            with ws_connect(self.url, open_timeout=10) as websocket:
+                while not self.stop_event.is_set():
+                    try:
+                        raw = websocket.recv(timeout=0.5)
+                    except TimeoutError:
+                        continue
+                    self._record(json.loads(raw))
+        except Exception as e:
+            self.error = e
+
+    def _record(self, message):
+        timestamp = (message.get('data') or {}).get('timestamp')
+        if not isinstance(timestamp, str):
+            return
+        try:
+            sent = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        except ValueError:
+            return
+        if sent.tzinfo is None:
+            sent = sent.astimezone()
+
+        self.messages += 1
+        self.latencies.append((datetime.now(timezone.utc) - sent).total_seconds())
+
+def percentile(values, quantile):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * quantile))]
+
+def format_ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.1f} ms'
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end ingest throughput benchmark')
+    add_fleet_arguments(parser)
+    parser.add_argument('--api-url', default=f'http://localhost:{settings.API_PORT}')
+    parser.add_argument('--drain-timeout', type=float, default=15,
+                        help='Seconds to wait for the API to catch up after publishing stops')
+    parser.add_argument('--no-ws', action='store_true', help='Skip the WebSocket latency probe')
+    args = parser.parse_args()
+
+    simulator = simulator_from_args(args)
+    probe = None if args.no_ws else WebSocketProbe(args.api_url)
+    if probe:
+        probe.start()
+        time.sleep(1)
+
+    print(f'Fleet: {args.gateways} gateways, ~{simulator.expected_rate():.0f} msgs/s target, '
+          f'{args.duration:.0f}s')
+
+    before = scrape(args.api_url)
+    started = time.monotonic()
+    sent = sum(simulator.run(args.duration).values())
+    publish_elapsed = time.monotonic() - started
+
+    # Wait until the API has received everything (or stops making progress)
+    deadline = time.monotonic() + args.drain_timeout
+    after = scrape(args.api_url)
+    while time.monotonic() < deadline:
+        received = delta(before, after, 'iot_mqtt_messages_total', 'gateway="SimGW')
+        if received >= sent and after.get(('iot_ingest_queue_depth', ''), 0) == 0:
+            break
+        time.sleep(1)
+        after = scrape(args.api_url)
+    total_elapsed = time.monotonic() - started
+
+    if probe:
+        probe.stop()
+
+    received = delta(before, after, 'iot_mqtt_messages_total', 'gateway="SimGW')
+    rows_written = delta(before, after, 'iot_ingest_rows_total', 'result="written"')
+    rows_spooled = delta(before, after, 'iot_ingest_rows_total', 'result="spooled"')
+    decode_errors = delta(before, after, 'iot_mqtt_decode_errors_total')
+    ws_dropped = after.get(('iot_ws_dropped_total', ''), 0) - before.get(('iot_ws_dropped_total', ''), 0)
+
+    print()
+    print(f'Published      {sent} msgs in {publish_elapsed:.1f}s ({sent / publish_elapsed:.0f} msgs/s)')
+    print(f'Received       {received:.0f} msgs ({received / total_elapsed:.0f} msgs/s sustained, '
+          f'{sent - received:.0f} missing)')
+    print(f'Rows written   {rows_written:.0f} ({rows_spooled:.0f} spooled), {decode_errors:.0f} decode errors')
+
+    for table in ('telemetry', 'access_logs'):
+        label = f'table="{table}"'
+        p50 = histogram_quantile(before, after, 'iot_ingest_commit_lag_seconds', 0.5, label)
+        p99 = histogram_quantile(before, after, 'iot_ingest_commit_lag_seconds', 0.99, label)
+        print(f'Commit lag     {table:12} p50 {format_ms(p50)}  p99 {format_ms(p99)}')
+
+    if probe:
+        if probe.error:
+            print(f'WebSocket      probe failed: {probe.error}')
+        elif probe.latencies:
+            print(f'WebSocket      {probe.messages} events, p50 {format_ms(statistics.median(probe.latencies))}  '
+                  f'p99 {format_ms(percentile(probe.latencies, 0.99))}, {ws_dropped:.0f} dropped by the bridge')
+        else:
+            print('WebSocket      no events received')
+
+if __name__ == '__main__':
+    main()
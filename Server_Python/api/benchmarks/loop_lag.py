@@ -0,0 +1,84 @@
+"""
+Event-loop lag under concurrent dashboard load.
+
+Runs --concurrency clients hammering a DB-heavy endpoint and reports request
+latency together with the API's event-loop lag (iot_event_loop_lag_seconds delta).
+Run it before and after a change to the database access path: with queries on
+the loop the lag tracks query time, while with the executor it should stay
+near zero.
+
+Usage (from Server_Python/api, API on :3000):
+    python -m benchmarks.loop_lag --user-id 00003 --endpoint /api/dashboard/stats --duration 30
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+import jwt
+import requests
+from config.settings import settings
+from benchmarks.ingest_throughput import scrape, histogram_quantile, percentile, format_ms
+
+def make_token(user_id):
+    return jwt.encode(
+        {'user_id': user_id, 'username': 'bench', 'role': 'owner', 'exp': datetime.utcnow() + timedelta(hours=1)},
+        settings.JWT_SECRET,
+        algorithm=settings.JWT_ALGORITHM
+    )
+
+def client_loop(url, headers, deadline, latencies, errors, lock):
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=30)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure event-loop lag under dashboard load')
+    parser.add_argument('--api-url', default=f'http://localhost:{settings.API_PORT}')
+    parser.add_argument('--user-id', default='00003', help='User whose dashboard is queried')
+    parser.add_argument('--endpoint', default='/api/dashboard/stats')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30)
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Bearer {make_token(args.user_id)}'}
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    before = scrape(args.api_url)
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=client_loop,
+                         args=(args.api_url + args.endpoint, headers, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = scrape(args.api_url)
+
+    print(f'{args.endpoint} x{args.concurrency} for {args.duration:.0f}s')
+    if latencies:
+        print(f'Requests   {len(latencies)} ok ({len(latencies) / args.duration:.0f} req/s), {errors[0]} errors, '
+              f'p50 {format_ms(statistics.median(latencies))}  p99 {format_ms(percentile(latencies, 0.99))}')
+    else:
+        print(f'Requests   none succeeded, {errors[0]} errors')
+
+    p50 = histogram_quantile(before, after, 'iot_event_loop_lag_seconds', 0.5)
+    p99 = histogram_quantile(before, after, 'iot_event_loop_lag_seconds', 0.99)
+    print(f'Loop lag   p50 {format_ms(p50)}  p99 {format_ms(p99)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Compare the paho (network thread) and asyncio (aiomqtt) ingest engines.
+
+A publisher streams telemetry at a fixed rate to a local mosquitto. Each engine
+consumes it through the real MQTTService.process_message decode/validate/route
+path. Only the final handler is replaced with a recorder, so the numbers measure
+transport + dispatch and not Postgres.
+
+Usage (from Server_Python/api, broker on localhost:1883):
+    python -m benchmarks.mqtt_engines --rates 1000,10000 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+import paho.mqtt.client as mqtt
+from services.mqtt_service import MQTTService
+
+TOPIC = 'gateway/BenchGateway/telemetry/bench_temp_01'
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+
+    def record(self, data):
+        latency = time.time() - data['sent_at']
+        with self.lock:
+            self.latencies.append(latency)
+
+    def count(self):
+        with self.lock:
+            return len(self.latencies)
+
+def make_engine(base, recorder):
+    """Subclass an engine so telemetry ends at the recorder instead of the database"""
+    class BenchEngine(base):
+        def handle_telemetry(self, gateway_id, device_id, data):
+            recorder.record(data)
+    return BenchEngine
+
+def publish_at_rate(host, port, rate, duration, qos):
+    """Publish gateway-shaped telemetry at `rate` msgs/s for `duration` seconds"""
+    client = mqtt.Client(client_id=f'bench_publisher_{int(time.time())}')
+    client.max_queued_messages_set(0)
+    client.max_inflight_messages_set(1000)
+    client.connect(host, port)
+    client.loop_start()
+
+    slice_seconds = 0.01
+    per_slice = max(1, int(rate * slice_seconds))
+    sent = 0
+    started = time.perf_counter()
+    next_slice = started
+
+    while time.perf_counter() - started < duration:
+        for _ in range(per_slice):
+            payload = {
+                'gateway_id': 'BenchGateway',
+                'device_id': 'bench_temp_01',
+                'timestamp': datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+                'sent_at': time.time(),
+                'data': {'data': {'temperature': 25.0, 'humidity': 60.0}}
+            }
+            client.publish(TOPIC, json.dumps(payload), qos=qos)
+            sent += 1
+
+        next_slice += slice_seconds
+        delay = next_slice - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    elapsed = time.perf_counter() - started
+    client.loop_stop()
+    client.disconnect()
+    return sent, elapsed
+
+def wait_for_drain(recorder, sent, timeout=10):
+    deadline = time.time() + timeout
+    while recorder.count() < sent and time.time() < deadline:
+        time.sleep(0.1)
+
+def summarize(engine, rate, sent, elapsed, recorder):
+    latencies = sorted(recorder.latencies)
+    received = len(latencies)
+    if not latencies:
+        print(f'{engine:8} {rate:>7} {sent:>8} {0:>8} {"-":>10} {"-":>9} {"-":>9}')
+        return
+
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(received - 1, int(received * 0.99))] * 1000
+    print(f'{engine:8} {rate:>7} {sent:>8} {received:>8} {received / elapsed:>10.0f} '
+          f'{p50:>9.2f} {p99:>9.2f}')
+
+def run_paho(args, rate):
+    recorder = Recorder()
+    engine = make_engine(MQTTService, recorder)({
+        'host': args.host, 'port': args.port, 'client_id': 'bench_paho_engine'
+    })
+    engine.connect()
+    time.sleep(1)
+
+    sent, elapsed = publish_at_rate(args.host, args.port, rate, args.duration, args.qos)
+    wait_for_drain(recorder, sent)
+    engine.disconnect()
+    summarize('paho', rate, sent, elapsed, recorder)
+
+def run_asyncio(args, rate):
+    from services.mqtt_async_service import AsyncMQTTService
+    recorder = Recorder()
+
+    async def main():
+        engine = make_engine(AsyncMQTTService, recorder)({
+            'host': args.host, 'port': args.port, 'client_id': 'bench_asyncio_engine'
+        }, max_concurrency=args.concurrency)
+        await engine.start()
+        await asyncio.sleep(1)
+
+        sent, elapsed = await asyncio.to_thread(
+            publish_at_rate, args.host, args.port, rate, args.duration, args.qos
+        )
+        await asyncio.to_thread(wait_for_drain, recorder, sent)
+        await engine.stop()
+        return sent, elapsed
+
+    sent, elapsed = asyncio.run(main())
+    summarize('asyncio', rate, sent, elapsed, recorder)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MQTT ingest engines')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--rates', default='1000,10000', help='Comma-separated msgs/s')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+    parser.add_argument('--qos', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=8, help='asyncio engine max_concurrency')
+    parser.add_argument('--engines', default='paho,asyncio')
+    args = parser.parse_args()
+
+    print(f'{"engine":8} {"rate":>7} {"sent":>8} {"received":>8} {"msgs/s":>10} '
+          f'{"p50 ms":>9} {"p99 ms":>9}')
+
+    for rate in [int(r) for r in args.rates.split(',')]:
+        for engine in args.engines.split(','):
+            if engine == 'paho':
+                run_paho(args, rate)
+            elif engine == 'asyncio':
+                run_asyncio(args, rate)
+
+if __name__ == '__main__':
+    main()
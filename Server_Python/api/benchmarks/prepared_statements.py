@@ -0,0 +1,113 @@
+"""
+Per-statement latency: client-side interpolation vs the prepared statement registry.
+
+Each hot statement runs --iterations times both ways on one connection; writes are
+rolled back after every call (outside the timed section), so the database is left
+unchanged. Needs at least one device in the database.
+
+Usage (from Server_Python/api):
+    python -m benchmarks.prepared_statements --iterations 2000
+"""
+import argparse
+import importlib
+import json
+import statistics
+import time
+from datetime import datetime, timezone
+from psycopg2.extras import RealDictCursor, execute_values
+from services.database import db
+from services.ingest_buffer import columns
+
+# Imported only for their side effect: each registers its prepared statements
+# (ingest_buffer's are registered by the import above)
+for module in ('services.presence_tracker', 'middleware.auth'):
+    importlib.import_module(module)
+
+def telemetry_rows(device, count):
+    now = datetime.now(timezone.utc).isoformat()
+    metadata = json.dumps({'battery': 90})
+    return [
+        (now, device['device_id'], device['gateway_id'], device['user_id'], 21.5, 40.0, metadata)
+        for _ in range(count)
+    ]
+
+def cases(device):
+    """(label, plain SQL, plain params, plain runs via execute_values, prepared name, prepared params)"""
+    now = datetime.now(timezone.utc).isoformat()
+    owned = (device['device_id'], device['user_id'])
+    online = (now, device['device_id'], device['gateway_id'])
+    yield ('ownership check',
+           'SELECT 1 FROM devices WHERE device_id = %s AND user_id = %s', owned, False,
+           'device_owned', owned)
+    yield ('device online UPDATE',
+           """UPDATE devices SET last_seen = %s::timestamptz, status = 'online', updated_at = %s::timestamptz
+              WHERE device_id = %s AND gateway_id = %s RETURNING device_id""",
+           (now, now, device['device_id'], device['gateway_id']), False,
+           'device_online', online)
+    for count in (1, 100):
+        rows = telemetry_rows(device, count)
+        yield (f'telemetry INSERT x{count}',
+               """INSERT INTO telemetry (time, device_id, gateway_id, user_id, temperature, humidity, metadata)
+                  VALUES %s""", rows, True,
+               'telemetry_insert', columns(rows))
+
+def measure(conn, cursor, run, iterations):
+    latencies = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run()
+        if cursor.description:
+            cursor.fetchall()
+        latencies.append(time.perf_counter() - started)
+        conn.rollback()
+    return latencies
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.mean(latencies) * 1e6, statistics.median(latencies) * 1e6, p99 * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='Prepared statement microbenchmark')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    db.connect(minconn=1, maxconn=1)
+    conn = db.get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute('SELECT device_id, gateway_id, user_id FROM devices LIMIT 1')
+        device = cursor.fetchone()
+        conn.rollback()
+        if not device:
+            print('No devices in the database')
+            return
+
+        print(f'{"statement":24} {"mode":9} {"mean us":>9} {"p50 us":>9} {"p99 us":>9}')
+        for label, sql, params, multi_row, name, prepared_params in cases(device):
+            statement = db.statements[name]
+            db._ensure_prepared(conn, cursor, statement)
+            conn.commit()
+
+            if multi_row:
+                plain = lambda: execute_values(cursor, sql, params, page_size=len(params))
+            else:
+                plain = lambda: cursor.execute(sql, params)
+            prepared = lambda: cursor.execute(statement.execute_sql, prepared_params)
+
+            # Warm up both paths before timing
+            measure(conn, cursor, plain, 50)
+            measure(conn, cursor, prepared, 50)
+
+            plain_stats = summary(measure(conn, cursor, plain, args.iterations))
+            prepared_stats = summary(measure(conn, cursor, prepared, args.iterations))
+            for mode, (mean, p50, p99) in (('plain', plain_stats), ('prepared', prepared_stats)):
+                print(f'{label:24} {mode:9} {mean:9.0f} {p50:9.0f} {p99:9.0f}')
+            print(f'{"":24} {"speedup":9} {plain_stats[0] / prepared_stats[0]:8.2f}x')
+    finally:
+        cursor.close()
+        db.put_connection(conn)
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -10,10 +10,32 @@ class Settings:
     DB_USER = os.getenv('DB_USER', 'iot')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '2003')
     
+    # Optional streaming replicas for read_only (dashboard/history) queries: comma-separated
+    # libpq DSNs or postgresql:// URLs. Replicas lagging past DB_REPLICA_MAX_LAG_S are skipped.
+    DB_REPLICA_DSNS = [dsn.strip() for dsn in os.getenv('DB_REPLICA_DSNS', '').split(',') if dsn.strip()]
+    DB_REPLICA_POOL = int(os.getenv('DB_REPLICA_POOL', 10))
+    DB_REPLICA_MAX_LAG_S = float(os.getenv('DB_REPLICA_MAX_LAG_S', 10))
+    DB_REPLICA_CHECK_INTERVAL_S = float(os.getenv('DB_REPLICA_CHECK_INTERVAL_S', 5))
+    
     MQTT_HOST = os.getenv('MQTT_HOST', 'mosquitto')
     MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
     MQTT_USERNAME = os.getenv('MQTT_USERNAME', 'gateway')
     MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '2003')
+    # API client id. Empty derives one per process (required with `--workers N`); a fixed
+    # id keeps a persistent session across restarts but only suits a single API process
+    MQTT_CLIENT_ID = os.getenv('MQTT_CLIENT_ID', '')
+    # Ingest engine: 'paho' (network thread) or 'asyncio' (aiomqtt inside the event loop)
+    MQTT_ENGINE = os.getenv('MQTT_ENGINE', 'paho')
+    MQTT_MAX_CONCURRENCY = int(os.getenv('MQTT_MAX_CONCURRENCY', 8))
+    
+    # Ingest topology: 'embedded' (the API consumes gateway topics itself) or 'workers'
+    # (ingest_worker.py processes split them through a $share/<group>/ subscription)
+    INGEST_MODE = os.getenv('INGEST_MODE', 'embedded')
+    MQTT_SHARED_GROUP = os.getenv('MQTT_SHARED_GROUP', 'ingest')
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1))
+    INGEST_WORKER_DB_POOL = int(os.getenv('INGEST_WORKER_DB_POOL', 5))
+    # Worker N serves /metrics on this port + N (0 disables)
+    INGEST_WORKER_METRICS_PORT = int(os.getenv('INGEST_WORKER_METRICS_PORT', 9100))
     
     API_PORT = int(os.getenv('API_PORT', 3000))
     JWT_SECRET = os.getenv('JWT_SECRET', 'ThaiVuongMinhThaoLinhTu@2003')
@@ -21,5 +43,39 @@ class Settings:
     JWT_EXPIRATION_DAYS = 7
     
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'info')
+    
+    # Threads running awaited queries for routes/background services (keep below the pool's 20)
+    DB_ASYNC_WORKERS = int(os.getenv('DB_ASYNC_WORKERS', 8))
+    
+    # Per-statement timings for /api/admin/query-stats, and the slow-query log (0 disables);
+    # a sampled share of slow SELECTs is logged with EXPLAIN (ANALYZE, BUFFERS)
+    DB_QUERY_STATS = os.getenv('DB_QUERY_STATS', 'false').lower() == 'true'
+    DB_SLOW_QUERY_MS = int(os.getenv('DB_SLOW_QUERY_MS', 0))
+    DB_SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('DB_SLOW_QUERY_EXPLAIN_RATE', 0.1))
+    
+    # Streaming exports (/api/telemetry/export, /api/access/export); each holds a DB connection
+    EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', 2))
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 5000))
+    
+    # Ingest write-behind buffer: flush when either limit is hit
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))
+    INGEST_FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_INTERVAL_MS', 200))
+    
+    # Disk spool for rows Postgres couldn't take (failed or slower than the threshold)
+    INGEST_SPOOL_PATH = os.getenv('INGEST_SPOOL_PATH', 'spool/ingest_spool.db')
+    INGEST_SPOOL_SLOW_FLUSH_MS = int(os.getenv('INGEST_SPOOL_SLOW_FLUSH_MS', 2000))
+    INGEST_SPOOL_REPLAY_BATCH = int(os.getenv('INGEST_SPOOL_REPLAY_BATCH', 2000))
+    
+    # Coalesced last_seen writes for devices/gateways
+    PRESENCE_FLUSH_INTERVAL_MS = int(os.getenv('PRESENCE_FLUSH_INTERVAL_MS', 1000))
+    
+    # Periodic services (offline detector, alerts) run in one API process only,
+    # elected through a Postgres advisory lock; standbys retry every interval
+    LEADER_ELECTION = os.getenv('LEADER_ELECTION', 'true').lower() == 'true'
+    LEADER_RENEW_INTERVAL_S = float(os.getenv('LEADER_RENEW_INTERVAL_S', 5))
+    
+    # MQTT thread -> event loop WebSocket handoff ('drop_oldest' or 'coalesce')
+    WS_BROADCAST_MAX_PENDING = int(os.getenv('WS_BROADCAST_MAX_PENDING', 1000))
+    WS_BROADCAST_OVERFLOW = os.getenv('WS_BROADCAST_OVERFLOW', 'drop_oldest')
 
 settings = Settings()
\ No newline at end of file
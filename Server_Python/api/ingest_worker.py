@@ -0,0 +1,142 @@
+"""
+Standalone MQTT ingest workers.
+
+Each worker process consumes gateway topics through a shared subscription
+($share/<MQTT_SHARED_GROUP>/gateway/+/...), so the broker splits the traffic
+between them. Run the API with INGEST_MODE=workers so it stops consuming gateway
+topics and serves HTTP/WebSocket only.
+
+WebSocket fan-out: workers have no WebSocket clients, so their broadcasts are
+published to server/events/{user_id}/{type} (QoS 0). The API processes subscribe
+to that and hand the events to their broadcast bridge.
+
+Each worker serves its own metrics on INGEST_WORKER_METRICS_PORT + index.
+
+Usage:
+    python ingest_worker.py               # INGEST_WORKERS processes (default: CPU count)
+    python ingest_worker.py --workers 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.settings import settings
+from services.database import db
+from services.mqtt_service import MQTTService
+from services.ingest_buffer import ingest_buffer
+from services.ingest_spool import ingest_spool
+from services.device_registry import device_registry
+from services.presence_tracker import presence_tracker
+from services.broadcast_bridge import broadcast_bridge
+from services.metrics import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(processName)s] %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the ingest logs
+        pass
+
+def start_metrics_server(port):
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f'Metrics served on :{port}/metrics')
+    return server
+
+def run_worker(index):
+    """Run one ingest worker until SIGTERM/SIGINT"""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    # Ingest needs only a few connections: flush threads, registry listener, write-throughs
+    db.connect(minconn=1, maxconn=settings.INGEST_WORKER_DB_POOL)
+    device_registry.start()
+    presence_tracker.start()
+
+    # One spool file per worker; a restarted worker replays its own backlog
+    base, extension = os.path.splitext(settings.INGEST_SPOOL_PATH)
+    ingest_spool.path = f'{base}-{index}{extension}'
+    ingest_buffer.start()
+
+    # Stable per-worker client id so the persistent (clean_session=False) session survives restarts
+    service = MQTTService({
+        'host': settings.MQTT_HOST,
+        'port': settings.MQTT_PORT,
+        'username': settings.MQTT_USERNAME,
+        'password': settings.MQTT_PASSWORD,
+        'use_tls': settings.MQTT_USE_TLS if hasattr(settings, 'MQTT_USE_TLS') else False,
+        'client_id': f'vps_ingest_{socket.gethostname()}_{index}',
+        'ingest_mode': 'worker',
+        'shared_group': settings.MQTT_SHARED_GROUP
+    })
+    broadcast_bridge.set_relay(service.relay_event)
+
+    if not service.connect():
+        logger.warning('MQTT connection failed, will retry automatically')
+
+    metrics_server = None
+    if settings.INGEST_WORKER_METRICS_PORT:
+        metrics_server = start_metrics_server(settings.INGEST_WORKER_METRICS_PORT + index)
+
+    logger.info(f'Ingest worker {index} started (group: {settings.MQTT_SHARED_GROUP})')
+    stop_event.wait()
+
+    logger.info(f'Ingest worker {index} shutting down...')
+    service.disconnect()
+    if metrics_server:
+        metrics_server.shutdown()
+    ingest_buffer.stop()
+    presence_tracker.stop()
+    device_registry.stop()
+    db.close()
+    logger.info(f'Ingest worker {index} stopped')
+
+def main():
+    parser = argparse.ArgumentParser(description='Run MQTT ingest workers')
+    parser.add_argument('--workers', type=int, default=settings.INGEST_WORKERS,
+                        help='Number of worker processes (default: INGEST_WORKERS)')
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker(0)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(index,), name=f'ingest-{index}')
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    logger.info(f'Started {len(processes)} ingest workers')
+
+    def shutdown(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()
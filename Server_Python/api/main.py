@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends, Query
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -8,13 +9,24 @@ from datetime import datetime
 import logging
 import uvicorn
 import os
-import asyncio
+import socket
 
 from config.settings import settings
 from services.database import db
-from services.mqtt_service import init_mqtt_service, process_websocket_broadcasts 
+from services.async_database import adb
+from services.loop_monitor import loop_monitor
+from services.mqtt_service import start_mqtt_service, stop_mqtt_service
 from services.alert_service import alert_service
 from services.offline_detector import offline_detector
+from services.leader_election import offline_detector_leader, alert_service_leader
+from services.ingest_buffer import ingest_buffer
+from services.ingest_spool import ingest_spool
+from services.device_registry import device_registry
+from services.presence_tracker import presence_tracker
+from services.broadcast_bridge import broadcast_bridge
+from services.metrics import metrics
+from services.query_stats import query_stats
+from middleware.auth import require_admin
 
 from routes import auth, devices, telemetry, access, gateways, commands, sync, dashboard, websocket, system
 
@@ -28,6 +40,31 @@ async def lifespan(app: FastAPI):
     try:
         db.connect()
         logger.info('Database connected successfully')
+        db.connect_replicas()
+        
+        # Awaitable queries for routes and background services, off the event loop
+        adb.start()
+        await loop_monitor.start()
+        
+        # Load device registry (ingest routing cache) and listen for changes
+        device_registry.start()
+        logger.info('Device registry loaded')
+        
+        # Coalesced last_seen writes for devices/gateways
+        presence_tracker.start()
+        logger.info('Presence tracker started')
+        
+        # Bind the WebSocket handoff to this loop before MQTT callbacks can publish
+        await broadcast_bridge.start()
+        logger.info('WebSocket broadcast bridge started')
+        
+        # Start ingest buffer before MQTT so no message arrives without a flusher.
+        # With separate ingest workers this process never buffers or spools rows
+        if settings.INGEST_MODE != 'workers':
+            # One spool file per process, so `--workers N` replayers don't share backlogs
+            ingest_spool.claim_slot()
+            ingest_buffer.start()
+            logger.info('Ingest buffer started')
         
         # Initialize MQTT service
         mqtt_config = {
@@ -35,34 +72,49 @@ async def lifespan(app: FastAPI):
             'port': settings.MQTT_PORT,
             'username': settings.MQTT_USERNAME,
             'password': settings.MQTT_PASSWORD,
-            'use_tls': settings.MQTT_USE_TLS if hasattr(settings, 'MQTT_USE_TLS') else False
+            'use_tls': settings.MQTT_USE_TLS if hasattr(settings, 'MQTT_USE_TLS') else False,
+            'max_concurrency': settings.MQTT_MAX_CONCURRENCY,
+            # With separate ingest workers the API only consumes their relayed WebSocket events
+            'ingest_mode': 'api' if settings.INGEST_MODE == 'workers' else 'embedded'
         }
+        if not settings.MQTT_CLIENT_ID:
+            # `--workers N` processes sharing one client id would keep taking each other's
+            # connection; a per-process id doesn't survive restarts, so keep no session
+            mqtt_config['client_id'] = f'vps_mqtt_service_{socket.gethostname()}_{os.getpid()}'
+            mqtt_config['clean_session'] = True
+            # Embedded processes then split gateway traffic instead of each ingesting all of it
+            mqtt_config['shared_group'] = settings.MQTT_SHARED_GROUP
+        else:
+            mqtt_config['client_id'] = settings.MQTT_CLIENT_ID
         
-        mqtt_connected = init_mqtt_service(mqtt_config)
+        mqtt_connected = await start_mqtt_service(mqtt_config, engine=settings.MQTT_ENGINE)
         if mqtt_connected:
-            logger.info('MQTT service connected successfully')
+            logger.info(f'MQTT service started (engine: {settings.MQTT_ENGINE}, '
+                       f'ingest: {settings.INGEST_MODE})')
         else:
             logger.warning('MQTT service failed to connect, will retry automatically')
         
-        # Start offline detector with optimized settings
-        # check_interval: 10 seconds for faster detection
+        # Start offline detector: per-device/gateway deadlines fed by the presence tracker
+        # check_interval: 60 second reconciliation sweep as a safety net
         # device_timeout: 90 seconds (3x heartbeat interval of 30s)
         # gateway_timeout: 90 seconds (3x heartbeat interval of 30s)
-        await offline_detector.start()
-        logger.info('Offline detector started (check: 10s, timeout: 90s)')
-        
-        # Start alert service
-        await alert_service.start()
-        logger.info('Alert service started')
-        
-        # Start WebSocket broadcast processor
-        asyncio.create_task(process_websocket_broadcasts())
-        logger.info('WebSocket broadcast processor started')
+        # and the alert service.
+        # With LEADER_ELECTION both run in one process only (per-service advisory lock),
+        # so `--workers N` doesn't multiply scans and alerts
+        if settings.LEADER_ELECTION:
+            await offline_detector_leader.start(offline_detector.start, offline_detector.stop)
+            await alert_service_leader.start(alert_service.start, alert_service.stop)
+            logger.info('Offline detector and alert service run on the elected leader')
+        else:
+            await offline_detector.start()
+            logger.info('Offline detector started (deadlines, reconcile: 60s, timeout: 90s)')
+            await alert_service.start()
+            logger.info('Alert service started')
         
         logger.info('=' * 70)
         logger.info('API Server started successfully')
         logger.info(f'Listening on port {settings.API_PORT}')
-        logger.info('Status tracking: ENABLED (10s check, 90s timeout)')
+        logger.info('Status tracking: ENABLED (deadline scheduler, 90s timeout)')
         logger.info('=' * 70)
     except Exception as e:
         logger.error(f'Failed to start server: {e}', exc_info=True)
@@ -74,17 +126,34 @@ async def lifespan(app: FastAPI):
     try:
         logger.info('Shutting down services...')
         
-        await alert_service.stop()
-        logger.info('Alert service stopped')
+        if settings.LEADER_ELECTION:
+            await alert_service_leader.stop()
+            await offline_detector_leader.stop()
+        else:
+            await alert_service.stop()
+            await offline_detector.stop()
+        logger.info('Alert service and offline detector stopped')
+        
+        await stop_mqtt_service()
+        logger.info('MQTT service disconnected')
         
-        await offline_detector.stop()
-        logger.info('Offline detector stopped')
+        # Flush buffered telemetry/access rows before the pool goes away
+        if ingest_buffer.running:
+            ingest_buffer.stop()
+        logger.info('Ingest buffer flushed and stopped')
         
-        from services.mqtt_service import mqtt_service
-        if mqtt_service:
-            mqtt_service.disconnect()
-            logger.info('MQTT service disconnected')
+        presence_tracker.stop()
+        logger.info('Presence tracker flushed and stopped')
+        
+        device_registry.stop()
+        logger.info('Device registry stopped')
+        
+        await broadcast_bridge.stop()
+        logger.info('WebSocket broadcast bridge stopped')
             
+        adb.stop()
+        await loop_monitor.stop()
+        
         db.close()
         logger.info('Database connection closed')
         
@@ -121,19 +190,44 @@ async def health_check(request: Request):
     """Health check endpoint with service status details"""
     from services.mqtt_service import mqtt_service
     
+    if settings.LEADER_ELECTION:
+        # Standbys don't run these services; they are healthy while their elector keeps
+        # competing, and the leader must also have its service running
+        offline_detector_ok = offline_detector_leader.is_healthy() and (
+            offline_detector.running or not offline_detector_leader.leader)
+        alert_service_ok = alert_service_leader.is_healthy() and (
+            alert_service.running or not alert_service_leader.leader)
+    else:
+        offline_detector_ok = offline_detector.running
+        alert_service_ok = alert_service.running if hasattr(alert_service, 'running') else True
+    
     health_status = {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'services': {
             'database': db.is_connected() if hasattr(db, 'is_connected') else True,
             'mqtt': mqtt_service.connected if mqtt_service else False,
-            'offline_detector': offline_detector.running,
-            'alert_service': alert_service.running if hasattr(alert_service, 'running') else True
+            'offline_detector': offline_detector_ok,
+            'ingest_buffer': ingest_buffer.running or settings.INGEST_MODE == 'workers',
+            'broadcast_bridge': broadcast_bridge.running,
+            'alert_service': alert_service_ok
+        },
+        'leadership': {
+            'offline_detector': offline_detector_leader.role() if settings.LEADER_ELECTION else 'disabled',
+            'alert_service': alert_service_leader.role() if settings.LEADER_ELECTION else 'disabled'
         },
         'configuration': {
             'offline_check_interval': offline_detector.check_interval,
             'device_timeout': offline_detector.device_timeout,
             'gateway_timeout': offline_detector.gateway_timeout
+        },
+        'ingest': {
+            'queue_depth': ingest_buffer.queue_depth(),
+            'last_flush_ms': round(ingest_buffer.last_flush_ms, 2),
+            'spool_pending': ingest_buffer.spool.pending_rows if ingest_buffer.spool else 0,
+            'ws_pending': len(broadcast_bridge.pending),
+            'ws_dropped': broadcast_bridge.dropped,
+            'event_loop_lag_ms': round(loop_monitor.last_lag * 1000, 2)
         }
     }
     
@@ -142,6 +236,12 @@ async def health_check(request: Request):
     
     return health_status
 
+# Prometheus scrape endpoint
+@app.get('/metrics', response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Ingest, database pool and WebSocket metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
 # Status monitoring endpoint (admin only)
 @app.get('/api/admin/status-monitor')
 async def status_monitor():
@@ -156,7 +256,7 @@ async def status_monitor():
             FROM gateways
             GROUP BY status
         """
-        gateway_stats = db.query(gateway_query)
+        gateway_stats = await adb.query(gateway_query)
         
         # Get device status summary
         device_query = """
@@ -167,7 +267,7 @@ async def status_monitor():
             FROM devices
             GROUP BY status
         """
-        device_stats = db.query(device_query)
+        device_stats = await adb.query(device_query)
         
         # Get recent offline events
         recent_offline_query = """
@@ -183,7 +283,7 @@ async def status_monitor():
             ORDER BY time DESC
             LIMIT 20
         """
-        recent_offline = db.query(recent_offline_query)
+        recent_offline = await adb.query(recent_offline_query)
         
         return {
             'success': True,
@@ -195,8 +295,22 @@ async def status_monitor():
                 'running': offline_detector.running,
                 'check_interval': offline_detector.check_interval,
                 'device_timeout': offline_detector.device_timeout,
-                'gateway_timeout': offline_detector.gateway_timeout
-            }
+                'gateway_timeout': offline_detector.gateway_timeout,
+                'scheduled': len(offline_detector.scheduler),
+                'expirations': offline_detector.expirations,
+                'rearmed': offline_detector.rearmed,
+                'sweep_transitions': offline_detector.sweep_transitions
+            },
+            'leadership': {
+                'offline_detector': offline_detector_leader.get_stats(),
+                'alert_service': alert_service_leader.get_stats()
+            },
+            'ingest_buffer': ingest_buffer.get_stats(),
+            'device_registry': device_registry.get_stats(),
+            'presence_tracker': presence_tracker.get_stats(),
+            'broadcast_bridge': broadcast_bridge.get_stats(),
+            'event_loop': loop_monitor.get_stats(),
+            'read_replicas': db.replicas.get_stats()
         }
     except Exception as e:
         logger.error(f'Error in status monitor: {e}', exc_info=True)
@@ -205,6 +319,26 @@ async def status_monitor():
             'error': str(e)
         }
 
+# Per-statement database timings (admin only)
+@app.get('/api/admin/query-stats')
+async def get_query_stats(
+    _: bool = Depends(require_admin),
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query('total', pattern='^(total|mean|max|calls)$')
+):
+    """Top statements by total (or mean/max) time, or by call count"""
+    return {
+        'success': True,
+        'collector': query_stats.get_stats(),
+        'statements': query_stats.top(limit, order_by)
+    }
+
+@app.delete('/api/admin/query-stats')
+async def reset_query_stats(_: bool = Depends(require_admin)):
+    """Start a new measurement window"""
+    query_stats.reset()
+    return {'success': True}
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(devices.router)
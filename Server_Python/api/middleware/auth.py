@@ -3,9 +3,14 @@ from fastapi import HTTPException, Security, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from config.settings import settings
 from services.database import db
+from services.async_database import adb
 
 security = HTTPBearer()
 
+# Ownership checks run on nearly every device/gateway route
+db.prepare('device_owned', 'SELECT 1 FROM devices WHERE device_id = $1 AND user_id = $2', ('text', 'text'))
+db.prepare('gateway_owned', 'SELECT 1 FROM gateways WHERE gateway_id = $1 AND user_id = $2', ('text', 'text'))
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
     token = credentials.credentials
     
@@ -20,12 +25,9 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
 def get_current_user(token_data: dict = Depends(verify_token)):
     return token_data
 
-def verify_device_ownership(device_id: str, user_id: str):
+async def verify_device_ownership(device_id: str, user_id: str):
     """Verify device ownership - helper function to call directly"""
-    result = db.query(
-        'SELECT 1 FROM devices WHERE device_id = %s AND user_id = %s',
-        (device_id, user_id)
-    )
+    result = await adb.query_prepared('device_owned', (device_id, user_id))
 
     if not result:
         raise HTTPException(status_code=403, detail='Access denied: You do not own this device')
@@ -34,14 +36,11 @@ def verify_device_ownership(device_id: str, user_id: str):
 
 async def check_device_ownership(device_id: str, current_user: dict = Depends(get_current_user)):
     """Check device ownership - for use as FastAPI dependency"""
-    return verify_device_ownership(device_id, current_user.get('user_id'))
+    return await verify_device_ownership(device_id, current_user.get('user_id'))
 
-def verify_gateway_ownership(gateway_id: str, user_id: str):
+async def verify_gateway_ownership(gateway_id: str, user_id: str):
     """Verify gateway ownership - helper function to call directly"""
-    result = db.query(
-        'SELECT 1 FROM gateways WHERE gateway_id = %s AND user_id = %s',
-        (gateway_id, user_id)
-    )
+    result = await adb.query_prepared('gateway_owned', (gateway_id, user_id))
 
     if not result:
         raise HTTPException(status_code=403, detail='Access denied: You do not own this gateway')
@@ -50,7 +49,7 @@ def verify_gateway_ownership(gateway_id: str, user_id: str):
 
 async def check_gateway_ownership(gateway_id: str, current_user: dict = Depends(get_current_user)):
     """Check gateway ownership - for use as FastAPI dependency"""
-    return verify_gateway_ownership(gateway_id, current_user.get('user_id'))
+    return await verify_gateway_ownership(gateway_id, current_user.get('user_id'))
 
 def require_admin(current_user: dict = Depends(get_current_user)):
     if current_user.get('role') != 'admin':
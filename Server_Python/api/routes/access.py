@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from typing import Optional
-from services.database import db
+from services.async_database import adb
+from services.export_service import export_service, ExportBusy, ExportUnavailable
 from middleware.auth import get_current_user
 
 router = APIRouter(prefix='/api/access', tags=['access'])
@@ -39,16 +42,43 @@ async def get_access_logs(
         query += ' ORDER BY time DESC LIMIT %s'
         params.append(limit)
         
-        results = db.query(query, tuple(params))
+        results = await adb.query(query, tuple(params))
         return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get('/export')
+async def export_access_logs(
+    format: str = Query('csv', pattern='^(csv|ndjson|parquet)$'),
+    device_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    result: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream all matching access log rows (oldest first) as CSV, NDJSON or Parquet"""
+    user_id = current_user['user_id']
+    try:
+        stream, media_type, extension = export_service.open(
+            'access_logs', user_id, format, start=start, end=end, device_id=device_id, result=result
+        )
+    except (ValueError, ExportUnavailable) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    filename = f'access_logs_{user_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @router.get('/rfid')
 async def get_rfid_cards(current_user: dict = Depends(get_current_user)):
     try:
         user_id = current_user['user_id']
-        result = db.query(
+        result = await adb.query(
             """SELECT * FROM rfid_cards 
                WHERE user_id = %s 
                ORDER BY registered_at DESC""",
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+import asyncio
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
 from config.settings import settings
-from services.database import db
+from services.async_database import adb
 from middleware.auth import verify_token
 
 router = APIRouter(prefix='/api/auth', tags=['auth'])
@@ -22,7 +23,7 @@ class LoginRequest(BaseModel):
 @router.post('/register')
 async def register(req: RegisterRequest):
     try:
-        result = db.query(
+        result = await adb.query(
             'SELECT 1 FROM users WHERE username = %s OR email = %s',
             (req.username, req.email)
         )
@@ -30,10 +31,11 @@ async def register(req: RegisterRequest):
         if result:
             raise HTTPException(status_code=409, detail='Username or email already exists')
         
-        password_hash = bcrypt.hashpw(req.password.encode(), bcrypt.gensalt()).decode()
+        # bcrypt is deliberately slow; keep it off the event loop
+        password_hash = (await asyncio.to_thread(bcrypt.hashpw, req.password.encode(), bcrypt.gensalt())).decode()
         user_id = f'user_{int(datetime.now().timestamp() * 1000)}'
         
-        result = db.query(
+        result = await adb.query(
             """INSERT INTO users (user_id, username, email, password_hash, full_name)
                VALUES (%s, %s, %s, %s, %s)
                RETURNING user_id, username, email, full_name, role, created_at""",
@@ -69,7 +71,7 @@ async def register(req: RegisterRequest):
 @router.post('/login')
 async def login(req: LoginRequest):
     try:
-        result = db.query(
+        result = await adb.query(
             """SELECT user_id, username, email, password_hash, full_name, role, active
                FROM users WHERE username = %s""",
             (req.username,)
@@ -83,7 +85,7 @@ async def login(req: LoginRequest):
         if not user['active']:
             raise HTTPException(status_code=403, detail='Account is deactivated')
         
-        if not bcrypt.checkpw(req.password.encode(), user['password_hash'].encode()):
+        if not await asyncio.to_thread(bcrypt.checkpw, req.password.encode(), user['password_hash'].encode()):
             raise HTTPException(status_code=401, detail='Invalid username or password')
         
         token = jwt.encode(
@@ -115,7 +117,7 @@ async def login(req: LoginRequest):
 @router.get('/me')
 async def get_me(token_data: dict = Depends(verify_token)):
     try:
-        result = db.query(
+        result = await adb.query(
             """SELECT user_id, username, email, full_name, role, created_at
                FROM users WHERE user_id = %s AND active = TRUE""",
             (token_data['user_id'],)
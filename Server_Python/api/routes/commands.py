@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
-from services.database import db
+from services.async_database import adb
 from middleware.auth import get_current_user, verify_device_ownership
 import json
 import uuid
@@ -24,7 +24,7 @@ async def send_command(gateway_id: str, device_id: str, req: CommandRequest, cur
         from services.mqtt_service import mqtt_service
 
         # Verify ownership
-        verify_device_ownership(device_id, current_user.get('user_id'))
+        await verify_device_ownership(device_id, current_user.get('user_id'))
 
         # Generate command ID
         command_id = str(uuid.uuid4())
@@ -47,7 +47,7 @@ async def send_command(gateway_id: str, device_id: str, req: CommandRequest, cur
             VALUES (%s::timestamptz, %s, 'client', %s, %s, %s, %s, 'sent', %s, %s)
         """
 
-        db.query(log_query, (
+        await adb.query(log_query, (
             timestamp, command_id, device_id, gateway_id, current_user.get('user_id'), req.command, json.dumps(req.params or {}), json.dumps({'source_ip': 'api'})
         ))
 
@@ -105,7 +105,7 @@ async def get_command_status(command_id: str, current_user: dict = Depends(get_c
             LIMIT 1
         """
         
-        result = db.query(query, (command_id, current_user.get('user_id')))
+        result = await adb.query(query, (command_id, current_user.get('user_id')))
         
         if not result or len(result) == 0:
             raise HTTPException(status_code=404, detail='Command not found')
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from datetime import datetime, timedelta
-from services.database import db
+from datetime import datetime, timedelta, timezone
+from services.async_database import adb
+from services.telemetry_rollups import resolution_for, series_query
+from services.log_rollups import ACCESS_LAST_24H, ALERTS_LAST_24H, ACCESS_BY_DAY, ALERTS_BY_TYPE
 from middleware.auth import get_current_user
 import logging
 
@@ -23,7 +25,7 @@ async def get_overview(current_user: dict = Depends(get_current_user)):
             FROM devices
             WHERE user_id = %s
         """
-        devices_stats = db.query_one(devices_query, (user_id,))
+        devices_stats = await adb.query_one(devices_query, (user_id,), read_only=True)
         
         # Count gateways
         gateways_query = """
@@ -33,40 +35,22 @@ async def get_overview(current_user: dict = Depends(get_current_user)):
             FROM gateways
             WHERE user_id = %s
         """
-        gateways_stats = db.query_one(gateways_query, (user_id,))
+        gateways_stats = await adb.query_one(gateways_query, (user_id,), read_only=True)
         
         # Recent access logs (last 24h)
-        access_query = """
-            SELECT 
-                COUNT(*) as total_access,
-                COUNT(*) FILTER (WHERE result = 'granted') as granted,
-                COUNT(*) FILTER (WHERE result = 'denied') as denied
-            FROM access_logs
-            WHERE user_id = %s
-              AND time > NOW() - INTERVAL '24 hours'
-        """
-        access_stats = db.query_one(access_query, (user_id,))
+        access_stats = await adb.query_one(ACCESS_LAST_24H, (user_id, user_id), read_only=True)
         
         # Recent alerts (last 24h)
-        alerts_query = """
-            SELECT COUNT(*) as alert_count
-            FROM system_logs
-            WHERE user_id = %s
-              AND log_type = 'alert'
-              AND time > NOW() - INTERVAL '24 hours'
-        """
-        alerts_stats = db.query_one(alerts_query, (user_id,))
+        alerts_stats = await adb.query_one(ALERTS_LAST_24H, (user_id, user_id), read_only=True)
         
         # Latest temperature readings
         temp_query = """
-            SELECT DISTINCT ON (device_id)
-                device_id, temperature, humidity, time
-            FROM telemetry
+            SELECT device_id, temperature, humidity, time
+            FROM telemetry_latest
             WHERE user_id = %s
               AND time > NOW() - INTERVAL '1 hour'
-            ORDER BY device_id, time DESC
         """
-        latest_temps = db.query(temp_query, (user_id,))
+        latest_temps = await adb.query(temp_query, (user_id,), read_only=True)
         
         return {
             'success': True,
@@ -110,7 +94,7 @@ async def get_recent_activities(
             LIMIT 100
         """
         
-        activities = db.query(query, (user_id, hours))
+        activities = await adb.query(query, (user_id, hours), read_only=True)
         
         return {
             'success': True,
@@ -156,8 +140,8 @@ async def get_activity(
         """
         
         # Combine results
-        access_events = db.query(access_query, (user_id, hours))
-        alert_events = db.query(alerts_query, (user_id, hours))
+        access_events = await adb.query(access_query, (user_id, hours), read_only=True)
+        alert_events = await adb.query(alerts_query, (user_id, hours), read_only=True)
         
         # Merge and sort by time
         all_events = list(access_events) + list(alert_events)
@@ -175,24 +159,33 @@ async def get_activity(
 async def get_temperature_history(
     current_user: dict = Depends(get_current_user),
     device_id: str = Query(...),
-    hours: int = Query(24, ge=1, le=168)
+    hours: int = Query(24, ge=1, le=24 * 730),
+    max_points: int = Query(500, ge=10, le=5000)
 ):
-    """Get temperature history for device"""
+    """Get temperature history for device, bucketed from the telemetry rollups"""
     try:
-        query = """
-            SELECT time, temperature, humidity
-            FROM telemetry
-            WHERE user_id = %s
-            AND device_id = %s
-            AND time > NOW() - INTERVAL '1 hour' * %s
-            ORDER BY time ASC
-        """
+        resolution = resolution_for(hours * 3600, max_points)
+        start = datetime.now(timezone.utc) - timedelta(hours=hours)
+        query, params, resolution = series_query(resolution, device_id, user_id=current_user['user_id'], start=start)
         
-        result = db.query(query, (current_user['user_id'], device_id, hours))
+        rows = await adb.query(query, params, read_only=True)
         
         return {
             'success': True,
-            'data': result
+            'resolution_seconds': resolution,
+            'data': [
+                {
+                    'time': row['bucket'],
+                    'temperature': row['avg_temperature'],
+                    'humidity': row['avg_humidity'],
+                    'min_temperature': row['min_temperature'],
+                    'max_temperature': row['max_temperature'],
+                    'min_humidity': row['min_humidity'],
+                    'max_humidity': row['max_humidity'],
+                    'sample_count': row['sample_count']
+                }
+                for row in rows
+            ]
         }
         
     except Exception as e:
@@ -215,7 +208,7 @@ async def get_alerts(
             LIMIT %s
         """
         
-        result = db.query(query, (current_user['user_id'], limit))
+        result = await adb.query(query, (current_user['user_id'], limit), read_only=True)
         
         return {
             'success': True,
@@ -242,36 +235,13 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
             WHERE user_id = %s
             GROUP BY device_type
         """
-        devices_stats = db.query(devices_query, (user_id,))
+        devices_stats = await adb.query(devices_query, (user_id,), read_only=True)
         
         # Access stats (last 7 days)
-        access_query = """
-            SELECT 
-                DATE(time) as date,
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE result = 'granted') as granted,
-                COUNT(*) FILTER (WHERE result = 'denied') as denied
-            FROM access_logs
-            WHERE user_id = %s 
-              AND time > NOW() - INTERVAL '7 days'
-            GROUP BY DATE(time)
-            ORDER BY date DESC
-        """
-        access_stats = db.query(access_query, (user_id,))
+        access_stats = await adb.query(ACCESS_BY_DAY, (user_id,), read_only=True)
         
         # Alert stats (last 30 days)
-        alerts_query = """
-            SELECT 
-                event as alert_type,
-                severity,
-                COUNT(*) as count
-            FROM system_logs
-            WHERE user_id = %s 
-              AND log_type = 'alert' 
-              AND time > NOW() - INTERVAL '30 days'
-            GROUP BY event, severity
-        """
-        alerts_stats = db.query(alerts_query, (user_id,))
+        alerts_stats = await adb.query(ALERTS_BY_TYPE, (user_id,), read_only=True)
         
         return {
             'success': True,
@@ -2,7 +2,8 @@ from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from typing import Optional
 import logging
-from services.database import db
+from services.async_database import adb
+from services.device_registry import device_registry
 from middleware.auth import get_current_user, check_device_ownership
 
 logger = logging.getLogger(__name__)
@@ -17,7 +18,7 @@ class UpdateDeviceRequest(BaseModel):
 async def get_devices(current_user: dict = Depends(get_current_user)):
     try:
         user_id = current_user['user_id']
-        result = db.query(
+        result = await adb.query(
             """SELECT d.*, g.name AS gateway_name, g.status AS gateway_status
                FROM devices d
                JOIN gateways g ON d.gateway_id = g.gateway_id
@@ -40,7 +41,7 @@ async def get_device(
     ownership: bool = Depends(check_device_ownership)
 ):
     try:
-        result = db.query(
+        result = await adb.query(
             """SELECT d.*, g.name AS gateway_name, g.status AS gateway_status
                FROM devices d
                JOIN gateways g ON d.gateway_id = g.gateway_id
@@ -69,7 +70,7 @@ async def update_device(
 ):
     try:
         import json
-        result = db.query(
+        result = await adb.query(
             """UPDATE devices 
                SET location = COALESCE(%s, location),
                    metadata = COALESCE(%s, metadata),
@@ -79,6 +80,9 @@ async def update_device(
             (req.location, json.dumps(req.metadata) if req.metadata else None, device_id)
         )
         
+        # Keep the ingest routing cache in step (the NOTIFY trigger covers other writers)
+        await adb.run(device_registry.invalidate, device_id)
+        
         return result[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -90,7 +94,7 @@ async def get_device_health(
     ownership: bool = Depends(check_device_ownership)
 ):
     try:
-        result = db.query(
+        result = await adb.query(
             'SELECT * FROM device_health_view WHERE device_id = %s',
             (device_id,)
         )
@@ -112,7 +116,7 @@ async def force_check_device(device_id: str, current_user: dict = Depends(get_cu
         
         # Verify device belongs to user
         verify_query = "SELECT device_id, gateway_id FROM devices WHERE device_id = %s AND user_id = %s"
-        verify_result = db.query_one(verify_query, (device_id, user_id))
+        verify_result = await adb.query_one(verify_query, (device_id, user_id))
         
         if not verify_result:
             raise HTTPException(status_code=404, detail='Device not found')
@@ -128,7 +132,7 @@ async def force_check_device(device_id: str, current_user: dict = Depends(get_cu
             FROM devices 
             WHERE device_id = %s
         """
-        updated_status = db.query_one(status_query, (device_id,))
+        updated_status = await adb.query_one(status_query, (device_id,))
         
         return {
             'success': True,
@@ -155,7 +159,7 @@ async def get_device_status_history(
         
         # Verify device belongs to user
         verify_query = "SELECT device_id FROM devices WHERE device_id = %s AND user_id = %s"
-        verify_result = db.query_one(verify_query, (device_id, user_id))
+        verify_result = await adb.query_one(verify_query, (device_id, user_id))
         
         if not verify_result:
             raise HTTPException(status_code=404, detail='Device not found')
@@ -175,7 +179,7 @@ async def get_device_status_history(
             ORDER BY time DESC
         """
         
-        history = db.query(history_query, (device_id, hours))
+        history = await adb.query(history_query, (device_id, hours))
         
         # Calculate statistics
         stats_query = """
@@ -188,7 +192,7 @@ async def get_device_status_history(
               AND time > NOW() - INTERVAL '1 hour' * %s
         """
         
-        stats = db.query_one(stats_query, (device_id, hours))
+        stats = await adb.query_one(stats_query, (device_id, hours))
         
         return {
             'success': True,
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime, timedelta
-from services.database import db
+from services.async_database import adb
 from services.offline_detector import offline_detector
 from middleware.auth import get_current_user
 import logging
@@ -48,7 +48,7 @@ async def get_gateways(current_user: dict = Depends(get_current_user)):
             ORDER BY g.created_at DESC
         """
         
-        gateways = db.query(query, (user_id,))
+        gateways = await adb.query(query, (user_id,))
         
         return {
             'success': True,
@@ -84,7 +84,7 @@ async def get_gateway(gateway_id: str, current_user: dict = Depends(get_current_
             WHERE g.gateway_id = %s AND g.user_id = %s
         """
         
-        result = db.query_one(query, (gateway_id, user_id))
+        result = await adb.query_one(query, (gateway_id, user_id))
         
         if not result:
             raise HTTPException(status_code=404, detail='Gateway not found')
@@ -108,7 +108,7 @@ async def force_check_gateway(gateway_id: str, current_user: dict = Depends(get_
         
         # Verify gateway belongs to user
         verify_query = "SELECT gateway_id FROM gateways WHERE gateway_id = %s AND user_id = %s"
-        verify_result = db.query_one(verify_query, (gateway_id, user_id))
+        verify_result = await adb.query_one(verify_query, (gateway_id, user_id))
         
         if not verify_result:
             raise HTTPException(status_code=404, detail='Gateway not found')
@@ -123,7 +123,7 @@ async def force_check_gateway(gateway_id: str, current_user: dict = Depends(get_
             FROM gateways 
             WHERE gateway_id = %s
         """
-        updated_status = db.query_one(status_query, (gateway_id,))
+        updated_status = await adb.query_one(status_query, (gateway_id,))
         
         return {
             'success': True,
@@ -150,7 +150,7 @@ async def get_connection_history(
         
         # Verify gateway belongs to user
         verify_query = "SELECT gateway_id FROM gateways WHERE gateway_id = %s AND user_id = %s"
-        verify_result = db.query_one(verify_query, (gateway_id, user_id))
+        verify_result = await adb.query_one(verify_query, (gateway_id, user_id))
         
         if not verify_result:
             raise HTTPException(status_code=404, detail='Gateway not found')
@@ -170,7 +170,7 @@ async def get_connection_history(
             ORDER BY time DESC
         """
         
-        history = db.query(history_query, (gateway_id, hours))
+        history = await adb.query(history_query, (gateway_id, hours))
         
         # Calculate uptime statistics
         stats_query = """
@@ -185,7 +185,7 @@ async def get_connection_history(
               AND time > NOW() - INTERVAL '%s hours'
         """
         
-        stats = db.query_one(stats_query, (gateway_id, hours))
+        stats = await adb.query_one(stats_query, (gateway_id, hours))
         
         return {
             'success': True,
@@ -209,7 +209,7 @@ async def trigger_gateway_sync(gateway_id: str, current_user: dict = Depends(get
         
         # Verify gateway belongs to user
         verify_query = "SELECT gateway_id FROM gateways WHERE gateway_id = %s AND user_id = %s"
-        verify_result = db.query_one(verify_query, (gateway_id, user_id))
+        verify_result = await adb.query_one(verify_query, (gateway_id, user_id))
         
         if not verify_result:
             raise HTTPException(status_code=404, detail='Gateway not found')
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Header
 from typing import Optional
-from services.database import db
+from services.async_database import adb
+from services.device_registry import device_registry
 import json
 import hashlib
 from datetime import datetime
@@ -23,7 +24,7 @@ async def get_database_for_gateway(
     """
     try:
         # Verify gateway exists
-        gateway_result = db.query(
+        gateway_result = await adb.query(
             'SELECT user_id FROM gateways WHERE gateway_id = %s',
             (gateway_id,)
         )
@@ -34,7 +35,7 @@ async def get_database_for_gateway(
         user_id = gateway_result[0]['user_id']
         
         # Get passwords for this user (only active or all)
-        passwords_result = db.query(
+        passwords_result = await adb.query(
             '''SELECT password_id, hash, active, description, 
                       created_at, last_used, expires_at, updated_at
                FROM passwords 
@@ -44,7 +45,7 @@ async def get_database_for_gateway(
         )
         
         # Get RFID cards for this user
-        rfid_result = db.query(
+        rfid_result = await adb.query(
             '''SELECT uid, active, card_type, description,
                       registered_at, last_used, expires_at, 
                       deactivated_at, deactivation_reason, updated_at
@@ -55,7 +56,7 @@ async def get_database_for_gateway(
         )
         
         # Get devices for this gateway
-        devices_result = db.query(
+        devices_result = await adb.query(
             '''SELECT device_id, device_type, location, communication,
                       status, last_seen, created_at, updated_at
                FROM devices 
@@ -145,8 +146,11 @@ async def notify_database_change(user_id: str):
         # Import mqtt_service here to avoid circular import and None at module load
         from services.mqtt_service import mqtt_service
 
+        # Devices may have been added/moved by the web app: refresh the ingest routing cache
+        await adb.run(device_registry.invalidate)
+
         # Get all online gateways for this user
-        gateways = db.query(
+        gateways = await adb.query(
             'SELECT gateway_id FROM gateways WHERE user_id = %s AND status = %s',
             (user_id, 'online')
         )
@@ -182,7 +186,7 @@ async def notify_database_change(user_id: str):
 async def get_database_version(gateway_id: str):
     """Quick endpoint to check current database version without downloading full data"""
     try:
-        gateway_result = db.query(
+        gateway_result = await adb.query(
             'SELECT user_id FROM gateways WHERE gateway_id = %s',
             (gateway_id,)
         )
@@ -193,15 +197,15 @@ async def get_database_version(gateway_id: str):
         user_id = gateway_result[0]['user_id']
         
         # Get lightweight data for version calculation
-        passwords = db.query(
+        passwords = await adb.query(
             'SELECT password_id, updated_at FROM passwords WHERE user_id = %s',
             (user_id,)
         )
-        rfid_cards = db.query(
+        rfid_cards = await adb.query(
             'SELECT uid, updated_at FROM rfid_cards WHERE user_id = %s',
             (user_id,)
         )
-        devices = db.query(
+        devices = await adb.query(
             'SELECT device_id, updated_at FROM devices WHERE gateway_id = %s',
             (gateway_id,)
         )
@@ -234,7 +238,7 @@ async def gateway_heartbeat(gateway_id: str):
     """
     try:
         # Update gateway heartbeat
-        result = db.query(
+        result = await adb.query(
             """UPDATE gateways 
                SET last_seen = NOW(),
                    status = 'online',
@@ -269,7 +273,7 @@ async def get_sync_status(gateway_id: str):
     """
     try:
         # Get gateway info
-        gateway_result = db.query(
+        gateway_result = await adb.query(
             """SELECT gateway_id, user_id, name, location, status, 
                       last_seen, database_version, updated_at
                FROM gateways 
@@ -284,20 +288,20 @@ async def get_sync_status(gateway_id: str):
         user_id = gateway['user_id']
         
         # Count resources
-        password_count = db.query_one(
+        password_count = (await adb.query_one(
             'SELECT COUNT(*) as count FROM passwords WHERE user_id = %s',
             (user_id,)
-        )['count']
+        ))['count']
         
-        rfid_count = db.query_one(
+        rfid_count = (await adb.query_one(
             'SELECT COUNT(*) as count FROM rfid_cards WHERE user_id = %s',
             (user_id,)
-        )['count']
+        ))['count']
         
-        device_count = db.query_one(
+        device_count = (await adb.query_one(
             'SELECT COUNT(*) as count FROM devices WHERE gateway_id = %s',
             (gateway_id,)
-        )['count']
+        ))['count']
         
         return {
             'gateway_id': gateway['gateway_id'],
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime, timedelta
-from services.database import db
+from services.async_database import adb
+from services.log_rollups import ACCESS_BY_DAY, ALERTS_BY_TYPE
 from middleware.auth import get_current_user
 from typing import Optional
 
@@ -46,7 +47,7 @@ async def get_system_logs(
         """
         
         params.append(limit)
-        result = db.query(query, tuple(params))
+        result = await adb.query(query, tuple(params), read_only=True)
         
         return {
             'success': True,
@@ -70,30 +71,13 @@ async def get_system_stats(current_user: dict = Depends(get_current_user)):
             WHERE user_id = %s
             GROUP BY device_type
         """
-        devices_stats = db.query(devices_query, (user_id,))
+        devices_stats = await adb.query(devices_query, (user_id,), read_only=True)
         
         # Access stats (last 7 days)
-        access_query = """
-            SELECT 
-                DATE(time) as date,
-                COUNT(*) as total,
-                COUNT(*) FILTER (WHERE result = 'granted') as granted,
-                COUNT(*) FILTER (WHERE result = 'denied') as denied
-            FROM access_logs
-            WHERE user_id = %s AND time > NOW() - INTERVAL '7 days'
-            GROUP BY DATE(time)
-            ORDER BY date DESC
-        """
-        access_stats = db.query(access_query, (user_id,))
+        access_stats = await adb.query(ACCESS_BY_DAY, (user_id,), read_only=True)
         
         # Alert stats (last 30 days)
-        alerts_query = """
-            SELECT event as alert_type, severity, COUNT(*) as count
-            FROM system_logs
-            WHERE user_id = %s AND log_type = 'alert' AND time > NOW() - INTERVAL '30 days'
-            GROUP BY event, severity
-        """
-        alerts_stats = db.query(alerts_query, (user_id,))
+        alerts_stats = await adb.query(ALERTS_BY_TYPE, (user_id,), read_only=True)
         
         return {
             'success': True,
@@ -115,7 +99,7 @@ async def system_health(current_user: dict = Depends(get_current_user)):
             FROM devices
             WHERE user_id = %s AND status = 'offline'
         """
-        offline_devices = db.query(offline_query, (user_id,))
+        offline_devices = await adb.query(offline_query, (user_id,), read_only=True)
         
         # Check recent errors
         errors_query = """
@@ -125,18 +109,20 @@ async def system_health(current_user: dict = Depends(get_current_user)):
             ORDER BY time DESC
             LIMIT 10
         """
-        recent_errors = db.query(errors_query, (user_id,))
+        recent_errors = await adb.query(errors_query, (user_id,), read_only=True)
         
         # Overall health score
-        total_devices = db.query_one(
+        total_devices = (await adb.query_one(
             'SELECT COUNT(*) as total FROM devices WHERE user_id = %s',
-            (user_id,)
-        )['total']
+            (user_id,),
+            read_only=True
+        ))['total']
         
-        online_devices = db.query_one(
+        online_devices = (await adb.query_one(
             """SELECT COUNT(*) as online FROM devices WHERE user_id = %s AND status = 'online'""",
-            (user_id,)
-        )['online']
+            (user_id,),
+            read_only=True
+        ))['online']
         
         health_score = (online_devices / total_devices * 100) if total_devices > 0 else 100
         
@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from typing import Optional
-from services.database import db
+from services.async_database import adb
+from services.export_service import export_service, ExportBusy, ExportUnavailable
+from services.telemetry_rollups import parse_interval, series_query, readings_query
 from middleware.auth import get_current_user, check_device_ownership
 
 router = APIRouter(prefix='/api/telemetry', tags=['telemetry'])
@@ -14,31 +18,42 @@ async def get_telemetry(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        user_id = current_user['user_id']
-        
-        query = 'SELECT t.* FROM telemetry t WHERE t.user_id = %s'
-        params = [user_id]
-        
-        if device_id:
-            query += ' AND t.device_id = %s'
-            params.append(device_id)
-        
-        if start:
-            query += ' AND t.time >= %s'
-            params.append(start)
-        
-        if end:
-            query += ' AND t.time <= %s'
-            params.append(end)
-        
-        query += ' ORDER BY t.time DESC LIMIT %s'
-        params.append(limit)
-        
-        result = db.query(query, tuple(params))
+        query, params = readings_query(current_user['user_id'], device_id, start=start, end=end, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await adb.query(query, params, read_only=True)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get('/export')
+async def export_telemetry(
+    format: str = Query('csv', pattern='^(csv|ndjson|parquet)$'),
+    device_id: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream all matching telemetry (oldest first) as CSV, NDJSON or Parquet; rollup averages past 7 days"""
+    user_id = current_user['user_id']
+    try:
+        stream, media_type, extension = export_service.open(
+            'telemetry', user_id, format, start=start, end=end, device_id=device_id
+        )
+    except (ValueError, ExportUnavailable) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    
+    filename = f'telemetry_{user_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @router.get('/latest/{device_id}')
 async def get_latest_telemetry(
     device_id: str,
@@ -46,7 +61,7 @@ async def get_latest_telemetry(
     ownership: bool = Depends(check_device_ownership)
 ):
     try:
-        result = db.query(
+        result = await adb.query(
             """SELECT * FROM telemetry 
                WHERE device_id = %s 
                ORDER BY time DESC 
@@ -72,29 +87,14 @@ async def get_aggregate_telemetry(
     current_user: dict = Depends(get_current_user),
     ownership: bool = Depends(check_device_ownership)
 ):
+    """Temperature/humidity per interval, read from the coarsest rollup that fits it (widened for old ranges)"""
     try:
-        query = """
-            SELECT 
-                time_bucket(%s, time) AS bucket,
-                AVG((data->>'temperature')::float) AS avg_temperature,
-                AVG((data->>'humidity')::float) AS avg_humidity,
-                COUNT(*) AS sample_count
-            FROM telemetry
-            WHERE device_id = %s
-        """
-        params = [interval, device_id]
-        
-        if start:
-            query += ' AND time >= %s'
-            params.append(start)
-        
-        if end:
-            query += ' AND time <= %s'
-            params.append(end)
-        
-        query += ' GROUP BY bucket ORDER BY bucket DESC'
-        
-        result = db.query(query, tuple(params))
+        query, params, _ = series_query(parse_interval(interval), device_id, start=start, end=end, descending=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await adb.query(query, params, read_only=True)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,7 +1,7 @@
 import logging
 import asyncio
 from datetime import datetime, timedelta
-from services.database import db
+from services.async_database import adb
 from services.websocket_manager import ws_manager  # THÊM IMPORT
 import json
 
@@ -64,13 +64,12 @@ class AlertService:
         """Check for temperature threshold violations"""
         try:
             query = """
-                SELECT DISTINCT ON (device_id) device_id, gateway_id, user_id, temperature, time
-                FROM telemetry
-                WHERE temperature IS NOT NULL AND time > NOW() - INTERVAL '5 minutes'
-                ORDER BY device_id, time DESC
+                SELECT device_id, gateway_id, user_id, temperature, temperature_time AS time
+                FROM telemetry_latest
+                WHERE temperature_time > NOW() - INTERVAL '5 minutes'
             """
             
-            readings = db.query(query)
+            readings = await adb.query(query)
             
             for reading in readings:
                 device_id = reading['device_id']
@@ -111,13 +110,12 @@ class AlertService:
         """Check for humidity threshold violations"""
         try:
             query = """
-                SELECT DISTINCT ON (device_id) device_id, gateway_id, user_id, humidity, time
-                FROM telemetry
-                WHERE humidity IS NOT NULL AND time > NOW() - INTERVAL '5 minutes'
-                ORDER BY device_id, time DESC
+                SELECT device_id, gateway_id, user_id, humidity, humidity_time AS time
+                FROM telemetry_latest
+                WHERE humidity_time > NOW() - INTERVAL '5 minutes'
             """
             
-            readings = db.query(query)
+            readings = await adb.query(query)
             
             for reading in readings:
                 device_id = reading['device_id']
@@ -181,7 +179,7 @@ class AlertService:
                 'auto_generated': True
             })
             
-            db.query(query, (timestamp, gateway_id, device_id, user_id, alert_type, severity, message, value, threshold, metadata))
+            await adb.query(query, (timestamp, gateway_id, device_id, user_id, alert_type, severity, message, value, threshold, metadata))
             
             logger.warning(f'ALERT: {device_id} - {message}')
             
@@ -0,0 +1,103 @@
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.database import db
+from services.metrics import metrics
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_WAIT_SECONDS = metrics.histogram(
+    'iot_db_async_wait_seconds', 'Time an awaited query waited for a free executor thread'
+)
+QUERY_SECONDS = metrics.histogram(
+    'iot_db_async_query_seconds', 'Awaited query duration on the executor thread', labels=('method',)
+)
+
+class AsyncDatabase:
+    def __init__(self, database, max_workers=8):
+        """
+        Awaitable facade over the synchronous Database.
+
+        Calls run on a bounded thread pool, so a slow query ties up one executor
+        thread instead of the event loop. max_workers stays below the connection
+        pool size, leaving connections for the ingest threads.
+
+        Args:
+            database: The Database whose query/query_one/execute semantics are kept
+            max_workers: Queries running at once; the rest wait their turn (default: 8)
+        """
+        self.db = database
+        self.max_workers = max_workers
+        self.executor = None
+        self.in_flight = 0
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='db-async')
+            logger.info(f'Async database executor started ({self.max_workers} threads)')
+
+    def stop(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            logger.info('Async database executor stopped')
+
+    async def _run(self, method, *args):
+        if self.executor is None:
+            self.start()
+
+        submitted = time.perf_counter()
+        call = functools.partial(self._timed, method, submitted, *args)
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        finally:
+            self.in_flight -= 1
+
+    def _timed(self, method, submitted, *args):
+        started = time.perf_counter()
+        EXECUTOR_WAIT_SECONDS.observe(started - submitted)
+        try:
+            return getattr(self.db, method)(*args)
+        finally:
+            QUERY_SECONDS.observe(time.perf_counter() - started, method)
+
+    async def query(self, query_text, params=None, read_only=False):
+        return await self._run('query', query_text, params, read_only)
+
+    async def query_one(self, query_text, params=None, read_only=False):
+        return await self._run('query_one', query_text, params, read_only)
+
+    async def execute(self, query_text, params=None):
+        return await self._run('execute', query_text, params)
+
+    async def execute_many(self, query_text, params_list):
+        return await self._run('execute_many', query_text, params_list)
+
+    async def execute_values(self, query_text, rows, template=None, page_size=500):
+        return await self._run('execute_values', query_text, rows, template, page_size)
+
+    async def query_prepared(self, name, params=(), commit=False):
+        return await self._run('query_prepared', name, params, commit)
+
+    async def query_one_prepared(self, name, params=(), commit=False):
+        return await self._run('query_one_prepared', name, params, commit)
+
+    async def execute_prepared(self, name, params=()):
+        return await self._run('execute_prepared', name, params)
+
+    async def run(self, fn, *args):
+        """Run any blocking callable (e.g. a multi-statement transaction) on the executor"""
+        if self.executor is None:
+            self.start()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+# Singleton instance
+adb = AsyncDatabase(db, max_workers=settings.DB_ASYNC_WORKERS)
+
+metrics.gauge_callback('iot_db_async_in_flight', 'Awaited queries running or waiting for a thread',
+                       lambda: adb.in_flight)
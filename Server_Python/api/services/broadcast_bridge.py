@@ -0,0 +1,190 @@
+import logging
+import asyncio
+import itertools
+from collections import OrderedDict
+from services.websocket_manager import ws_manager
+from services.metrics import metrics
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'coalesce')
+
+class BroadcastBridge:
+    def __init__(self, max_pending=1000, overflow_policy='drop_oldest', batch_size=100):
+        """
+        Hands WebSocket broadcasts from the MQTT thread to the event loop.
+
+        Args:
+            max_pending: Messages held before the oldest is dropped (default: 1000)
+            overflow_policy: 'drop_oldest', or 'coalesce' to keep only the newest
+                telemetry/status message per device while a burst is pending
+            batch_size: Messages sent per drain pass before yielding to the loop
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy: {overflow_policy}')
+
+        self.max_pending = max_pending
+        self.overflow_policy = overflow_policy
+        self.batch_size = batch_size
+        self.running = False
+        self.loop = None
+        self.task = None
+        self.wakeup = None
+
+        # Set in ingest workers, which have no WebSocket clients of their own
+        self.relay = None
+
+        # Only touched on the event loop thread: key -> message, oldest first
+        self.pending = OrderedDict()
+        self.sequence = itertools.count()
+
+        # Stats
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.relayed = 0
+
+    def set_relay(self, relay):
+        """Forward every broadcast to relay(message) instead of local WebSocket clients"""
+        self.relay = relay
+
+    async def start(self):
+        """Bind to the running event loop and start draining"""
+        if self.running:
+            return
+
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.running = True
+        self.task = asyncio.create_task(self._drain_loop())
+        logger.info(f'Broadcast bridge started (max pending: {self.max_pending}, '
+                   f'overflow: {self.overflow_policy})')
+
+    async def stop(self):
+        """Stop draining; anything still pending is discarded"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        logger.info('Broadcast bridge stopped')
+
+    def publish(self, message):
+        """Thread-safe: schedule a broadcast on the event loop without blocking the caller"""
+        if self.relay:
+            if self.relay(message):
+                self.relayed += 1
+            else:
+                self.dropped += 1
+            return
+
+        if not self.running:
+            self.dropped += 1
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self._enqueue, message)
+        except RuntimeError:
+            # Loop closed during shutdown
+            self.dropped += 1
+
+    def _coalesce_key(self, message):
+        msg_type = message.get('type')
+        if msg_type == 'telemetry':
+            return ('telemetry', message.get('data', {}).get('device_id'))
+        if msg_type == 'device_status':
+            return ('device_status', message.get('device_id'))
+        # Access events and alerts are never merged
+        return None
+
+    def _enqueue(self, message):
+        self.published += 1
+
+        key = self._coalesce_key(message) if self.overflow_policy == 'coalesce' else None
+        if key is not None and key in self.pending:
+            # Replace in place: newest payload, original queue position
+            self.pending[key] = message
+            self.coalesced += 1
+        else:
+            self.pending[key if key is not None else next(self.sequence)] = message
+
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+
+        self.wakeup.set()
+
+    async def _drain_loop(self):
+        """Wait for work, then send everything pending in batches"""
+        while self.running:
+            try:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+
+                while self.pending:
+                    count = min(self.batch_size, len(self.pending))
+                    batch = [self.pending.popitem(last=False)[1] for _ in range(count)]
+
+                    for message in batch:
+                        await self._dispatch(message)
+
+                    # Let other tasks (HTTP, new enqueues) run between batches
+                    await asyncio.sleep(0)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f'Error processing WebSocket broadcast: {e}', exc_info=True)
+
+    async def _dispatch(self, message):
+        try:
+            msg_type = message.get('type')
+            user_id = message.get('user_id')
+            data = message.get('data')
+
+            if msg_type == 'telemetry':
+                await ws_manager.broadcast_telemetry(user_id, data)
+            elif msg_type == 'access_event':
+                await ws_manager.broadcast_access_event(user_id, data)
+            elif msg_type == 'device_status':
+                await ws_manager.broadcast_device_status(message.get('device_id'), user_id, data)
+            elif msg_type == 'alert':
+                await ws_manager.broadcast_alert(user_id, data)
+
+            self.delivered += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f'WebSocket broadcast error: {e}')
+
+    def get_stats(self):
+        """Queue depth and drop counters for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'overflow_policy': self.overflow_policy,
+            'pending': len(self.pending),
+            'max_pending': self.max_pending,
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'relayed': self.relayed
+        }
+
+# Singleton instance
+broadcast_bridge = BroadcastBridge(
+    max_pending=settings.WS_BROADCAST_MAX_PENDING,
+    overflow_policy=settings.WS_BROADCAST_OVERFLOW
+)
+
+metrics.gauge_callback('iot_ws_queue_depth', 'WebSocket broadcasts waiting on the event loop',
+                       lambda: len(broadcast_bridge.pending))
+metrics.counter_callback('iot_ws_dropped_total', 'WebSocket broadcasts dropped on overflow or shutdown',
+                         lambda: broadcast_bridge.dropped)
+metrics.counter_callback('iot_ws_delivered_total', 'WebSocket broadcasts handed to ws_manager',
+                         lambda: broadcast_bridge.delivered)
@@ -1,29 +1,149 @@
 import psycopg2
-from psycopg2.pool import ThreadedConnectionPool
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.extensions import AsIs, encodings, connection as PGConnection
 from contextlib import contextmanager
 import logging
+import threading
+import time
+import uuid
 from config.settings import settings
+from services.metrics import metrics
+from services.query_stats import query_stats
+from services.replicas import ReplicaSet, REPLICA_ERRORS
 
 logger = logging.getLogger(__name__)
 
+POOL_CHECKOUT_SECONDS = metrics.histogram(
+    'iot_db_pool_checkout_seconds', 'Time spent waiting for a pooled connection'
+)
+BATCH_STATEMENTS = metrics.histogram(
+    'iot_db_batch_statements', 'Statements committed per unit of work',
+    buckets=(1, 2, 3, 5, 10, 25, 50, 100)
+)
+READS_TOTAL = metrics.counter(
+    'iot_db_read_only_queries_total', 'read_only queries by where they ran', labels=('target',)
+)
+PREPARED_FALLBACKS = metrics.counter(
+    'iot_db_prepared_fallbacks_total', 'Prepared statements found missing on a connection and re-prepared'
+)
+
+# Raised when the connection's record of prepared statements is out of step with the server
+PREPARED_MISMATCH = (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.DuplicatePreparedStatement)
+
 class DatabaseError(Exception):
     pass
 
+class PreparingConnection(PGConnection):
+    """Connection that remembers which named statements it has prepared"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class Statement:
+    def __init__(self, name, query_text, param_types):
+        """
+        A named statement, prepared once per connection and run with EXECUTE.
+
+        Args:
+            name: Server-side statement name
+            query_text: SQL using $1..$n placeholders
+            param_types: Postgres type of each parameter, e.g. ('text', 'timestamptz[]')
+        """
+        self.name = name
+        self.prepare_sql = f'PREPARE {name}'
+        if param_types:
+            self.prepare_sql += f' ({", ".join(param_types)})'
+        self.prepare_sql += f' AS {query_text}'
+
+        # Explicit casts: list parameters are rendered as ARRAY[...] literals
+        self.execute_sql = f'EXECUTE {name}'
+        if param_types:
+            self.execute_sql += ' (' + ', '.join(f'%s::{t}' for t in param_types) + ')'
+
+class Batch:
+    def __init__(self, database, conn):
+        """
+        Unit of work on one pooled connection, committed once by Database.batch().
+
+        execute/execute_values are deferred: they are rendered client-side and sent
+        together as a single multi-statement round trip when the batch is flushed
+        (before a query() or on commit). query() runs at once so its rows can be used.
+
+        Args:
+            database: Database owning the prepared statement registry
+            conn: Connection checked out for the lifetime of the batch
+        """
+        self.database = database
+        self.conn = conn
+        self.cursor = conn.cursor(cursor_factory=RealDictCursor)
+        self.pending = []
+        self.statements = 0
+
+    def execute(self, query_text, params=None):
+        """Queue a statement whose result isn't needed"""
+        self.pending.append(self.cursor.mogrify(query_text, params))
+        self.statements += 1
+
+    def execute_values(self, query_text, rows, template=None):
+        """Queue a multi-row statement: rows expand into its single VALUES %s placeholder"""
+        if not rows:
+            return
+        if template is None:
+            template = '(' + ', '.join(['%s'] * len(rows[0])) + ')'
+        values = b', '.join(self.cursor.mogrify(template, row) for row in rows)
+        self.execute(query_text, (AsIs(values.decode(encodings[self.conn.encoding])),))
+
+    def query(self, query_text, params=None):
+        """Flush queued statements, then run this one and return its rows"""
+        self.flush()
+        self.cursor.execute(query_text, params)
+        self.statements += 1
+        return self.cursor.fetchall() if self.cursor.description else []
+
+    def query_one(self, query_text, params=None):
+        result = self.query(query_text, params)
+        return result[0] if result else None
+
+    def execute_prepared(self, name, params=()):
+        """Queue EXECUTE of a registered statement (prepared on this connection first if needed)"""
+        statement = self.database.statements[name]
+        self.database._ensure_prepared(self.conn, self.cursor, statement)
+        self.execute(statement.execute_sql, params)
+
+    def query_prepared(self, name, params=()):
+        """Flush queued statements, then EXECUTE a registered statement and return its rows"""
+        statement = self.database.statements[name]
+        self.database._ensure_prepared(self.conn, self.cursor, statement)
+        return self.query(statement.execute_sql, params)
+
+    def flush(self):
+        """Send all queued statements in one round trip"""
+        if self.pending:
+            statements, self.pending = self.pending, []
+            self.cursor.execute(b';\n'.join(statements))
+
 class Database:
     def __init__(self):
         self.pool = None
+        self.statements = {}
+        self.replicas = ReplicaSet()
+        # Pool wait of the current thread's last checkout, for query stats
+        self.local = threading.local()
     
-    def connect(self):
+    def connect(self, minconn=2, maxconn=20):
         try:
             self.pool = ThreadedConnectionPool(
-                minconn=2,
-                maxconn=20,
+                minconn=minconn,
+                maxconn=maxconn,
                 host=settings.DB_HOST,
                 port=settings.DB_PORT,
                 database=settings.DB_NAME,
                 user=settings.DB_USER,
-                password=settings.DB_PASSWORD
+                password=settings.DB_PASSWORD,
+                connection_factory=PreparingConnection
             )
             logger.info(f'Database pool created: {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}')
             
@@ -42,11 +162,28 @@ class Database:
             logger.error(f'Database connection failed: {e}')
             raise DatabaseError(f'Failed to connect to database: {e}')
     
+    def connect_replicas(self):
+        """Open pools for DB_REPLICA_DSNS (if any); read_only queries are routed to them"""
+        self.replicas.connect(
+            settings.DB_REPLICA_DSNS,
+            maxconn=settings.DB_REPLICA_POOL,
+            max_lag=settings.DB_REPLICA_MAX_LAG_S,
+            check_interval=settings.DB_REPLICA_CHECK_INTERVAL_S
+        )
+        if self.replicas.replicas:
+            healthy = sum(1 for replica in self.replicas.replicas if replica.healthy)
+            logger.info(f'Read replicas: {healthy}/{len(self.replicas.replicas)} in service')
+    
     def get_connection(self):
         """Get connection from pool"""
         if not self.pool:
             raise DatabaseError('Database pool not initialized')
-        return self.pool.getconn()
+        started = time.perf_counter()
+        conn = self.pool.getconn()
+        waited = time.perf_counter() - started
+        POOL_CHECKOUT_SECONDS.observe(waited)
+        self.local.pool_wait = waited
+        return conn
     
     def put_connection(self, conn):
         """Return connection to pool"""
@@ -66,7 +203,115 @@ class Database:
         finally:
             self.put_connection(conn)
     
-    def query(self, query_text, params=None):
+    @contextmanager
+    def batch(self):
+        """
+        Run several statements as one transaction on one connection:
+
+            with db.batch() as batch:
+                batch.execute(...)
+                batch.execute_values(...)
+
+        Commits once on a clean exit (explicitly, not by sniffing the SQL verb)
+        and rolls everything back if any statement or the block raises.
+        """
+        conn = self.get_connection()
+        batch = Batch(self, conn)
+        try:
+            yield batch
+            batch.flush()
+            conn.commit()
+            BATCH_STATEMENTS.observe(batch.statements)
+        except psycopg2.Error as e:
+            conn.rollback()
+            if isinstance(e, PREPARED_MISMATCH):
+                # The transaction is gone, so no retry; fix the record for the next batch
+                self._sync_prepared(conn)
+            logger.error(f'Batch rolled back: {e}')
+            raise DatabaseError(f'Database batch error: {e}')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            batch.cursor.close()
+            self.put_connection(conn)
+    
+    def _instrumented(self, method, query_text, params, stats_text=None):
+        """Time one call for query_stats (timing, rows, pool wait, slow log)"""
+        started = time.perf_counter()
+        self.local.pool_wait = 0.0
+        rows = 0
+        error = True
+        try:
+            result = method(query_text, params)
+            if isinstance(result, list):
+                rows = len(result)
+            elif isinstance(result, tuple):
+                rows = len(result[0]) if result[0] else max(result[1], 0)
+            else:
+                rows = max(result, 0)
+            error = False
+            return result
+        finally:
+            query_stats.observe(self, stats_text or query_text, params, time.perf_counter() - started,
+                                self.local.pool_wait, rows, error)
+
+    def query(self, query_text, params=None, read_only=False):
+        """
+        Run a statement and return its rows.
+
+        Args:
+            query_text: SQL with %s placeholders
+            params: Parameters for the placeholders
+            read_only: May run on a read replica (reporting queries that tolerate
+                       DB_REPLICA_MAX_LAG_S of staleness); falls back to the primary
+        """
+        if read_only and self.replicas.cycle:
+            method = self._query_read_only
+        else:
+            method = self._query
+        if query_stats.active:
+            return self._instrumented(method, query_text, params)
+        return method(query_text, params)
+
+    def _query_read_only(self, query_text, params=None):
+        replica = self.replicas.pick()
+        if replica is None:
+            READS_TOTAL.inc('primary')
+            return self._query(query_text, params)
+
+        try:
+            conn = replica.pool.getconn()
+        except PoolError:
+            # Pool exhausted: the replica is busy, not broken, so keep it in rotation
+            READS_TOTAL.inc('primary_fallback')
+            return self._query(query_text, params)
+        except Exception as e:
+            self.replicas.mark_down(replica, e)
+            READS_TOTAL.inc('primary_fallback')
+            return self._query(query_text, params)
+
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query_text, params)
+            result = cursor.fetchall() if cursor.description else []
+            cursor.close()
+            conn.rollback()
+            replica.pool.putconn(conn)
+            READS_TOTAL.inc('replica')
+            return result
+        except REPLICA_ERRORS as e:
+            replica.pool.putconn(conn, close=True)
+            self.replicas.mark_down(replica, e)
+            READS_TOTAL.inc('primary_fallback')
+            return self._query(query_text, params)
+        except Exception as e:
+            conn.rollback()
+            replica.pool.putconn(conn)
+            logger.error(f'Replica query error: {e}')
+            raise DatabaseError(f'Database query error: {e}')
+
+    def _query(self, query_text, params=None):
         conn = self.get_connection()
         try:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -107,11 +352,16 @@ class Database:
         finally:
             self.put_connection(conn)
     
-    def query_one(self, query_text, params=None):
-        result = self.query(query_text, params)
+    def query_one(self, query_text, params=None, read_only=False):
+        result = self.query(query_text, params, read_only)
         return result[0] if result and len(result) > 0 else None
     
     def execute(self, query_text, params=None):
+        if query_stats.active:
+            return self._instrumented(self._execute, query_text, params)
+        return self._execute(query_text, params)
+
+    def _execute(self, query_text, params=None):
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
@@ -131,6 +381,11 @@ class Database:
             self.put_connection(conn)
     
     def execute_many(self, query_text, params_list):
+        if query_stats.active:
+            return self._instrumented(self._execute_many, query_text, params_list)
+        return self._execute_many(query_text, params_list)
+
+    def _execute_many(self, query_text, params_list):
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
@@ -149,11 +404,182 @@ class Database:
         finally:
             self.put_connection(conn)
     
+    def execute_values(self, query_text, rows, template=None, page_size=500):
+        """Multi-row insert: expand rows into the single VALUES %s placeholder"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            execute_values(cursor, query_text, rows, template=template, page_size=page_size)
+            affected_rows = cursor.rowcount
+            conn.commit()
+            cursor.close()
+            
+            logger.debug(f'Execute values: {len(rows)} rows sent, {affected_rows} rows affected')
+            return affected_rows
+            
+        except Exception as e:
+            conn.rollback()
+            logger.error(f'Execute values error: {e}')
+            raise DatabaseError(f'Database bulk insert error: {e}')
+        finally:
+            self.put_connection(conn)
+    
+    def prepare(self, name, query_text, param_types=()):
+        """
+        Register a named statement. It is PREPAREd lazily on each pooled connection
+        the first time it runs there, so the server parses and plans it once per
+        connection instead of once per call.
+
+        Args:
+            name: Statement name, unique across the process
+            query_text: SQL using $1..$n placeholders
+            param_types: Postgres type of each parameter
+        """
+        self.statements[name] = Statement(name, query_text, param_types)
+
+    def _ensure_prepared(self, conn, cursor, statement):
+        if statement.name not in conn.prepared:
+            cursor.execute(statement.prepare_sql)
+            conn.prepared.add(statement.name)
+
+    def _sync_prepared(self, conn):
+        """Reload the connection's prepared set from the server (after a mismatch)"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name FROM pg_prepared_statements')
+            conn.prepared = {row[0] for row in cursor.fetchall()}
+            cursor.close()
+            conn.rollback()
+        except psycopg2.Error as e:
+            conn.prepared = set()
+            logger.warning(f'Could not read prepared statements: {e}')
+
+    def _run_prepared(self, name, params, commit):
+        if query_stats.active:
+            statement = self.statements[name]
+            return self._instrumented(
+                lambda _, run_params: self._execute_prepared(name, run_params, commit),
+                statement.execute_sql, params, stats_text=statement.prepare_sql
+            )
+        return self._execute_prepared(name, params, commit)
+
+    def _execute_prepared(self, name, params, commit):
+        statement = self.statements[name]
+        conn = self.get_connection()
+        try:
+            # A recycled or reset connection may have lost its statements: re-prepare once
+            for attempt in range(2):
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                try:
+                    self._ensure_prepared(conn, cursor, statement)
+                    cursor.execute(statement.execute_sql, params)
+                    result = cursor.fetchall() if cursor.description else []
+                    affected_rows = cursor.rowcount
+                    if commit:
+                        conn.commit()
+                    return result, affected_rows
+                except PREPARED_MISMATCH:
+                    conn.rollback()
+                    self._sync_prepared(conn)
+                    if attempt:
+                        raise
+                    PREPARED_FALLBACKS.inc()
+                    logger.warning(f'Prepared statement {name} out of sync on connection, re-preparing')
+                finally:
+                    cursor.close()
+
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.error(f'Prepared statement {name} error: {e}')
+            raise DatabaseError(f'Database query error: {e}')
+        finally:
+            self.put_connection(conn)
+
+    def query_prepared(self, name, params=(), commit=False):
+        """
+        EXECUTE a registered statement and return its rows.
+
+        Args:
+            name: Statement registered with prepare()
+            params: One value per $n parameter
+            commit: Commit afterwards (writes, including UPDATE ... RETURNING)
+        """
+        return self._run_prepared(name, params, commit)[0]
+
+    def query_one_prepared(self, name, params=(), commit=False):
+        result = self.query_prepared(name, params, commit)
+        return result[0] if result else None
+
+    def execute_prepared(self, name, params=()):
+        """EXECUTE a registered statement, commit, and return the affected row count"""
+        return self._run_prepared(name, params, True)[1]
+
+    def stream(self, query_text, params=None, batch_size=5000, read_only=False):
+        """
+        Yield (columns, rows) batches from a named server-side cursor, so memory
+        stays at one batch however many rows match. The connection is held until
+        the generator is exhausted or closed.
+
+        Args:
+            query_text: SELECT with %s placeholders
+            params: Parameters for the placeholders
+            batch_size: Rows per FETCH (default: 5000)
+            read_only: Prefer a read replica (a replica failing mid-stream is not retried)
+        """
+        replica = self.replicas.pick() if read_only else None
+        conn = None
+        if replica:
+            try:
+                conn = replica.pool.getconn()
+            except PoolError:
+                replica = None
+            except Exception as e:
+                self.replicas.mark_down(replica, e)
+                replica = None
+        if conn is None:
+            conn = self.get_connection()
+
+        cursor = conn.cursor(name=f'stream_{uuid.uuid4().hex[:12]}')
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(query_text, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [column.name for column in cursor.description], rows
+        except psycopg2.Error as e:
+            logger.error(f'Stream query error: {e}')
+            raise DatabaseError(f'Database stream error: {e}')
+        finally:
+            # Also reached when the consumer stops early (client disconnect);
+            # the pool drops the connection if it broke
+            try:
+                if not conn.closed:
+                    cursor.close()
+                    conn.rollback()
+            except psycopg2.Error as e:
+                logger.warning(f'Could not close stream cursor: {e}')
+            if replica:
+                replica.pool.putconn(conn)
+            else:
+                self.put_connection(conn)
+    
     def close(self):
         """Close all connections in pool"""
+        self.replicas.close()
         if self.pool:
             self.pool.closeall()
             logger.info('Database pool closed')
 
 # Singleton instance
-db = Database()
\ No newline at end of file
+db = Database()
+
+metrics.gauge_callback(
+    'iot_db_pool_in_use', 'Connections currently checked out of the pool',
+    lambda: len(db.pool._used) if db.pool else 0
+)
+metrics.gauge_callback(
+    'iot_db_replicas_healthy', 'Read replicas currently taking read_only queries',
+    lambda: sum(1 for replica in db.replicas.replicas if replica.healthy)
+)
@@ -0,0 +1,164 @@
+import logging
+import select
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+from services.database import db
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class DeviceRegistry:
+    def __init__(self, channel='devices_changed', reconnect_delay=5):
+        """
+        Args:
+            channel: Postgres NOTIFY channel fired by the devices trigger in schema.sql
+            reconnect_delay: Seconds to wait before re-opening a lost LISTEN connection
+        """
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.running = False
+        self.thread = None
+        self.loaded = False
+
+        # device_id -> {'gateway_id', 'user_id', 'device_type'}
+        self.devices = {}
+        self.lock = threading.Lock()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.invalidations = 0
+
+    def start(self):
+        """Load all devices and start listening for changes"""
+        if self.running:
+            return
+
+        self.load()
+        self.running = True
+        self.thread = threading.Thread(target=self._listen_loop, name='device-registry', daemon=True)
+        self.thread.start()
+        logger.info(f'Device registry started ({len(self.devices)} devices, channel: {self.channel})')
+
+    def stop(self):
+        """Stop the LISTEN thread"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.reconnect_delay + 1)
+        logger.info('Device registry stopped')
+
+    def load(self):
+        """(Re)load the whole devices table into memory"""
+        rows = db.query('SELECT device_id, gateway_id, user_id, device_type FROM devices')
+        devices = {
+            row['device_id']: {
+                'gateway_id': row['gateway_id'],
+                'user_id': row['user_id'],
+                'device_type': row['device_type']
+            }
+            for row in rows
+        }
+
+        with self.lock:
+            self.devices = devices
+            self.loaded = True
+        self.reloads += 1
+        logger.debug(f'Device registry loaded: {len(devices)} devices')
+
+    def invalidate(self, device_id=None):
+        """Refresh one device from the database, or everything when device_id is None"""
+        self.invalidations += 1
+        if device_id is None:
+            self.load()
+            return
+
+        row = db.query_one(
+            'SELECT device_id, gateway_id, user_id, device_type FROM devices WHERE device_id = %s',
+            (device_id,)
+        )
+
+        with self.lock:
+            if row:
+                self.devices[device_id] = {
+                    'gateway_id': row['gateway_id'],
+                    'user_id': row['user_id'],
+                    'device_type': row['device_type']
+                }
+            else:
+                self.devices.pop(device_id, None)
+
+    def get(self, device_id, gateway_id=None):
+        """Return cached device info, or None if unknown (or registered to another gateway)"""
+        if not self.loaded:
+            self.load()
+
+        device = self.devices.get(device_id)
+        if device is None or (gateway_id is not None and device['gateway_id'] != gateway_id):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return device
+
+    def _connect_listener(self):
+        conn = psycopg2.connect(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            database=settings.DB_NAME,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        cursor.execute(f'LISTEN {self.channel}')
+        cursor.close()
+        return conn
+
+    def _listen_loop(self):
+        """Apply NOTIFY payloads (device_id) as they arrive; reconnect and reload on failure"""
+        conn = None
+        while self.running:
+            try:
+                if conn is None:
+                    conn = self._connect_listener()
+                    # Notifications sent while we were disconnected are lost
+                    self.load()
+
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.invalidate(notify.payload or None)
+                    logger.debug(f'Device registry invalidated: {notify.payload}')
+
+            except Exception as e:
+                logger.error(f'Device registry listener error: {e}')
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                    conn = None
+                time.sleep(self.reconnect_delay)
+
+        if conn is not None:
+            conn.close()
+
+    def get_stats(self):
+        """Cache size and hit/miss counters for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'devices': len(self.devices),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reloads': self.reloads,
+            'invalidations': self.invalidations
+        }
+
+# Singleton instance
+device_registry = DeviceRegistry()
@@ -0,0 +1,275 @@
+import csv
+import io
+import json
+import logging
+import threading
+from datetime import datetime
+from services.database import db
+from services.telemetry_rollups import export_query
+from config.settings import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for format=parquet
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+# table -> (exported columns, optional equality filters); user_id scoping is always applied
+EXPORTS = {
+    'telemetry': (
+        ('time', 'device_id', 'gateway_id', 'temperature', 'humidity', 'metadata'),
+        ('device_id',)
+    ),
+    'access_logs': (
+        ('time', 'device_id', 'gateway_id', 'method', 'result', 'password_id', 'rfid_uid',
+         'deny_reason', 'metadata'),
+        ('device_id', 'result')
+    )
+}
+
+# Parquet column types; anything not listed is a string
+PARQUET_FLOAT_COLUMNS = ('temperature', 'humidity')
+
+class ExportBusy(Exception):
+    pass
+
+class ExportUnavailable(Exception):
+    pass
+
+def _parse_time(value, name):
+    """ISO 8601 start/end -> datetime; ValueError naming the parameter otherwise"""
+    try:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid {name} time '{value}' (use ISO 8601, e.g. 2024-01-31T00:00:00Z)")
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+class _ByteSink(io.RawIOBase):
+    """Write target for ParquetWriter; bytes are drained after every row group"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class ExportStream:
+    def __init__(self, query_text, params, fmt, columns, batch_size, slot):
+        """
+        Iterator of encoded chunks for a StreamingResponse. Starlette iterates it on
+        a worker thread, one database batch per chunk, so the event loop never waits
+        on the cursor. Closing (or garbage collection after a disconnect) closes the
+        cursor and frees the export slot.
+
+        Args:
+            query_text: SELECT for Database.stream
+            params: Its parameters
+            fmt: 'csv', 'ndjson' or 'parquet'
+            columns: Column names, for the CSV header and the Parquet schema
+            batch_size: Rows per FETCH / per chunk
+            slot: Semaphore released when the stream ends
+        """
+        self.fmt = fmt
+        self.columns = columns
+        self.slot = slot
+        self.progress = [0]
+        self.batches = db.stream(query_text, params, batch_size=batch_size, read_only=True)
+        self.chunks = self._encode()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as e:
+            logger.error(f'Export failed after {self.rows} rows: {e}')
+            self.close()
+            raise
+
+    def close(self):
+        if self.slot is None:
+            return
+        self.chunks.close()
+        self.batches.close()
+        self.slot.release()
+        self.slot = None
+        logger.info(f'Export ended after {self.rows} rows')
+
+    def __del__(self):
+        self.close()
+
+    def _encode(self):
+        # Module-level encoders keep no reference back to the stream, so dropping
+        # the stream after a disconnect runs __del__ at once instead of at GC time
+        encoder = {'csv': encode_csv, 'ndjson': encode_ndjson, 'parquet': encode_parquet}[self.fmt]
+        return encoder(self.batches, self.columns, self.progress)
+
+    @property
+    def rows(self):
+        return self.progress[0]
+
+def encode_csv(batches, columns, progress):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+
+    for _, rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow([
+                json.dumps(value) if isinstance(value, (dict, list)) else _json_value(value)
+                for value in row
+            ])
+        progress[0] += len(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+def encode_ndjson(batches, columns, progress):
+    for names, rows in batches:
+        lines = [
+            json.dumps({name: _json_value(value) for name, value in zip(names, row)}, default=str)
+            for row in rows
+        ]
+        progress[0] += len(rows)
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+def encode_parquet(batches, columns, progress):
+    schema = pa.schema([
+        (column,
+         pa.timestamp('us', tz='UTC') if column == 'time'
+         else pa.float64() if column in PARQUET_FLOAT_COLUMNS
+         else pa.string())
+        for column in columns
+    ])
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for _, rows in batches:
+            arrays = []
+            for field, values in zip(schema, zip(*rows)):
+                if pa.types.is_string(field.type):
+                    values = [
+                        None if value is None
+                        else json.dumps(value) if isinstance(value, (dict, list))
+                        else str(value)
+                        for value in values
+                    ]
+                arrays.append(pa.array(values, type=field.type))
+
+            # One row group per batch, written out before the next fetch
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            progress[0] += len(rows)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+class ExportService:
+    def __init__(self, max_concurrent=2, batch_size=5000):
+        """
+        Full-range exports of a user's telemetry/access logs. Telemetry older
+        than the raw retention (7 days) is exported from the rollups, as
+        1-minute averages up to 90 days back and hourly averages beyond.
+
+        Each running export holds one database connection (a replica's when
+        available), so they are capped at max_concurrent.
+
+        Args:
+            max_concurrent: Exports running at once; more are refused (default: 2)
+            batch_size: Rows fetched per round trip (default: 5000)
+        """
+        self.batch_size = batch_size
+        self.max_concurrent = max_concurrent
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+
+    def open(self, table, user_id, fmt, start=None, end=None, **filters):
+        """
+        Build the scoped query and return (ExportStream, media type, file extension).
+
+        Raises:
+            ValueError: Malformed or inverted start/end
+            ExportUnavailable: Parquet requested without pyarrow installed
+            ExportBusy: max_concurrent exports are already running
+        """
+        if fmt == 'parquet' and pa is None:
+            raise ExportUnavailable('Parquet export requires pyarrow')
+
+        # Validate before the response starts: once headers are sent, a bad value
+        # would only surface at the first FETCH as a silently truncated file
+        start = _parse_time(start, 'start') if start else None
+        end = _parse_time(end, 'end') if end else None
+        if start and end and (start.tzinfo is None) == (end.tzinfo is None) and start > end:
+            raise ValueError('start must not be after end')
+
+        columns, filter_columns = EXPORTS[table]
+        if table == 'telemetry':
+            # Raw rows are only kept for 7 days: older ranges come from the rollups
+            query, params = export_query(columns, user_id, filters.get('device_id'), start=start, end=end)
+        else:
+            query, params = self._table_query(table, columns, filter_columns, user_id, start, end, filters)
+
+        if not self.slots.acquire(blocking=False):
+            raise ExportBusy(f'{self.max_concurrent} exports already running, try again later')
+
+        media_type, extension = FORMATS[fmt]
+        stream = ExportStream(query, params, fmt, columns, self.batch_size, self.slots)
+        logger.info(f'Export started: {table} for user {user_id} as {fmt}')
+        return stream, media_type, extension
+
+    def _table_query(self, table, columns, filter_columns, user_id, start, end, filters):
+        query = f'SELECT {", ".join(columns)} FROM {table} WHERE user_id = %s'
+        params = [user_id]
+
+        for column in filter_columns:
+            if filters.get(column):
+                query += f' AND {column} = %s'
+                params.append(filters[column])
+
+        if start:
+            query += ' AND time >= %s'
+            params.append(start)
+
+        if end:
+            query += ' AND time <= %s'
+            params.append(end)
+
+        return query + ' ORDER BY time', tuple(params)
+
+# Singleton instance
+export_service = ExportService(
+    max_concurrent=settings.EXPORT_MAX_CONCURRENT,
+    batch_size=settings.EXPORT_BATCH_SIZE
+)
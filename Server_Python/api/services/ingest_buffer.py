@@ -0,0 +1,332 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from services.database import db
+from services.metrics import metrics
+from services.ingest_spool import ingest_spool
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+INSERT_SECONDS = metrics.histogram(
+    'iot_db_insert_seconds', 'Bulk INSERT latency per flush', labels=('table',)
+)
+COMMIT_LAG_SECONDS = metrics.histogram(
+    'iot_ingest_commit_lag_seconds', 'Gateway timestamp to database commit', labels=('table',)
+)
+ROWS_TOTAL = metrics.counter(
+    'iot_ingest_rows_total', 'Rows written or failed by the ingest buffer', labels=('table', 'result')
+)
+
+# Prepared once per connection; rows go in as one array per column, so a single
+# plan serves every batch size. user_id comes from the device registry, so no
+# join against devices is needed
+db.prepare('telemetry_insert', """
+    INSERT INTO telemetry (time, device_id, gateway_id, user_id, temperature, humidity, metadata)
+    SELECT * FROM unnest($1, $2, $3, $4, $5, $6, $7)
+""", ('timestamptz[]', 'text[]', 'text[]', 'text[]', 'float8[]', 'float8[]', 'jsonb[]'))
+
+db.prepare('access_insert', """
+    INSERT INTO access_logs (time, device_id, gateway_id, user_id, method, result, password_id, rfid_uid, deny_reason, metadata)
+    SELECT * FROM unnest($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+""", ('timestamptz[]', 'text[]', 'text[]', 'text[]', 'text[]', 'text[]', 'text[]', 'text[]', 'text[]', 'jsonb[]'))
+
+# Per-device latest reading, upserted with every telemetry batch. Each metric
+# keeps the newest non-NULL value; comparing timestamps keeps a replayed (older)
+# batch from overwriting newer values
+db.prepare('telemetry_latest_upsert', """
+    WITH batch AS (
+        SELECT * FROM unnest($1, $2, $3, $4, $5, $6)
+            AS t(time, device_id, gateway_id, user_id, temperature, humidity)
+    ),
+    latest AS (
+        SELECT DISTINCT ON (device_id) device_id, gateway_id, user_id, time
+        FROM batch ORDER BY device_id, time DESC
+    ),
+    temp AS (
+        SELECT DISTINCT ON (device_id) device_id, temperature, time
+        FROM batch WHERE temperature IS NOT NULL ORDER BY device_id, time DESC
+    ),
+    hum AS (
+        SELECT DISTINCT ON (device_id) device_id, humidity, time
+        FROM batch WHERE humidity IS NOT NULL ORDER BY device_id, time DESC
+    )
+    INSERT INTO telemetry_latest AS l
+        (device_id, gateway_id, user_id, time, temperature, temperature_time, humidity, humidity_time)
+    SELECT latest.device_id, latest.gateway_id, latest.user_id, latest.time,
+           temp.temperature, temp.time, hum.humidity, hum.time
+    FROM latest
+    LEFT JOIN temp USING (device_id)
+    LEFT JOIN hum USING (device_id)
+    ON CONFLICT (device_id) DO UPDATE SET
+        gateway_id = CASE WHEN EXCLUDED.time >= l.time THEN EXCLUDED.gateway_id ELSE l.gateway_id END,
+        user_id = CASE WHEN EXCLUDED.time >= l.time THEN EXCLUDED.user_id ELSE l.user_id END,
+        time = GREATEST(l.time, EXCLUDED.time),
+        temperature = CASE
+            WHEN l.temperature_time IS NULL OR EXCLUDED.temperature_time >= l.temperature_time
+            THEN COALESCE(EXCLUDED.temperature, l.temperature) ELSE l.temperature END,
+        temperature_time = GREATEST(l.temperature_time, EXCLUDED.temperature_time),
+        humidity = CASE
+            WHEN l.humidity_time IS NULL OR EXCLUDED.humidity_time >= l.humidity_time
+            THEN COALESCE(EXCLUDED.humidity, l.humidity) ELSE l.humidity END,
+        humidity_time = GREATEST(l.humidity_time, EXCLUDED.humidity_time)
+""", ('timestamptz[]', 'text[]', 'text[]', 'text[]', 'float8[]', 'float8[]'))
+
+# Granted access rows also bump the credential's last_used, in the same transaction.
+# GREATEST keeps a replayed (older) batch from moving last_used backwards.
+db.prepare('password_last_used', """
+    UPDATE passwords AS p
+    SET last_used = GREATEST(p.last_used, v.last_used), updated_at = v.last_used
+    FROM (
+        SELECT password_id, MAX(last_used) AS last_used
+        FROM unnest($1, $2) AS t(password_id, last_used)
+        GROUP BY password_id
+    ) AS v
+    WHERE p.password_id = v.password_id
+""", ('text[]', 'timestamptz[]'))
+
+db.prepare('rfid_last_used', """
+    UPDATE rfid_cards AS r
+    SET last_used = GREATEST(r.last_used, v.last_used), updated_at = v.last_used
+    FROM (
+        SELECT uid, MAX(last_used) AS last_used
+        FROM unnest($1, $2) AS t(uid, last_used)
+        GROUP BY uid
+    ) AS v
+    WHERE r.uid = v.uid
+""", ('text[]', 'timestamptz[]'))
+
+# table -> prepared INSERT; also used by the spool replayer
+TABLES = {
+    'telemetry': 'telemetry_insert',
+    'access_logs': 'access_insert'
+}
+
+def columns(rows):
+    """Transpose row tuples into one list per column (the unnest parameters)"""
+    return [list(column) for column in zip(*rows)]
+
+class IngestBuffer:
+    def __init__(self, max_batch=500, flush_interval=0.2, spool=None, slow_flush_ms=2000):
+        """
+        Args:
+            max_batch: Rows buffered before an immediate flush (default: 500)
+            flush_interval: Max seconds a row waits in memory (default: 0.2)
+            spool: IngestSpool taking rows when Postgres fails or is slow (optional)
+            slow_flush_ms: INSERT duration after which the next batch goes to the spool
+        """
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.spool = spool
+        self.slow_flush_ms = slow_flush_ms
+        self.db_slow = False
+        self.running = False
+        self.thread = None
+
+        # Rows are appended from the MQTT thread and swapped out by the flusher
+        self.lock = threading.Lock()
+        self.telemetry_rows = []
+        self.access_rows = []
+        self.wakeup = threading.Event()
+
+        # Stats
+        self.flush_count = 0
+        self.rows_flushed = 0
+        self.rows_failed = 0
+        self.rows_spooled = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.last_batch_size = 0
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.running:
+            return
+
+        if self.spool:
+            self.spool.start(self.insert_rows)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, name='ingest-flush', daemon=True)
+        self.thread.start()
+        logger.info(f'Ingest buffer started (batch: {self.max_batch} rows, '
+                   f'interval: {int(self.flush_interval * 1000)}ms)')
+
+    def stop(self):
+        """Stop the flush thread and write out whatever is still buffered"""
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.flush()
+        if self.spool:
+            self.spool.stop()
+        logger.info('Ingest buffer stopped')
+
+    def add_telemetry(self, timestamp, device_id, gateway_id, user_id, temperature, humidity, metadata):
+        """Queue one telemetry row (metadata is a JSON string)"""
+        with self.lock:
+            self.telemetry_rows.append((timestamp, device_id, gateway_id, user_id, temperature, humidity, metadata))
+            depth = len(self.telemetry_rows) + len(self.access_rows)
+
+        if depth >= self.max_batch:
+            self.wakeup.set()
+
+    def add_access(self, timestamp, device_id, gateway_id, user_id, method, result,
+                   password_id, rfid_uid, deny_reason, metadata):
+        """Queue one access log row (metadata is a JSON string)"""
+        with self.lock:
+            self.access_rows.append((timestamp, device_id, gateway_id, user_id, method, result,
+                                     password_id, rfid_uid, deny_reason, metadata))
+            depth = len(self.telemetry_rows) + len(self.access_rows)
+
+        if depth >= self.max_batch:
+            self.wakeup.set()
+
+    def queue_depth(self):
+        """Rows waiting to be flushed"""
+        with self.lock:
+            return len(self.telemetry_rows) + len(self.access_rows)
+
+    def _flush_loop(self):
+        """Flush every flush_interval, or sooner when a batch fills up"""
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Error in ingest flush loop: {e}', exc_info=True)
+
+    def flush(self):
+        """Write all buffered rows with one multi-row INSERT per table"""
+        with self.lock:
+            telemetry_rows, self.telemetry_rows = self.telemetry_rows, []
+            access_rows, self.access_rows = self.access_rows, []
+
+        if not telemetry_rows and not access_rows:
+            return
+
+        started = time.perf_counter()
+
+        if telemetry_rows:
+            self._write('telemetry', telemetry_rows)
+
+        if access_rows:
+            self._write('access_logs', access_rows)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.last_batch_size = len(telemetry_rows) + len(access_rows)
+
+        logger.debug(f'Ingest flush: {len(telemetry_rows)} telemetry, {len(access_rows)} access '
+                    f'in {elapsed_ms:.1f}ms')
+
+    def insert_rows(self, table, rows):
+        """Bulk INSERT rows into table; raises on failure (flush path and spool replayer)"""
+        with INSERT_SECONDS.time(table):
+            with db.batch() as batch:
+                batch.execute_prepared(TABLES[table], columns(rows))
+                if table == 'telemetry':
+                    # Every column but metadata
+                    batch.execute_prepared('telemetry_latest_upsert', columns(rows)[:6])
+                elif table == 'access_logs':
+                    self._queue_last_used(batch, rows)
+        self.rows_flushed += len(rows)
+        ROWS_TOTAL.inc(table, 'written', amount=len(rows))
+        self._observe_commit_lag(rows, table)
+
+    def _queue_last_used(self, batch, rows):
+        """Add the credential last_used updates for granted access rows to the batch"""
+        passwords, cards = [], []
+        for timestamp, _, _, _, _, result, password_id, rfid_uid, _, _ in rows:
+            if result != 'granted':
+                continue
+            if password_id:
+                passwords.append((password_id, timestamp))
+            elif rfid_uid:
+                cards.append((rfid_uid, timestamp))
+
+        if passwords:
+            batch.execute_prepared('password_last_used', columns(passwords))
+        if cards:
+            batch.execute_prepared('rfid_last_used', columns(cards))
+
+    def _write(self, table, rows):
+        if self.spool and (self.spool.has_backlog() or self.db_slow):
+            # Queue behind spooled rows so replay keeps arrival order
+            self._spool(table, rows, 'slow_flush' if self.db_slow else 'backlog')
+            self.db_slow = False
+            return
+
+        started = time.perf_counter()
+        try:
+            self.insert_rows(table, rows)
+        except Exception as e:
+            logger.error(f'Failed to flush {len(rows)} rows to {table}: {e}')
+            self._spool(table, rows, 'db_error')
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > self.slow_flush_ms:
+            logger.warning(f'Slow {table} flush ({elapsed_ms:.0f}ms), spooling the next batch')
+            self.db_slow = True
+
+    def _spool(self, table, rows, reason):
+        if not self.spool:
+            self.rows_failed += len(rows)
+            ROWS_TOTAL.inc(table, 'failed', amount=len(rows))
+            return
+
+        try:
+            self.spool.append(table, rows, reason)
+            self.rows_spooled += len(rows)
+            ROWS_TOTAL.inc(table, 'spooled', amount=len(rows))
+        except Exception as e:
+            self.rows_failed += len(rows)
+            ROWS_TOTAL.inc(table, 'failed', amount=len(rows))
+            logger.error(f'Failed to spool {len(rows)} {table} rows, dropping them: {e}')
+
+    def _observe_commit_lag(self, rows, table):
+        """Record how far each committed row trails its gateway timestamp (column 0)"""
+        now_local = datetime.now()
+        now_aware = now_local.astimezone()
+        for row in rows:
+            try:
+                timestamp = datetime.fromisoformat(row[0].replace('Z', '+00:00'))
+            except (TypeError, ValueError, AttributeError):
+                continue
+            now = now_aware if timestamp.tzinfo else now_local
+            COMMIT_LAG_SECONDS.observe(max((now - timestamp).total_seconds(), 0.0), table)
+
+    def get_stats(self):
+        """Queue depth and flush latency for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'queue_depth': self.queue_depth(),
+            'max_batch': self.max_batch,
+            'flush_interval_ms': int(self.flush_interval * 1000),
+            'flush_count': self.flush_count,
+            'rows_flushed': self.rows_flushed,
+            'rows_failed': self.rows_failed,
+            'rows_spooled': self.rows_spooled,
+            'spool': self.spool.get_stats() if self.spool else None,
+            'last_batch_size': self.last_batch_size,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
+
+# Singleton instance
+ingest_buffer = IngestBuffer(
+    max_batch=settings.INGEST_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL_MS / 1000,
+    spool=ingest_spool,
+    slow_flush_ms=settings.INGEST_SPOOL_SLOW_FLUSH_MS
+)
+
+metrics.gauge_callback('iot_ingest_queue_depth', 'Rows waiting for the next flush', ingest_buffer.queue_depth)
+metrics.gauge_callback('iot_ingest_last_flush_seconds', 'Duration of the last flush',
+                       lambda: ingest_buffer.last_flush_ms / 1000)
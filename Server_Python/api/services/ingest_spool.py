@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from services.database import db
+from services.metrics import metrics
+from config.settings import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, a single API process is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SPOOLED_ROWS_TOTAL = metrics.counter(
+    'iot_spool_spooled_rows_total', 'Rows written to the disk spool', labels=('table', 'reason')
+)
+REPLAYED_ROWS_TOTAL = metrics.counter(
+    'iot_spool_replayed_rows_total', 'Rows replayed from the disk spool into Postgres', labels=('table',)
+)
+DISCARDED_ROWS_TOTAL = metrics.counter(
+    'iot_spool_discarded_rows_total', 'Spooled rows Postgres rejected on their own (bad data)', labels=('table',)
+)
+
+class IngestSpool:
+    def __init__(self, path, replay_batch=2000, retry_interval=5.0):
+        """
+        Append-only SQLite (WAL) spool for ingest rows Postgres couldn't take.
+
+        Rows go in when a flush fails or runs slow, and while anything is spooled all
+        new rows queue behind it, so replay keeps arrival order. The replayer drains
+        the oldest rows in bulk through the writer given to start().
+
+        Args:
+            path: SQLite file; survives restarts and is resumed on the next start
+            replay_batch: Rows per replay INSERT (default: 2000)
+            retry_interval: Seconds between replay attempts while Postgres is down
+        """
+        self.path = path
+        self.replay_batch = replay_batch
+        self.retry_interval = retry_interval
+        self.writer = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.slot_lock = None
+
+        # Rows on disk, kept in memory so the flush path never queries SQLite to check
+        self.pending_rows = 0
+
+        # Stats
+        self.spooled = 0
+        self.replayed = 0
+        self.discarded = 0
+        self.last_replay_rows_per_s = 0.0
+
+    def claim_slot(self, max_slots=64):
+        """
+        Give this process a spool file of its own when several API processes share
+        the spool directory (`--workers N`): replayers sharing one file would each
+        insert the same oldest rows. Takes the first slot whose lock file no live
+        process holds; slot 0 keeps the configured path. The lock lasts as long as
+        the process, so a restarted one takes a freed slot over and replays its backlog.
+
+        Args:
+            max_slots: Slots tried before giving up (default: 64)
+        """
+        if fcntl is None or self.slot_lock:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        base, extension = os.path.splitext(self.path)
+        for slot in range(max_slots):
+            path = self.path if slot == 0 else f'{base}-api-{slot}{extension}'
+            lock_file = open(f'{path}.lock', 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self.path = path
+            self.slot_lock = lock_file
+            return
+
+        raise RuntimeError(f'No free ingest spool slot among {max_slots} next to {self.path}')
+
+    def start(self, writer):
+        """
+        Open the spool and start the replayer.
+
+        Args:
+            writer: Callable(table, rows) that inserts rows into Postgres, raising on failure
+        """
+        if self.running:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.writer = writer
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # Access logs are the point of the spool: fsync every commit
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, row TEXT NOT NULL)'
+        )
+        self.pending_rows = self.conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+        self.running = True
+        self.wakeup.clear()
+        self.thread = threading.Thread(target=self._replay_loop, name='ingest-spool-replay', daemon=True)
+        self.thread.start()
+
+        if self.pending_rows:
+            logger.warning(f'Ingest spool resumed with {self.pending_rows} rows to replay ({self.path})')
+        else:
+            logger.info(f'Ingest spool ready ({self.path})')
+
+    def stop(self):
+        """Stop replaying; spooled rows stay on disk for the next start"""
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+        if self.slot_lock:
+            self.slot_lock.close()
+            self.slot_lock = None
+        logger.info(f'Ingest spool stopped ({self.pending_rows} rows left)')
+
+    def has_backlog(self):
+        return self.pending_rows > 0
+
+    def append(self, table, rows, reason):
+        """Durably append rows in one transaction and wake the replayer"""
+        encoded = [(table, json.dumps(row)) for row in rows]
+        with self.lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany('INSERT INTO spool (table_name, row) VALUES (?, ?)', encoded)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.pending_rows += len(rows)
+
+        self.spooled += len(rows)
+        SPOOLED_ROWS_TOTAL.inc(table, reason, amount=len(rows))
+        self.wakeup.set()
+
+    def size_bytes(self):
+        """Spool file size including the WAL"""
+        total = 0
+        for suffix in ('', '-wal'):
+            try:
+                total += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return total
+
+    def _replay_loop(self):
+        while self.running:
+            if not self.pending_rows:
+                self.wakeup.wait(self.retry_interval)
+                self.wakeup.clear()
+                continue
+
+            try:
+                self.replay_once()
+            except Exception as e:
+                logger.warning(f'Spool replay paused, Postgres unavailable: {e}')
+                self.wakeup.wait(self.retry_interval)
+                self.wakeup.clear()
+
+    def replay_once(self):
+        """Replay the oldest batch; rows are deleted only after Postgres committed them"""
+        with self.lock:
+            batch = self.conn.execute(
+                'SELECT id, table_name, row FROM spool ORDER BY id LIMIT ?', (self.replay_batch,)
+            ).fetchall()
+            if not batch:
+                self.pending_rows = 0
+                return
+
+        started = time.perf_counter()
+
+        # Consecutive runs per table, so order is kept even when tables interleave
+        runs = []
+        for row_id, table, row in batch:
+            if runs and runs[-1][0] == table:
+                runs[-1][1].append(json.loads(row))
+                runs[-1][2] = row_id
+            else:
+                runs.append([table, [json.loads(row)], row_id])
+
+        for table, rows, last_id in runs:
+            self._replay_run(table, rows)
+            with self.lock:
+                self.conn.execute('DELETE FROM spool WHERE id <= ?', (last_id,))
+                self.pending_rows = max(self.pending_rows - len(rows), 0)
+
+        elapsed = time.perf_counter() - started
+        self.last_replay_rows_per_s = len(batch) / elapsed if elapsed > 0 else 0.0
+        logger.info(f'Replayed {len(batch)} spooled rows ({self.pending_rows} left)')
+
+    def _replay_run(self, table, rows):
+        try:
+            self.writer(table, rows)
+        except Exception:
+            # If Postgres answers, the batch itself is bad: retry row by row and discard rejects
+            if not self._postgres_available():
+                raise
+            self._replay_row_by_row(table, rows)
+            return
+
+        self.replayed += len(rows)
+        REPLAYED_ROWS_TOTAL.inc(table, amount=len(rows))
+
+    def _replay_row_by_row(self, table, rows):
+        for row in rows:
+            try:
+                self.writer(table, [row])
+                self.replayed += 1
+                REPLAYED_ROWS_TOTAL.inc(table)
+            except Exception as e:
+                if not self._postgres_available():
+                    raise
+                self.discarded += 1
+                DISCARDED_ROWS_TOTAL.inc(table)
+                logger.error(f'Discarding spooled {table} row rejected by Postgres: {e} ({row})')
+
+    def _postgres_available(self):
+        try:
+            db.query_one('SELECT 1 AS ok')
+            return True
+        except Exception:
+            return False
+
+    def get_stats(self):
+        """Backlog and replay counters for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'pending_rows': self.pending_rows,
+            'size_bytes': self.size_bytes(),
+            'spooled': self.spooled,
+            'replayed': self.replayed,
+            'discarded': self.discarded,
+            'last_replay_rows_per_s': round(self.last_replay_rows_per_s, 1)
+        }
+
+# Singleton instance
+ingest_spool = IngestSpool(settings.INGEST_SPOOL_PATH, replay_batch=settings.INGEST_SPOOL_REPLAY_BATCH)
+
+metrics.gauge_callback('iot_spool_pending_rows', 'Rows waiting in the disk spool', lambda: ingest_spool.pending_rows)
+metrics.gauge_callback('iot_spool_size_bytes', 'Disk spool size including the WAL', ingest_spool.size_bytes)
+metrics.gauge_callback('iot_spool_replay_rows_per_second', 'Throughput of the last replay batch',
+                       lambda: ingest_spool.last_replay_rows_per_s)
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+import psycopg2
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Server-side keepalives: the session of a leader whose host vanished (and with it
+# the lock) is dropped after ~10s instead of the kernel default of hours
+KEEPALIVE_OPTIONS = '-c tcp_keepalives_idle=5 -c tcp_keepalives_interval=2 -c tcp_keepalives_count=3'
+
+class LeaderElection:
+    def __init__(self, name, renew_interval=5):
+        """
+        Runs a periodic service in exactly one API process. Leadership is a
+        session-level advisory lock held on a dedicated connection: it lasts as
+        long as the session, so a crashed leader releases it at once and a
+        standby takes over on its next attempt. The leader renews its lease by
+        checking the session every renew_interval and steps down when it is gone.
+
+        Args:
+            name: Lock name, hashed to the advisory lock key
+            renew_interval: Seconds between acquire attempts / lease checks (default: 5)
+        """
+        self.name = name
+        self.renew_interval = renew_interval
+        self.conn = None
+        self.leader = False
+        self.running = False
+        self.task = None
+        self.on_elected = None
+        self.on_demoted = None
+
+        # Stats
+        self.elections = 0
+        self.leader_since = None
+        self.last_check = None
+
+    async def start(self, on_elected, on_demoted):
+        """
+        Start competing for leadership.
+
+        Args:
+            on_elected: Coroutine function starting the service
+            on_demoted: Coroutine function stopping it
+        """
+        if self.running:
+            return
+
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.running = True
+        self.task = asyncio.create_task(self._election_loop())
+        logger.info(f'Leader election started for {self.name} (renew every {self.renew_interval}s)')
+
+    async def stop(self):
+        """Stop the service if this process leads, and release the lock"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        if self.leader:
+            await self._demote('shutting down')
+        await asyncio.get_running_loop().run_in_executor(None, self._close)
+
+    async def _election_loop(self):
+        loop = asyncio.get_running_loop()
+        while self.running:
+            try:
+                if self.leader:
+                    if await loop.run_in_executor(None, self._renew):
+                        self.last_check = time.time()
+                    else:
+                        await self._demote('lease lost')
+                elif await loop.run_in_executor(None, self._try_acquire):
+                    self.last_check = time.time()
+                    await self._elect()
+                else:
+                    self.last_check = time.time()
+
+                await asyncio.sleep(self.renew_interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f'Leader election error for {self.name}: {e}')
+                await loop.run_in_executor(None, self._close)
+                await asyncio.sleep(self.renew_interval)
+
+    async def _elect(self):
+        self.leader = True
+        self.elections += 1
+        self.leader_since = time.time()
+        logger.info(f'Elected leader for {self.name}, starting it in this process')
+        try:
+            await self.on_elected()
+        except Exception as e:
+            # Give the lock up so a healthier process can take over
+            logger.error(f'Failed to start {self.name} as leader: {e}', exc_info=True)
+            await self._demote('start failed')
+
+    async def _demote(self, reason):
+        self.leader = False
+        self.leader_since = None
+        logger.warning(f'Stepping down as leader for {self.name} ({reason})')
+        try:
+            await self.on_demoted()
+        except Exception as e:
+            logger.error(f'Error stopping {self.name} after losing leadership: {e}')
+        await asyncio.get_running_loop().run_in_executor(None, self._close)
+
+    def _connect(self):
+        self.conn = psycopg2.connect(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            database=settings.DB_NAME,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            application_name=f'leader:{self.name}',
+            connect_timeout=5,
+            keepalives=1,
+            keepalives_idle=5,
+            keepalives_interval=2,
+            keepalives_count=3,
+            options=KEEPALIVE_OPTIONS
+        )
+        self.conn.autocommit = True
+
+    def _try_acquire(self):
+        """Worker thread: True if this session now holds the lock"""
+        if self.conn is None or self.conn.closed:
+            self._connect()
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT pg_try_advisory_lock(hashtext(%s))', (f'leader:{self.name}',))
+        acquired = cursor.fetchone()[0]
+        cursor.close()
+        return acquired
+
+    def _renew(self):
+        """Worker thread: False once the session holding the lock is gone"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            return True
+        except (psycopg2.Error, AttributeError):
+            return False
+
+    def _close(self):
+        """Closing the session releases the lock"""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def role(self):
+        return 'leader' if self.leader else 'standby'
+
+    def is_healthy(self):
+        """True while the loop runs and its last acquire attempt or lease check succeeded recently"""
+        if not self.running or self.task is None or self.task.done():
+            return False
+        if self.last_check is None:
+            # First attempt still in flight
+            return True
+        return time.time() - self.last_check < self.renew_interval * 3
+
+    def get_stats(self):
+        """Leadership state for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'healthy': self.is_healthy(),
+            'role': self.role(),
+            'leader': self.leader,
+            'elections': self.elections,
+            'leader_for_s': round(time.time() - self.leader_since, 1) if self.leader_since else None
+        }
+
+# Singleton instances: one lock per service, so they can lead from different workers
+offline_detector_leader = LeaderElection('offline_detector', renew_interval=settings.LEADER_RENEW_INTERVAL_S)
+alert_service_leader = LeaderElection('alert_service', renew_interval=settings.LEADER_RENEW_INTERVAL_S)
@@ -0,0 +1,73 @@
+# Dashboard counters over the access/alert continuous aggregates in schema.sql.
+# The views merge their open bucket from raw rows (materialized_only = false);
+# the 24h counters also add the raw rows in the partial hour at the window's
+# start, so they cover exactly the last 24 hours. Daily views bucket by local
+# day, like DATE(time) in the database timezone.
+from services.telemetry_rollups import LOCAL_TIMEZONE
+
+# Hourly buckets from 23 hours before the current one; raw rows before that
+HOUR_WINDOW_START = "time_bucket(INTERVAL '1 hour', NOW()) - INTERVAL '23 hours'"
+
+# Params: (user_id, user_id)
+ACCESS_LAST_24H = f"""
+    SELECT
+        COALESCE(SUM(attempts), 0)::bigint AS total_access,
+        COALESCE(SUM(attempts) FILTER (WHERE result = 'granted'), 0)::bigint AS granted,
+        COALESCE(SUM(attempts) FILTER (WHERE result = 'denied'), 0)::bigint AS denied
+    FROM (
+        SELECT result, attempts
+        FROM access_logs_1h
+        WHERE user_id = %s
+          AND bucket >= {HOUR_WINDOW_START}
+        UNION ALL
+        SELECT result, 1
+        FROM access_logs
+        WHERE user_id = %s
+          AND time > NOW() - INTERVAL '24 hours'
+          AND time < {HOUR_WINDOW_START}
+    ) recent
+"""
+
+# Params: (user_id, user_id)
+ALERTS_LAST_24H = f"""
+    SELECT COALESCE(SUM(alert_count), 0)::bigint AS alert_count
+    FROM (
+        SELECT alert_count
+        FROM system_alerts_1h
+        WHERE user_id = %s
+          AND bucket >= {HOUR_WINDOW_START}
+        UNION ALL
+        SELECT 1
+        FROM system_logs
+        WHERE user_id = %s
+          AND log_type = 'alert'
+          AND time > NOW() - INTERVAL '24 hours'
+          AND time < {HOUR_WINDOW_START}
+    ) recent
+"""
+
+# Whole local days, today included. Params: (user_id,)
+ACCESS_BY_DAY = f"""
+    SELECT
+        DATE(bucket) AS date,
+        SUM(attempts)::bigint AS total,
+        COALESCE(SUM(attempts) FILTER (WHERE result = 'granted'), 0)::bigint AS granted,
+        COALESCE(SUM(attempts) FILTER (WHERE result = 'denied'), 0)::bigint AS denied
+    FROM access_logs_1d
+    WHERE user_id = %s
+      AND bucket >= time_bucket(INTERVAL '1 day', NOW() - INTERVAL '7 days', '{LOCAL_TIMEZONE}')
+    GROUP BY bucket
+    ORDER BY bucket DESC
+"""
+
+# Whole local days, today included. Params: (user_id,)
+ALERTS_BY_TYPE = f"""
+    SELECT
+        event AS alert_type,
+        severity,
+        SUM(alert_count)::bigint AS count
+    FROM system_alerts_1d
+    WHERE user_id = %s
+      AND bucket >= time_bucket(INTERVAL '1 day', NOW() - INTERVAL '30 days', '{LOCAL_TIMEZONE}')
+    GROUP BY event, severity
+"""
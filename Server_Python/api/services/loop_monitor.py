@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = metrics.histogram(
+    'iot_event_loop_lag_seconds', 'How late the event loop woke a sleeping task',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.5, warn_threshold=0.25):
+        """
+        Measures event-loop lag: sleep for interval, and anything past it is time
+        the loop was busy running something else (e.g. a blocking DB call).
+
+        Args:
+            interval: Seconds between samples (default: 0.5)
+            warn_threshold: Lag in seconds that gets logged as a warning (default: 0.25)
+        """
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.running = False
+        self.task = None
+
+        # Stats
+        self.samples = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.task = asyncio.create_task(self._monitor_loop())
+        logger.info(f'Event loop lag monitor started (interval: {self.interval}s)')
+
+    async def stop(self):
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        logger.info('Event loop lag monitor stopped')
+
+    async def _monitor_loop(self):
+        while self.running:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+
+            self.samples += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+            if lag > self.warn_threshold:
+                logger.warning(f'Event loop blocked for {lag * 1000:.0f}ms')
+
+    def get_stats(self):
+        """Lag numbers for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'samples': self.samples,
+            'last_lag_ms': round(self.last_lag * 1000, 2),
+            'max_lag_ms': round(self.max_lag * 1000, 2)
+        }
+
+# Singleton instance
+loop_monitor = LoopLagMonitor()
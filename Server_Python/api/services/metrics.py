@@ -0,0 +1,188 @@
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond DB calls up to multi-second ingest lag
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class _ShardedMetric:
+    """
+    Base for metrics updated from many threads.
+
+    Each thread writes to its own dict, so an update is a plain dict write with no
+    lock. The lock is only taken once per thread (to register its shard) and at scrape
+    time. dict.copy() is a single C call, so a scrape never sees a half-updated shard.
+    """
+    metric_type = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.local = threading.local()
+        self.shards = []
+        self.shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = {}
+            with self.shards_lock:
+                self.shards.append(values)
+            self.local.values = values
+            return values
+
+    def _snapshots(self):
+        with self.shards_lock:
+            shards = list(self.shards)
+        return [shard.copy() for shard in shards]
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+
+class Counter(_ShardedMetric):
+    metric_type = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for snapshot in self._snapshots():
+            for key, value in snapshot.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self):
+        lines = self.header()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {value}')
+        return lines
+
+class Histogram(_ShardedMetric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        state = shard.get(label_values)
+        if state is None:
+            # [per-bucket counts..., +Inf count, sum]
+            state = shard[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[index] += 1
+                break
+        else:
+            state[len(self.buckets)] += 1
+        state[-1] += value
+
+    def time(self, *label_values):
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self, label_values)
+
+    def collect(self):
+        totals = {}
+        for snapshot in self._snapshots():
+            for key, state in snapshot.items():
+                state = list(state)
+                if key in totals:
+                    totals[key] = [a + b for a, b in zip(totals[key], state)]
+                else:
+                    totals[key] = state
+        return totals
+
+    def render(self):
+        lines = self.header()
+        for key, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, ("le", bound))} {cumulative}')
+            cumulative += state[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, ("le", "+Inf"))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {state[-1]}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.label_values)
+        return False
+
+class CallbackMetric:
+    """Value read from a function at scrape time (queue depths, counters kept elsewhere)"""
+
+    def __init__(self, name, help_text, fn, metric_type='gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+        self.metric_type = metric_type
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.metric_type}']
+        try:
+            lines.append(f'{self.name} {self.fn()}')
+        except Exception:
+            # A broken callback must not take down the whole scrape
+            pass
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge_callback(self, name, help_text, fn):
+        return self._register(CallbackMetric(name, help_text, fn, 'gauge'))
+
+    def counter_callback(self, name, help_text, fn):
+        return self._register(CallbackMetric(name, help_text, fn, 'counter'))
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Singleton instance
+metrics = MetricsRegistry()
@@ -0,0 +1,155 @@
+import json
+import logging
+import asyncio
+import ssl
+import aiomqtt
+from services.mqtt_service import MQTTService
+
+logger = logging.getLogger(__name__)
+
+class AsyncMQTTService(MQTTService):
+    """
+    Ingest engine on an asyncio MQTT client, running inside the FastAPI event loop.
+
+    Messages are consumed as an async stream. At most max_concurrency are processed
+    at once (off-loop, since the handlers still touch psycopg2). When that limit is
+    reached the stream stops being read and messages wait in the client's receive
+    queue, instead of each one grabbing a thread and a pooled connection.
+    """
+    engine = 'asyncio'
+
+    def __init__(self, config, max_concurrency=8, reconnect_interval=5):
+        super().__init__(config)
+        self.max_concurrency = max_concurrency
+        self.reconnect_interval = reconnect_interval
+        self.running = False
+        self.task = None
+        self.loop = None
+        self.semaphore = None
+
+        # Stats
+        self.in_flight = 0
+        self.processed = 0
+
+    async def start(self):
+        """Start the consume loop; connection happens (and is retried) in the background"""
+        if self.running:
+            return True
+
+        self.loop = asyncio.get_running_loop()
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Async MQTT service connecting to {self.config['host']}:{self.config['port']} "
+                   f"(max concurrency: {self.max_concurrency})")
+        return True
+
+    async def stop(self):
+        """Stop consuming and disconnect"""
+        self.running = False
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.connected = False
+        logger.info("Async MQTT service disconnected")
+
+    def _tls_context(self):
+        if not self.config.get('use_tls', False):
+            return None
+
+        context = ssl.create_default_context(cafile=self.config.get('ca_certs'))
+        if self.config.get('certfile'):
+            context.load_cert_chain(self.config['certfile'], self.config.get('keyfile'))
+        return context
+
+    async def _run(self):
+        """Connect, subscribe and consume; reconnect on broker errors"""
+        while self.running:
+            try:
+                async with aiomqtt.Client(
+                    hostname=self.config['host'],
+                    port=self.config['port'],
+                    username=self.config.get('username') or None,
+                    password=self.config.get('password') or None,
+                    client_id=self.config.get('client_id', 'vps_mqtt_service'),
+                    clean_session=self.config.get('clean_session', False),
+                    tls_context=self._tls_context(),
+                    keepalive=60
+                ) as client:
+                    async with client.messages() as messages:
+                        self.client = client
+                        self.connected = True
+                        logger.info("Async MQTT service connected to broker")
+
+                        for topic, qos in self.subscriptions():
+                            await client.subscribe(topic, qos=qos)
+                        logger.info(f"Subscribed to {', '.join(topic for topic, _ in self.subscriptions())}")
+
+                        async for message in messages:
+                            # Blocks the stream while max_concurrency messages are in flight
+                            await self.semaphore.acquire()
+                            asyncio.create_task(self._process(message))
+
+            except asyncio.CancelledError:
+                break
+            except aiomqtt.MqttError as e:
+                self.connected = False
+                logger.warning(f"Async MQTT connection lost ({e}), retrying in {self.reconnect_interval}s")
+                await asyncio.sleep(self.reconnect_interval)
+            except Exception as e:
+                self.connected = False
+                logger.error(f"Async MQTT consume error: {e}", exc_info=True)
+                await asyncio.sleep(self.reconnect_interval)
+
+        self.connected = False
+
+    async def _process(self, message):
+        self.in_flight += 1
+        try:
+            # Handlers may block on psycopg2, so keep them off the event loop
+            await asyncio.to_thread(
+                self.process_message, message.topic.value, message.payload,
+                getattr(message.properties, 'ContentType', None)
+            )
+            self.processed += 1
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def publish(self, topic, message, qos=1):
+        """Schedule a publish on the event loop; safe to call from routes or worker threads"""
+        if not self.connected or self.client is None:
+            logger.error(f"Failed to publish to {topic}: not connected")
+            return False
+
+        try:
+            if isinstance(message, dict):
+                message = json.dumps(message)
+
+            coro = self.client.publish(topic, message, qos=qos)
+
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Called from a handler thread
+                asyncio.run_coroutine_threadsafe(coro, self.loop)
+            else:
+                asyncio.create_task(coro).add_done_callback(self._publish_done)
+
+            logger.debug(f"Published to {topic}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error publishing message: {e}", exc_info=True)
+            return False
+
+    def _publish_done(self, task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Async publish failed: {task.exception()}")
+
+    def disconnect(self):
+        """Synchronous shutdown is not supported; use stop()"""
+        raise RuntimeError('AsyncMQTTService must be stopped with await stop()')
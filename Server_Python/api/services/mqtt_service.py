@@ -1,31 +1,56 @@
 import paho.mqtt.client as mqtt
 import json
 import logging
-import asyncio
-from queue import Queue
 from datetime import datetime, timedelta
 from services.database import db
-from services.websocket_manager import ws_manager
+from services.ingest_buffer import ingest_buffer
+from services.device_registry import device_registry
+from services.presence_tracker import presence_tracker
+from services.broadcast_bridge import broadcast_bridge
+from services.payload_codec import decode_payload, PayloadError
+from services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
-# Queue for WebSocket broadcasts (thread-safe)
-ws_broadcast_queue = Queue(maxsize=1000)
+MESSAGES_TOTAL = metrics.counter(
+    'iot_mqtt_messages_total', 'Gateway messages received', labels=('type', 'gateway')
+)
+DECODE_ERRORS_TOTAL = metrics.counter(
+    'iot_mqtt_decode_errors_total', 'Gateway payloads that failed to decode', labels=('gateway',)
+)
+DEVICE_STATUS_TOTAL = metrics.counter(
+    'iot_device_status_messages_total', 'Device status messages by outcome', labels=('outcome',)
+)
+
+# Gateway topics consumed by every ingest engine
+INGEST_TOPICS = [
+    'gateway/+/telemetry/+',
+    'gateway/+/access/+',
+    'gateway/+/status/+'
+]
+
+# Ingest workers relay WebSocket events here for the API process to fan out:
+# server/events/{user_id}/{type}
+EVENTS_TOPIC_ROOT = 'server/events'
 
 class MQTTService:
+    engine = 'paho'
+    
     def __init__(self, config):
         self.config = config
         self.client = None
         self.connected = False
         
-        # Track gateway heartbeats in memory for faster detection
-        self.gateway_heartbeats = {}  # {gateway_id: last_heartbeat_time}
-        self.expected_heartbeat_interval = 30  # Expected interval in seconds
+        # Status messages that repeated the current status (not logged)
+        self.status_repeats = 0
         
     def connect(self):
         """Connect to MQTT broker"""
         try:
-            self.client = mqtt.Client(client_id='vps_mqtt_service', clean_session=False)
+            self.client = mqtt.Client(
+                client_id=self.config.get('client_id', 'vps_mqtt_service'),
+                clean_session=self.config.get('clean_session', False)
+            )
             
             if self.config.get('username') and self.config.get('password'):
                 self.client.username_pw_set(
@@ -64,11 +89,9 @@ class MQTTService:
             self.connected = True
             logger.info("MQTT service connected to broker")
             
-            # Subscribe to all gateway topics with QoS 1 for reliability
-            self.client.subscribe('gateway/+/telemetry/+', qos=1)
-            self.client.subscribe('gateway/+/access/+', qos=1)
-            self.client.subscribe('gateway/+/status/+', qos=1)
-            logger.info("Subscribed to gateway topics with QoS 1")
+            for topic, qos in self.subscriptions():
+                self.client.subscribe(topic, qos=qos)
+            logger.info(f"Subscribed to {', '.join(topic for topic, _ in self.subscriptions())}")
         else:
             self.connected = False
             logger.error(f"Connection failed with code {rc}")
@@ -81,12 +104,43 @@ class MQTTService:
         else:
             logger.info("MQTT service disconnected normally")
     
+    def subscriptions(self):
+        """
+        Topics to subscribe to, depending on config['ingest_mode']:
+        - 'embedded' (default): all gateway topics, consumed by this process, or split
+          through $share/<shared_group>/ when one is set (API run with `--workers N`)
+        - 'worker': gateway topics through $share/<shared_group>/, so N workers split the load
+        - 'api': only relayed worker events, for WebSocket fan-out
+        """
+        mode = self.config.get('ingest_mode', 'embedded')
+        
+        if mode == 'api':
+            # Live-view events only; a lost one is superseded by the next reading
+            return [(f'{EVENTS_TOPIC_ROOT}/#', 0)]
+        
+        # Gateway topics with QoS 1 for reliability
+        group = self.config.get('shared_group')
+        if mode == 'worker':
+            group = group or 'ingest'
+        if group:
+            return [(f'$share/{group}/{topic}', 1) for topic in INGEST_TOPICS]
+        
+        return [(topic, 1) for topic in INGEST_TOPICS]
+    
+    def relay_event(self, message):
+        """Worker side of the WebSocket fan-out: forward a broadcast to the API processes"""
+        topic = f"{EVENTS_TOPIC_ROOT}/{message.get('user_id')}/{message.get('type')}"
+        return self.publish(topic, message, qos=0)
+    
     def on_message(self, client, userdata, msg):
-        """Handle incoming MQTT messages"""
+        """Handle incoming MQTT messages (paho network thread)"""
+        # Content type is only present on MQTT 5 connections; otherwise the codec sniffs it
+        properties = getattr(msg, 'properties', None)
+        self.process_message(msg.topic, msg.payload, getattr(properties, 'ContentType', None))
+    
+    def process_message(self, topic, raw_payload, content_type=None):
+        """Decode and route one message - shared by the paho and asyncio engines"""
         try:
-            topic = msg.topic
-            payload = msg.payload.decode('utf-8')
-            
             logger.debug(f"Received message on {topic}")
             
             # Parse topic: gateway/{gateway_id}/{msg_type}/{device_or_entity}
@@ -99,13 +153,21 @@ class MQTTService:
             msg_type = parts[2]
             device_or_entity = parts[3] if len(parts) > 3 else None
             
-            # Parse JSON payload
+            # Parse JSON or compact (MessagePack) payload
             try:
-                data = json.loads(payload)
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON payload from {topic}")
+                data = decode_payload(raw_payload, content_type)
+            except PayloadError as e:
+                DECODE_ERRORS_TOTAL.inc(gateway_id)
+                logger.error(f"Invalid payload from {topic}: {e}")
                 return
             
+            # Event relayed by an ingest worker: already processed, only broadcast it
+            if topic.startswith(EVENTS_TOPIC_ROOT + '/'):
+                broadcast_bridge.publish(data)
+                return
+            
+            MESSAGES_TOTAL.inc(msg_type, gateway_id)
+            
             # Validate timestamp to prevent clock drift issues
             timestamp = data.get('timestamp') or data.get('time')
             if timestamp:
@@ -163,6 +225,12 @@ class MQTTService:
     def handle_telemetry(self, gateway_id, device_id, data):
         """Handle telemetry data from temperature sensors"""
         try:
+            # Reject unknown devices before any SQL runs
+            device = device_registry.get(device_id, gateway_id)
+            if not device:
+                logger.warning(f"Device not found: {device_id} on {gateway_id}")
+                return
+            
             timestamp = data.get('timestamp') or data.get('time')
             telemetry_data = data.get('data', {})
             nested_data = telemetry_data.get('data', {})
@@ -176,43 +244,28 @@ class MQTTService:
                 'raw_data': telemetry_data
             }
             
-            query = """
-                INSERT INTO telemetry (time, device_id, gateway_id, user_id, temperature, humidity, metadata)
-                SELECT %s::timestamptz, %s, %s, d.user_id, %s, %s, %s
-                FROM devices d 
-                WHERE d.device_id = %s AND d.gateway_id = %s
-            """
+            # Buffered: written to the telemetry hypertable by the next bulk flush
+            ingest_buffer.add_telemetry(
+                timestamp, device_id, gateway_id, device['user_id'],
+                temperature, humidity, json.dumps(metadata)
+            )
             
-            result = db.query(query, (
-                timestamp, device_id, gateway_id,
-                temperature, humidity, json.dumps(metadata),
-                device_id, gateway_id
-            ))
+            logger.debug(f"Telemetry queued: {device_id} - {temperature}°C, {humidity}%")
             
-            if result is not None:
-                logger.info(f"Telemetry saved: {device_id} - {temperature}°C, {humidity}%")
-                
-                # Update device last_seen and ensure status is online
-                self.update_device_last_seen_and_status(device_id, gateway_id, timestamp)
+            # Update device last_seen and ensure status is online
+            self.update_device_last_seen_and_status(device_id, gateway_id, timestamp)
 
-                # Queue WebSocket broadcast (thread-safe)
-                result_user = db.query_one(
-                    'SELECT user_id FROM devices WHERE device_id = %s',
-                    (device_id,)
-                )
-                if result_user:
-                    ws_broadcast_queue.put({
-                        'type': 'telemetry',
-                        'user_id': result_user['user_id'],
-                        'data': {
-                            'device_id': device_id,
-                            'temperature': temperature,
-                            'humidity': humidity,
-                            'timestamp': timestamp
-                        }
-                    })
-            else:
-                logger.warning(f"Device not found: {device_id} on {gateway_id}")
+            # Hand off to the event loop for WebSocket broadcast (never blocks)
+            broadcast_bridge.publish({
+                'type': 'telemetry',
+                'user_id': device['user_id'],
+                'data': {
+                    'device_id': device_id,
+                    'temperature': temperature,
+                    'humidity': humidity,
+                    'timestamp': timestamp
+                }
+            })
             
         except Exception as e:
             logger.error(f"Error saving telemetry: {e}", exc_info=True)
@@ -220,66 +273,58 @@ class MQTTService:
     def handle_access(self, gateway_id, device_id, data):
         """Handle access control events (RFID/Keypad)"""
         try:
+            # Reject unknown devices before any SQL runs
+            device = device_registry.get(device_id, gateway_id)
+            if not device:
+                logger.warning(f"Device not found for access log: {device_id} on {gateway_id}")
+                return
+            
             timestamp = data.get('timestamp') or data.get('time')
             method = data.get('method', 'unknown')
             result = data.get('result', 'unknown')
             identifier = data.get('identifier') or data.get('rfid_uid') or data.get('password_id')
             deny_reason = data.get('deny_reason')
             
-            query = """
-                INSERT INTO access_logs (time, device_id, gateway_id, user_id, method, result, password_id, rfid_uid, deny_reason, metadata)
-                SELECT %s::timestamptz, %s, %s, d.user_id, %s, %s, 
-                       CASE WHEN %s = 'passkey' THEN %s ELSE NULL END,
-                       CASE WHEN %s = 'rfid' THEN %s ELSE NULL END,
-                       %s, %s
-                FROM devices d
-                WHERE d.device_id = %s AND d.gateway_id = %s
-            """
-            
             metadata = json.dumps(data.get('metadata', {}))
             
-            db.query(query, (
-                timestamp, device_id, gateway_id, method, result,
-                method, identifier,  # password_id
-                method, identifier,  # rfid_uid
-                deny_reason, metadata,
-                device_id, gateway_id
-            ))
+            # Buffered: the next bulk flush writes the access_logs row and, for granted
+            # events, the credential's last_used in one transaction
+            ingest_buffer.add_access(
+                timestamp, device_id, gateway_id, device['user_id'], method, result,
+                identifier if method == 'passkey' else None,  # password_id
+                identifier if method == 'rfid' else None,  # rfid_uid
+                deny_reason, metadata
+            )
             
-            logger.info(f"Access log saved: {device_id} - {method} - {result}")
+            logger.info(f"Access log queued: {device_id} - {method} - {result}")
             
             # Update device last_seen and ensure status is online
             self.update_device_last_seen_and_status(device_id, gateway_id, timestamp)
             
-            # Update last_used for password or RFID
-            if method == 'passkey' and identifier and result == 'granted':
-                self.update_password_last_used(identifier, timestamp)
-            elif method == 'rfid' and identifier and result == 'granted':
-                self.update_rfid_last_used(identifier, timestamp)
+            # Hand off to the event loop for WebSocket broadcast (never blocks)
+            broadcast_bridge.publish({
+                'type': 'access_event',
+                'user_id': device['user_id'],
+                'data': {
+                    'device_id': device_id,
+                    'method': method,
+                    'result': result,
+                    'timestamp': timestamp
+                }
+            })
             
-            # Queue WebSocket broadcast
-            result_user = db.query_one(
-                'SELECT user_id FROM devices WHERE device_id = %s',
-                (device_id,)
-            )
-            if result_user:
-                ws_broadcast_queue.put({
-                    'type': 'access_event',
-                    'user_id': result_user['user_id'],
-                    'data': {
-                        'device_id': device_id,
-                        'method': method,
-                        'result': result,
-                        'timestamp': timestamp
-                    }
-                })
-                
         except Exception as e:
             logger.error(f"Error saving access log: {e}", exc_info=True)
     
     def handle_device_status(self, gateway_id, device_id, data):
         """Handle device status updates - CRITICAL for online/offline tracking"""
         try:
+            # Reject unknown devices before any SQL runs
+            device = device_registry.get(device_id, gateway_id)
+            if not device:
+                logger.warning(f"Device not found for status update: {device_id} on {gateway_id}")
+                return
+            
             timestamp = data.get('timestamp') or data.get('time')
             status = data.get('status') or data.get('state', 'unknown')
             
@@ -293,51 +338,69 @@ class MQTTService:
                 normalized_status = 'online'
                 logger.debug(f"Unknown status '{status}' from {device_id}, defaulting to online")
             
-            # Update device status and last_seen atomically
-            query = """
-                UPDATE devices
-                SET status = %s, 
-                    last_seen = %s::timestamptz, 
-                    updated_at = %s::timestamptz
-                WHERE device_id = %s AND gateway_id = %s
-                RETURNING device_id, user_id, device_type
+            # Log only real transitions; gate nodes repeat "locked"/"closed" constantly
+            log_query = """
+                INSERT INTO system_logs (time, gateway_id, device_id, user_id, log_type, event, severity, message, metadata)
+                VALUES (%s::timestamptz, %s, %s, %s, 'device_event', 'device_status_change', 'info', %s, %s)
             """
-            
-            result = db.query(query, (normalized_status, timestamp, timestamp, device_id, gateway_id))
-            
-            if result and len(result) > 0:
-                logger.info(f"Device status updated: {device_id} -> {normalized_status}")
-                
-                # Log status change to system_logs
-                log_query = """
-                    INSERT INTO system_logs (time, gateway_id, device_id, user_id, log_type, event, severity, message, metadata)
-                    VALUES (%s::timestamptz, %s, %s, %s, 'device_event', 'device_status_change', 'info', %s, %s)
-                """
-                
-                message = f"Device {device_id} status changed to {normalized_status}"
-                metadata = json.dumps({
+            log_params = (
+                timestamp, gateway_id, device_id, device['user_id'],
+                f"Device {device_id} status changed to {normalized_status}",
+                json.dumps({
                     'original_status': status,
                     'normalized_status': normalized_status,
-                    'device_type': result[0]['device_type'],
+                    'device_type': device['device_type'],
                     'raw_data': data
                 })
+            )
+            
+            if normalized_status == 'online':
+                # Coalesced with other last_seen updates; written through only if it was offline
+                transitioned = presence_tracker.touch_device(device_id, gateway_id, timestamp)
+                if transitioned is None:
+                    logger.warning(f"Device not found for status update: {device_id} on {gateway_id}")
+                    return
+                if transitioned:
+                    db.query(log_query, log_params)
+            else:
+                transitioned = presence_tracker.get_device_status(device_id) != 'offline'
                 
-                db.query(log_query, (
-                    timestamp, gateway_id, device_id, result[0]['user_id'], message, metadata
-                ))
-
-                # Queue WebSocket broadcast
-                ws_broadcast_queue.put({
-                    'type': 'device_status',
-                    'user_id': result[0]['user_id'],
-                    'device_id': device_id,
-                    'data': {
-                        'status': normalized_status,
-                        'timestamp': timestamp
-                    }
-                })
+                query = """
+                    UPDATE devices
+                    SET status = 'offline', 
+                        last_seen = %s::timestamptz, 
+                        updated_at = %s::timestamptz
+                    WHERE device_id = %s AND gateway_id = %s
+                    RETURNING device_id
+                """
+                
+                # Status change and its log row commit together
+                with db.batch() as batch:
+                    if not batch.query(query, (timestamp, timestamp, device_id, gateway_id)):
+                        logger.warning(f"Device not found for status update: {device_id} on {gateway_id}")
+                        return
+                    if transitioned:
+                        batch.execute(log_query, log_params)
+                presence_tracker.mark_devices_offline([device_id])
+            
+            if transitioned:
+                logger.info(f"Device status updated: {device_id} -> {normalized_status}")
+                DEVICE_STATUS_TOTAL.inc('transition')
             else:
-                logger.warning(f"Device not found for status update: {device_id} on {gateway_id}")
+                self.status_repeats += 1
+                DEVICE_STATUS_TOTAL.inc('repeat')
+                logger.debug(f"Device status unchanged: {device_id} -> {normalized_status}")
+
+            # Hand off to the event loop for WebSocket broadcast (never blocks)
+            broadcast_bridge.publish({
+                'type': 'device_status',
+                'user_id': device['user_id'],
+                'device_id': device_id,
+                'data': {
+                    'status': normalized_status,
+                    'timestamp': timestamp
+                }
+            })
             
         except Exception as e:
             logger.error(f"Error updating device status: {e}", exc_info=True)
@@ -354,30 +417,33 @@ class MQTTService:
             else:
                 normalized_status = 'offline'
             
-            # Update gateway heartbeat tracking in memory
-            self.gateway_heartbeats[gateway_id] = datetime.now()
+            if normalized_status == 'online':
+                # Steady heartbeats are coalesced; only offline->online is written through.
+                # The touch also pushes back the offline detector's deadline for the gateway
+                transitioned = presence_tracker.touch_gateway(gateway_id, timestamp)
+                
+                if transitioned is None:
+                    logger.warning(f"Gateway not found: {gateway_id}")
+                elif transitioned:
+                    # Don't automatically mark devices online - let them send their own status
+                    logger.info(f"Gateway {gateway_id} is online, waiting for device heartbeats")
+                else:
+                    logger.debug(f"Gateway heartbeat: {gateway_id}")
+                return
             
-            # Update gateway status and last_seen atomically
             query = """
                 UPDATE gateways
-                SET status = %s, last_seen = %s::timestamptz, updated_at = %s::timestamptz
+                SET status = 'offline', last_seen = %s::timestamptz, updated_at = %s::timestamptz
                 WHERE gateway_id = %s
                 RETURNING gateway_id, user_id, name
             """
 
-            result = db.query(query, (normalized_status, timestamp, timestamp, gateway_id))
+            result = db.query(query, (timestamp, timestamp, gateway_id))
             
             if result and len(result) > 0:
-                logger.info(f"Gateway heartbeat: {gateway_id} -> {normalized_status} "
+                presence_tracker.mark_gateways_offline([gateway_id])
+                logger.info(f"Gateway heartbeat: {gateway_id} -> offline "
                           f"(name: {result[0].get('name', 'N/A')})")
-                
-                # If gateway just came online, mark all its devices as potentially online
-                # (they will be marked offline by offline detector if they don't send heartbeat)
-                if normalized_status == 'online':
-                    # Don't automatically mark devices online - let them send their own status
-                    # Just log that gateway is back
-                    logger.info(f"Gateway {gateway_id} is online, waiting for device heartbeats")
-                
             else:
                 logger.warning(f"Gateway not found: {gateway_id}")
             
@@ -387,49 +453,19 @@ class MQTTService:
     def update_device_last_seen_and_status(self, device_id, gateway_id, timestamp):
         """Update device last_seen and ensure it's marked online if sending data"""
         try:
-            query = """
-                UPDATE devices
-                SET last_seen = %s::timestamptz, status = 'online', updated_at = %s::timestamptz
-                WHERE device_id = %s AND gateway_id = %s
-            """
-            db.query(query, (timestamp, timestamp, device_id, gateway_id))
+            # Coalesced into the presence tracker's once-per-second flush
+            presence_tracker.touch_device(device_id, gateway_id, timestamp)
             
         except Exception as e:
             logger.error(f"Error updating device last_seen: {e}", exc_info=True)
     
-    def update_password_last_used(self, password_id, timestamp):
-        """Update password last_used timestamp"""
-        try:
-            query = """
-                UPDATE passwords
-                SET last_used = %s::timestamptz, updated_at = %s::timestamptz
-                WHERE password_id = %s
-            """
-            db.query(query, (timestamp, timestamp, password_id))
-            
-        except Exception as e:
-            logger.error(f"Error updating password last_used: {e}", exc_info=True)
-    
-    def update_rfid_last_used(self, uid, timestamp):
-        """Update RFID card last_used timestamp"""
-        try:
-            query = """
-                UPDATE rfid_cards
-                SET last_used = %s::timestamptz, updated_at = %s::timestamptz
-                WHERE uid = %s
-            """
-            db.query(query, (timestamp, timestamp, uid))
-            
-        except Exception as e:
-            logger.error(f"Error updating rfid last_used: {e}", exc_info=True)
-    
-    def publish(self, topic, message):
+    def publish(self, topic, message, qos=1):
         """Publish message to MQTT broker"""
         try:
             if isinstance(message, dict):
                 message = json.dumps(message)
             
-            result = self.client.publish(topic, message, qos=1)
+            result = self.client.publish(topic, message, qos=qos)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
                 logger.debug(f"Published to {topic}")
@@ -449,35 +485,6 @@ class MQTTService:
         self.connected = False
         logger.info("MQTT service disconnected")
 
-# Background task to process WebSocket broadcasts
-async def process_websocket_broadcasts():
-    """Process WebSocket broadcasts from queue"""
-    logger.info("WebSocket broadcast processor started")
-    while True:
-        try:
-            if not ws_broadcast_queue.empty():
-                msg = ws_broadcast_queue.get_nowait()
-                
-                msg_type = msg.get('type')
-                user_id = msg.get('user_id')
-                data = msg.get('data')
-                
-                if msg_type == 'telemetry':
-                    await ws_manager.broadcast_telemetry(user_id, data)
-                elif msg_type == 'access_event':
-                    await ws_manager.broadcast_access_event(user_id, data)
-                elif msg_type == 'device_status':
-                    device_id = msg.get('device_id')
-                    await ws_manager.broadcast_device_status(device_id, user_id, data)
-                elif msg_type == 'alert':
-                    await ws_manager.broadcast_alert(user_id, data)
-            
-            await asyncio.sleep(0.1)
-            
-        except Exception as e:
-            logger.error(f"Error processing WebSocket broadcast: {e}", exc_info=True)
-            await asyncio.sleep(1)
-
 # Global MQTT service instance
 mqtt_service = None
 
@@ -485,4 +492,25 @@ def init_mqtt_service(config):
     """Initialize global MQTT service"""
     global mqtt_service
     mqtt_service = MQTTService(config)
-    return mqtt_service.connect()
\ No newline at end of file
+    return mqtt_service.connect()
+
+async def start_mqtt_service(config, engine='paho'):
+    """Start the global MQTT service with the selected ingest engine ('paho' or 'asyncio')"""
+    global mqtt_service
+    if engine == 'asyncio':
+        # Optional dependency, only imported when the engine is selected
+        from services.mqtt_async_service import AsyncMQTTService
+        mqtt_service = AsyncMQTTService(config, max_concurrency=config.get('max_concurrency', 8))
+        return await mqtt_service.start()
+    
+    return init_mqtt_service(config)
+
+async def stop_mqtt_service():
+    """Stop the global MQTT service, whichever engine is running"""
+    if mqtt_service is None:
+        return
+    
+    if mqtt_service.engine == 'asyncio':
+        await mqtt_service.stop()
+    else:
+        mqtt_service.disconnect()
\ No newline at end of file
@@ -1,17 +1,173 @@
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from services.database import db
+from services.async_database import adb
 from services.websocket_manager import ws_manager
-import json
+from services.presence_tracker import presence_tracker
 
 logger = logging.getLogger(__name__)
 
+# Offline transitions run as one statement each: the status UPDATE's RETURNING rows
+# feed the system_logs INSERT, and a gateway's statement also cascades to its
+# devices and logs them. $1 is the detection method, $2 the timeout in seconds,
+# $3 the last_seen cutoff. {scope} narrows the sweep to the due ids ($4).
+DEVICES_OFFLINE_SQL = """
+    WITH offline AS (
+        UPDATE devices
+        SET status = 'offline', updated_at = NOW()
+        WHERE status = 'online' AND (last_seen IS NULL OR last_seen < $3) {scope}
+        RETURNING device_id, user_id, device_type, gateway_id, last_seen
+    ), logged AS (
+        INSERT INTO system_logs (time, gateway_id, device_id, user_id, log_type, event, severity, message, metadata)
+        SELECT NOW(), gateway_id, device_id, user_id, 'device_event', 'device_offline', 'warning',
+               'Device ' || device_id || ' went offline (last seen: ' || COALESCE(last_seen::text, 'None') || ')',
+               jsonb_build_object(
+                   'last_seen', last_seen::text,
+                   'device_type', device_type,
+                   'timeout_seconds', $2,
+                   'detection_method', $1
+               )
+        FROM offline
+    )
+    SELECT * FROM offline
+"""
+
+GATEWAYS_OFFLINE_SQL = """
+    WITH offline AS (
+        UPDATE gateways
+        SET status = 'offline', updated_at = NOW()
+        WHERE status = 'online' AND (last_seen IS NULL OR last_seen < $3) {scope}
+        RETURNING gateway_id, user_id, name, last_seen
+    ), gateway_logs AS (
+        INSERT INTO system_logs (time, gateway_id, user_id, log_type, event, severity, message, metadata)
+        SELECT NOW(), gateway_id, user_id, 'system_event', 'gateway_offline', 'critical',
+               'Gateway ' || gateway_id || ' went offline (last seen: ' || COALESCE(last_seen::text, 'None') || ')',
+               jsonb_build_object(
+                   'last_seen', last_seen::text,
+                   'name', name,
+                   'timeout_seconds', $2,
+                   'detection_method', $1
+               )
+        FROM offline
+    ), cascaded AS (
+        -- CASCADE: every device under an offline gateway goes offline with it
+        UPDATE devices AS d
+        SET status = 'offline', updated_at = NOW()
+        FROM offline AS o
+        WHERE d.gateway_id = o.gateway_id AND d.status != 'offline'
+        RETURNING d.device_id, d.user_id, d.device_type, d.gateway_id
+    ), device_logs AS (
+        INSERT INTO system_logs (time, device_id, user_id, log_type, event, severity, message, metadata)
+        SELECT NOW(), device_id, user_id, 'device_event', 'device_offline', 'warning',
+               'Device ' || device_id || ' marked offline (gateway offline)',
+               jsonb_build_object(
+                   'reason', 'gateway_offline',
+                   'device_type', device_type,
+                   'detection_method', 'cascade'
+               )
+        FROM cascaded
+    )
+    SELECT 'gateway' AS kind, gateway_id, NULL AS device_id, user_id, name, NULL AS device_type, last_seen
+    FROM offline
+    UNION ALL
+    SELECT 'device', gateway_id, device_id, user_id, NULL, device_type, NULL
+    FROM cascaded
+"""
+
+# Periodic sweeps, run every check_interval as a safety net behind the deadlines
+db.prepare('devices_timed_out', DEVICES_OFFLINE_SQL.format(scope=''),
+           ('text', 'int', 'timestamptz'))
+db.prepare('gateways_timed_out', GATEWAYS_OFFLINE_SQL.format(scope=''),
+           ('text', 'int', 'timestamptz'))
+
+# Deadline expiry and force checks: only the given ids, and only if they weren't
+# seen since (another process may have written a newer last_seen)
+db.prepare('devices_expired', DEVICES_OFFLINE_SQL.format(scope='AND device_id = ANY($4)'),
+           ('text', 'int', 'timestamptz', 'text[]'))
+db.prepare('gateways_expired', GATEWAYS_OFFLINE_SQL.format(scope='AND gateway_id = ANY($4)'),
+           ('text', 'int', 'timestamptz', 'text[]'))
+
+class DeadlineScheduler:
+    def __init__(self):
+        """
+        Min-heap of offline deadlines keyed by (kind, id). A sighting only moves the
+        deadline in the dict; the single heap entry per key is re-pushed when it
+        surfaces early, so heartbeats cost O(1) and the heap holds one entry per
+        tracked device/gateway.
+        """
+        self.heap = []
+        self.deadlines = {}  # key -> current deadline (epoch seconds)
+        self.queued = {}     # key -> deadline of its live heap entry
+        self.lock = threading.Lock()
+
+    def arm(self, key, deadline):
+        """
+        Push key's deadline out to deadline (never pulls it in).
+
+        Returns True if this became the earliest deadline, so a sleeping
+        scheduler loop needs waking.
+        """
+        with self.lock:
+            current = self.deadlines.get(key)
+            if current is not None and current >= deadline:
+                return False
+            self.deadlines[key] = deadline
+
+            queued_at = self.queued.get(key)
+            if queued_at is not None and queued_at <= deadline:
+                return False
+            self.queued[key] = deadline
+            heapq.heappush(self.heap, (deadline, key))
+            return self.heap[0] == (deadline, key)
+
+    def forget(self, key):
+        with self.lock:
+            self.deadlines.pop(key, None)
+
+    def pop_due(self, now):
+        """Remove and return the keys whose deadline is at or before now"""
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                queued_at, key = heapq.heappop(self.heap)
+                if self.queued.get(key) != queued_at:
+                    continue  # superseded by an earlier entry
+                del self.queued[key]
+
+                deadline = self.deadlines.get(key)
+                if deadline is None:
+                    continue  # forgotten (went offline another way)
+                if deadline > now:
+                    self.queued[key] = deadline
+                    heapq.heappush(self.heap, (deadline, key))
+                    continue
+
+                del self.deadlines[key]
+                due.append(key)
+        return due
+
+    def next_deadline(self):
+        """Earliest queued deadline, or None (may be a superseded entry; waking early is harmless)"""
+        with self.lock:
+            return self.heap[0][0] if self.heap else None
+
+    def __len__(self):
+        return len(self.deadlines)
+
 class OfflineDetector:
-    def __init__(self, check_interval=10, device_timeout=90, gateway_timeout=90):
+    def __init__(self, check_interval=60, device_timeout=90, gateway_timeout=90):
         """
+        Marks devices/gateways offline when their deadline (last sighting plus
+        timeout) passes. Sightings come from the presence tracker; deadlines are
+        also armed from last_seen in the database on every reconciliation, which
+        covers ids whose traffic goes to separate ingest workers.
+
         Args:
-            check_interval: Seconds between checks (default: 10) - faster detection
+            check_interval: Seconds between reconciliation sweeps (default: 60)
             device_timeout: Seconds before device marked offline (default: 90)
             gateway_timeout: Seconds before gateway marked offline (default: 90)
         """
@@ -21,23 +177,33 @@ class OfflineDetector:
         self.running = False
         self.task = None
         
-        # In-memory cache of last check times to reduce database queries
-        self.last_device_check = {}
-        self.last_gateway_check = {}
+        self.scheduler = DeadlineScheduler()
+        self.loop = None
+        self.wakeup = None
+        
+        # Stats
+        self.expirations = 0
+        self.rearmed = 0
+        self.sweep_transitions = 0
     
     async def start(self):
         """Start the offline detection loop"""
         if self.running:
             return
         
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        presence_tracker.set_listener(self)
+        
         self.running = True
         self.task = asyncio.create_task(self._detection_loop())
-        logger.info(f'Offline detector started (check every {self.check_interval}s, '
+        logger.info(f'Offline detector started (reconcile every {self.check_interval}s, '
                    f'device timeout: {self.device_timeout}s, gateway timeout: {self.gateway_timeout}s)')
     
     async def stop(self):
         """Stop the offline detection loop"""
         self.running = False
+        presence_tracker.set_listener(None)
         if self.task:
             self.task.cancel()
             try:
@@ -46,22 +212,111 @@ class OfflineDetector:
                 pass
         logger.info('Offline detector stopped')
     
+    def seen(self, kind, entity_id):
+        """Presence tracker callback (MQTT thread): push the entity's deadline out"""
+        timeout = self.device_timeout if kind == 'device' else self.gateway_timeout
+        self._arm(kind, entity_id, time.time() + timeout)
+    
+    def offline(self, kind, entity_ids):
+        """Presence tracker callback: marked offline elsewhere, nothing left to detect"""
+        for entity_id in entity_ids:
+            self.scheduler.forget((kind, entity_id))
+    
+    def _arm(self, kind, entity_id, deadline):
+        if self.scheduler.arm((kind, entity_id), deadline) and self.loop:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+    
     async def _detection_loop(self):
-        """Main detection loop - runs every check_interval seconds"""
+        """Expire deadlines as they come due; reconcile against the database every check_interval"""
+        next_reconcile = 0
         while self.running:
             try:
-                # Check gateways first (if gateway offline, all its devices are offline)
-                await self.check_offline_gateways()
+                if time.time() >= next_reconcile:
+                    await self.reconcile()
+                    next_reconcile = time.time() + self.check_interval
                 
-                # Then check devices
-                await self.check_offline_devices()
+                await self.expire_due()
                 
-                await asyncio.sleep(self.check_interval)
+                # Sleep until the next deadline, the next reconciliation, or an earlier arm()
+                wake_at = next_reconcile
+                next_deadline = self.scheduler.next_deadline()
+                if next_deadline is not None:
+                    wake_at = min(wake_at, next_deadline)
+                
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=max(wake_at - time.time(), 0))
+                except asyncio.TimeoutError:
+                    pass
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f'Error in offline detection: {e}', exc_info=True)
-                await asyncio.sleep(self.check_interval)
+                await asyncio.sleep(1)
+    
+    async def reconcile(self):
+        """Safety-net sweep, then arm deadlines for everything online from its last_seen"""
+        # Check gateways first (if gateway offline, all its devices are offline)
+        await self.check_offline_gateways()
+        
+        # Then check devices
+        await self.check_offline_devices()
+        
+        devices = await adb.query("SELECT device_id AS id, last_seen FROM devices WHERE status = 'online'")
+        gateways = await adb.query("SELECT gateway_id AS id, last_seen FROM gateways WHERE status = 'online'")
+        self._arm_from_rows('device', devices, self.device_timeout)
+        self._arm_from_rows('gateway', gateways, self.gateway_timeout)
+    
+    def _arm_from_rows(self, kind, rows, timeout):
+        now = time.time()
+        for row in rows:
+            # Never schedule into the past: a stale last_seen is the sweep's job
+            seen = row['last_seen'].timestamp() if row['last_seen'] else now
+            self._arm(kind, row['id'], max(seen + timeout, now + 1))
+    
+    async def expire_due(self):
+        """Mark offline everything whose deadline has passed; re-arm what was seen meanwhile"""
+        due = self.scheduler.pop_due(time.time())
+        if not due:
+            return
+        
+        gateway_ids = [entity_id for kind, entity_id in due if kind == 'gateway']
+        device_ids = [entity_id for kind, entity_id in due if kind == 'device']
+        now = datetime.now(timezone.utc)
+        
+        if gateway_ids:
+            cutoff = now - timedelta(seconds=self.gateway_timeout)
+            rows = await adb.query_prepared(
+                'gateways_expired', ('deadline', self.gateway_timeout, cutoff, gateway_ids), commit=True
+            )
+            offline_gateways = await self._gateways_went_offline(rows)
+            self.expirations += len(offline_gateways)
+            await self._rearm('gateway', gateway_ids, offline_gateways, self.gateway_timeout)
+        
+        if device_ids:
+            cutoff = now - timedelta(seconds=self.device_timeout)
+            offline_devices = await adb.query_prepared(
+                'devices_expired', ('deadline', self.device_timeout, cutoff, device_ids), commit=True
+            )
+            self.expirations += len(offline_devices)
+            if offline_devices:
+                await self._devices_went_offline(offline_devices)
+            await self._rearm('device', device_ids, offline_devices, self.device_timeout)
+    
+    async def _rearm(self, kind, entity_ids, expired, timeout):
+        """Due ids the guarded UPDATE skipped were seen meanwhile: re-arm from the database"""
+        id_column = f'{kind}_id'
+        expired_ids = {row[id_column] for row in expired}
+        remaining = [entity_id for entity_id in entity_ids if entity_id not in expired_ids]
+        if not remaining:
+            return
+        
+        rows = await adb.query(
+            f"SELECT {id_column} AS id, last_seen FROM {kind}s WHERE {id_column} = ANY(%s) AND status = 'online'",
+            (remaining,)
+        )
+        self._arm_from_rows(kind, rows, timeout)
+        self.rearmed += len(rows)
     
     async def check_offline_devices(self):
         """Check for devices that have gone offline"""
@@ -69,59 +324,13 @@ class OfflineDetector:
             # Calculate cutoff time - devices not seen in last device_timeout seconds
             cutoff_time = datetime.now() - timedelta(seconds=self.device_timeout)
             
-            # Query with explicit timeout comparison
-            query = """
-                UPDATE devices
-                SET status = 'offline', updated_at = NOW()
-                WHERE status = 'online' AND (last_seen IS NULL OR last_seen < %s)
-                RETURNING device_id, user_id, device_type, gateway_id, last_seen
-            """
-            
-            offline_devices = db.query(query, (cutoff_time,))
+            offline_devices = await adb.query_prepared(
+                'devices_timed_out', ('periodic_check', self.device_timeout, cutoff_time), commit=True
+            )
             
             if offline_devices and len(offline_devices) > 0:
-                logger.warning(f'Detected {len(offline_devices)} devices going offline')
-                
-                for device in offline_devices:
-                    # Log to system_logs
-                    log_query = """
-                        INSERT INTO system_logs (time, gateway_id, device_id, user_id, log_type, event, severity, message, metadata)
-                        VALUES (NOW(), %s, %s, %s, 'device_event', 'device_offline', 'warning', %s, %s)
-                    """
-                    
-                    message = f"Device {device['device_id']} went offline (last seen: {device['last_seen']})"
-                    
-                    metadata = json.dumps({
-                        'last_seen': str(device['last_seen']) if device['last_seen'] else None,
-                        'device_type': device['device_type'],
-                        'timeout_seconds': self.device_timeout,
-                        'detection_method': 'periodic_check'
-                    })
-                    
-                    db.query(log_query, (
-                        device['gateway_id'],
-                        device['device_id'],
-                        device['user_id'],
-                        message,
-                        metadata
-                    ))
-                    
-                    logger.warning(f"Device offline: {device['device_id']} (type: {device['device_type']}, "
-                                 f"last_seen: {device['last_seen']})")
-                    
-                    # Broadcast to WebSocket clients
-                    try:
-                        await ws_manager.broadcast_device_status(
-                            device['device_id'],
-                            device['user_id'],
-                            {
-                                'status': 'offline',
-                                'timestamp': datetime.now().isoformat(),
-                                'reason': 'timeout'
-                            }
-                        )
-                    except Exception as ws_error:
-                        logger.error(f'WebSocket broadcast error: {ws_error}')
+                self.sweep_transitions += len(offline_devices)
+                await self._devices_went_offline(offline_devices)
         
         except Exception as e:
             logger.error(f'Error checking offline devices: {e}', exc_info=True)
@@ -132,106 +341,87 @@ class OfflineDetector:
             # Calculate cutoff time - gateways not seen in last gateway_timeout seconds
             cutoff_time = datetime.now() - timedelta(seconds=self.gateway_timeout)
             
-            # Query with explicit timeout comparison
-            query = """
-                UPDATE gateways
-                SET status = 'offline', updated_at = NOW()
-                WHERE status = 'online' 
-                  AND (last_seen IS NULL OR last_seen < %s)
-                RETURNING gateway_id, user_id, name, last_seen
-            """
-            
-            offline_gateways = db.query(query, (cutoff_time,))
-            
-            if offline_gateways and len(offline_gateways) > 0:
-                gateway_ids = [g['gateway_id'] for g in offline_gateways]
-                logger.error(f'Detected {len(offline_gateways)} gateways going offline: {gateway_ids}')
-                
-                for gateway in offline_gateways:
-                    # Log to system_logs
-                    log_query = """
-                        INSERT INTO system_logs (time, gateway_id, user_id, log_type, event, severity, message, metadata)
-                        VALUES (NOW(), %s, %s, 'system_event', 'gateway_offline', 'critical', %s, %s)
-                    """
-                    
-                    message = f"Gateway {gateway['gateway_id']} went offline (last seen: {gateway['last_seen']})"
-                    
-                    metadata = json.dumps({
-                        'last_seen': str(gateway['last_seen']) if gateway['last_seen'] else None,
-                        'name': gateway.get('name'),
-                        'timeout_seconds': self.gateway_timeout,
-                        'detection_method': 'periodic_check'
-                    })
-                    
-                    db.query(log_query, (
-                        gateway['gateway_id'],
-                        gateway['user_id'],
-                        message,
-                        metadata
-                    ))
-                    
-                    logger.error(f"Gateway offline: {gateway['gateway_id']} (name: {gateway.get('name')}, "
-                               f"last_seen: {gateway['last_seen']})")
-                
-                # CASCADE: Mark all devices under offline gateways as offline
-                if gateway_ids:
-                    cascade_query = """
-                        UPDATE devices
-                        SET status = 'offline', updated_at = NOW()
-                        WHERE gateway_id = ANY(%s) AND status != 'offline'
-                        RETURNING device_id, device_type
-                    """
-                    
-                    cascaded_devices = db.query(cascade_query, (gateway_ids,))
-                    
-                    if cascaded_devices and len(cascaded_devices) > 0:
-                        logger.warning(f'Cascaded offline status to {len(cascaded_devices)} devices '
-                                     f'under offline gateways')
-                        
-                        # Log cascade for each device
-                        for device in cascaded_devices:
-                            cascade_log_query = """
-                                INSERT INTO system_logs (time, device_id, user_id, log_type, event, severity, message, metadata)
-                                SELECT NOW(), %s, d.user_id, 'device_event', 'device_offline', 'warning', %s, %s
-                                FROM devices d
-                                WHERE d.device_id = %s
-                            """
-                            
-                            cascade_message = f"Device {device['device_id']} marked offline (gateway offline)"
-                            cascade_metadata = json.dumps({
-                                'reason': 'gateway_offline',
-                                'device_type': device['device_type'],
-                                'detection_method': 'cascade'
-                            })
-                            
-                            db.query(cascade_log_query, (
-                                device['device_id'],
-                                cascade_message,
-                                cascade_metadata,
-                                device['device_id']
-                            ))
+            rows = await adb.query_prepared(
+                'gateways_timed_out', ('periodic_check', self.gateway_timeout, cutoff_time), commit=True
+            )
+            self.sweep_transitions += len(await self._gateways_went_offline(rows))
         
         except Exception as e:
             logger.error(f'Error checking offline gateways: {e}', exc_info=True)
     
+    async def _devices_went_offline(self, offline_devices):
+        """Devices the database has set offline (and logged): update the tracker and broadcast"""
+        logger.warning(f'Detected {len(offline_devices)} devices going offline')
+        
+        # Next message from these devices must be written through as a transition
+        presence_tracker.mark_devices_offline([d['device_id'] for d in offline_devices])
+        
+        for device in offline_devices:
+            logger.warning(f"Device offline: {device['device_id']} (type: {device['device_type']}, "
+                         f"last_seen: {device['last_seen']})")
+        
+        await self._broadcast_offline(offline_devices, 'timeout')
+    
+    async def _gateways_went_offline(self, rows):
+        """
+        Split a gateway statement's rows into gateways and cascaded devices, update
+        the tracker and broadcast. Returns the gateway rows.
+        """
+        offline_gateways = [row for row in rows if row['kind'] == 'gateway']
+        cascaded_devices = [row for row in rows if row['kind'] == 'device']
+        
+        if offline_gateways:
+            gateway_ids = [g['gateway_id'] for g in offline_gateways]
+            logger.error(f'Detected {len(offline_gateways)} gateways going offline: {gateway_ids}')
+            presence_tracker.mark_gateways_offline(gateway_ids)
+            
+            for gateway in offline_gateways:
+                logger.error(f"Gateway offline: {gateway['gateway_id']} (name: {gateway.get('name')}, "
+                           f"last_seen: {gateway['last_seen']})")
+        
+        if cascaded_devices:
+            logger.warning(f'Cascaded offline status to {len(cascaded_devices)} devices '
+                         f'under offline gateways')
+            presence_tracker.mark_devices_offline([d['device_id'] for d in cascaded_devices])
+            await self._broadcast_offline(cascaded_devices, 'gateway_offline')
+        
+        return offline_gateways
+    
+    async def _broadcast_offline(self, devices, reason):
+        """One WebSocket message per user listing all of that user's devices"""
+        timestamp = datetime.now().isoformat()
+        by_user = {}
+        for device in devices:
+            by_user.setdefault(device['user_id'], []).append({
+                'device_id': device['device_id'],
+                'data': {
+                    'status': 'offline',
+                    'timestamp': timestamp,
+                    'reason': reason
+                }
+            })
+        
+        results = await asyncio.gather(
+            *(ws_manager.broadcast_device_status_batch(user_id, updates) for user_id, updates in by_user.items()),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f'WebSocket broadcast error: {result}')
+    
     async def force_check_device(self, device_id):
         """Force immediate check of a specific device status"""
         try:
-            cutoff_time = datetime.now() - timedelta(seconds=self.device_timeout)
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.device_timeout)
             
-            query = """
-                UPDATE devices
-                SET status = 'offline', updated_at = NOW()
-                WHERE device_id = %s
-                  AND status = 'online'
-                  AND (last_seen IS NULL OR last_seen < %s)
-                RETURNING device_id, user_id, last_seen
-            """
+            # Same single statement as deadline expiry: status change and its log together
+            offline_devices = await adb.query_prepared(
+                'devices_expired', ('force_check', self.device_timeout, cutoff, [device_id]), commit=True
+            )
             
-            result = db.query(query, (device_id, cutoff_time))
-            
-            if result and len(result) > 0:
+            if offline_devices:
                 logger.warning(f'Force check: Device {device_id} marked offline')
+                await self._devices_went_offline(offline_devices)
                 return True
             
             return False
@@ -243,30 +433,15 @@ class OfflineDetector:
     async def force_check_gateway(self, gateway_id):
         """Force immediate check of a specific gateway status"""
         try:
-            cutoff_time = datetime.now() - timedelta(seconds=self.gateway_timeout)
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.gateway_timeout)
             
-            query = """
-                UPDATE gateways
-                SET status = 'offline', updated_at = NOW()
-                WHERE gateway_id = %s
-                  AND status = 'online'
-                  AND (last_seen IS NULL OR last_seen < %s)
-                RETURNING gateway_id, user_id
-            """
+            # Gateway, its log, and the cascade to its devices in one statement
+            rows = await adb.query_prepared(
+                'gateways_expired', ('force_check', self.gateway_timeout, cutoff, [gateway_id]), commit=True
+            )
             
-            result = db.query(query, (gateway_id, cutoff_time))
-            
-            if result and len(result) > 0:
+            if await self._gateways_went_offline(rows):
                 logger.error(f'Force check: Gateway {gateway_id} marked offline')
-                
-                # Cascade to devices
-                cascade_query = """
-                    UPDATE devices
-                    SET status = 'offline', updated_at = NOW()
-                    WHERE gateway_id = %s AND status != 'offline'
-                """
-                db.query(cascade_query, (gateway_id,))
-                
                 return True
             
             return False
@@ -277,7 +452,7 @@ class OfflineDetector:
 
 # Singleton instance
 offline_detector = OfflineDetector(
-    check_interval=10,      # Check every 10 seconds for faster detection
+    check_interval=60,      # Reconciliation sweep; deadlines fire on time in between
     device_timeout=90,      # Devices offline after 90 seconds (3x heartbeat interval)
     gateway_timeout=90      # Gateways offline after 90 seconds (3x heartbeat interval)
 )
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+from datetime import datetime, timezone
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed once a gateway sends compact payloads
+    msgpack = None
+
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+class PayloadError(Exception):
+    pass
+
+def is_msgpack(raw_payload, content_type=None):
+    """
+    True if the payload is MessagePack.
+
+    An MQTT 5 content type decides when present. Otherwise the first byte is
+    enough: a JSON object starts with '{' (or whitespace), a msgpack map with
+    0x80-0x8f (fixmap), 0xde (map16) or 0xdf (map32).
+    """
+    if content_type:
+        return content_type in MSGPACK_CONTENT_TYPES
+    if not raw_payload:
+        return False
+    first = raw_payload[0]
+    return 0x80 <= first <= 0x8f or first in (0xde, 0xdf)
+
+def epoch_ms_to_iso(epoch_ms):
+    """Epoch milliseconds -> ISO 8601 string (UTC), the format the rest of ingest expects"""
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).isoformat()
+
+def decode_payload(raw_payload, content_type=None):
+    """
+    Decode a gateway payload (JSON or MessagePack) into a dict.
+
+    Compact payloads carry timestamps as epoch milliseconds; they are converted
+    to ISO strings so handlers and SQL see the same shape as JSON payloads.
+
+    Raises:
+        PayloadError: If the payload can't be decoded or isn't an object
+    """
+    if is_msgpack(raw_payload, content_type):
+        if msgpack is None:
+            raise PayloadError('MessagePack payload received but msgpack is not installed')
+        try:
+            data = msgpack.unpackb(raw_payload, raw=False)
+        except Exception as e:
+            raise PayloadError(f'Invalid MessagePack payload: {e}')
+
+        if not isinstance(data, dict):
+            raise PayloadError('MessagePack payload is not a map')
+
+        for key in ('timestamp', 'time'):
+            if isinstance(data.get(key), int):
+                data[key] = epoch_ms_to_iso(data[key])
+        return data
+
+    try:
+        # json.loads decodes UTF-8 bytes itself, no intermediate str copy needed
+        data = json.loads(raw_payload)
+    except ValueError as e:
+        raise PayloadError(f'Invalid JSON payload: {e}')
+
+    if not isinstance(data, dict):
+        raise PayloadError('JSON payload is not an object')
+    return data
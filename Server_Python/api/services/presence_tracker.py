@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+from services.database import db
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# GREATEST keeps last_seen monotonic if an older message is flushed after a newer write-through
+db.prepare('device_flush', """
+    UPDATE devices AS d
+    SET last_seen = GREATEST(d.last_seen, v.last_seen),
+        status = 'online',
+        updated_at = GREATEST(d.updated_at, v.last_seen)
+    FROM unnest($1, $2) AS v(device_id, last_seen)
+    WHERE d.device_id = v.device_id
+""", ('text[]', 'timestamptz[]'))
+
+db.prepare('gateway_flush', """
+    UPDATE gateways AS g
+    SET last_seen = GREATEST(g.last_seen, v.last_seen),
+        status = 'online',
+        updated_at = GREATEST(g.updated_at, v.last_seen)
+    FROM unnest($1, $2) AS v(gateway_id, last_seen)
+    WHERE g.gateway_id = v.gateway_id
+""", ('text[]', 'timestamptz[]'))
+
+# Offline -> online write-throughs
+db.prepare('device_online', """
+    UPDATE devices
+    SET last_seen = $1, status = 'online', updated_at = $1
+    WHERE device_id = $2 AND gateway_id = $3
+    RETURNING device_id
+""", ('timestamptz', 'text', 'text'))
+
+db.prepare('gateway_online', """
+    UPDATE gateways
+    SET status = 'online', last_seen = $1, updated_at = $1
+    WHERE gateway_id = $2
+    RETURNING gateway_id
+""", ('timestamptz', 'text'))
+
+class PresenceTracker:
+    def __init__(self, flush_interval=1.0):
+        """
+        Args:
+            flush_interval: Seconds between coalesced last_seen flushes (default: 1)
+        """
+        self.flush_interval = flush_interval
+        self.running = False
+        self.thread = None
+        self.stop_event = threading.Event()
+
+        # Status as last written to the database: id -> 'online' / 'offline'
+        self.device_status = {}
+        self.gateway_status = {}
+
+        # Newest last_seen not yet written: id -> timestamp
+        self.pending_devices = {}
+        self.pending_gateways = {}
+        self.lock = threading.Lock()
+
+        # Notified of every sighting and offline marking (the offline detector's deadlines)
+        self.listener = None
+
+        # Stats
+        self.touches = 0
+        self.write_throughs = 0
+        self.flush_count = 0
+        self.rows_flushed = 0
+        self.last_flush_ms = 0.0
+
+    def start(self):
+        """Seed known statuses from the database and start the flush thread"""
+        if self.running:
+            return
+
+        self.load()
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._flush_loop, name='presence-flush', daemon=True)
+        self.thread.start()
+        logger.info(f'Presence tracker started (flush every {self.flush_interval}s, '
+                   f'{len(self.device_status)} devices, {len(self.gateway_status)} gateways)')
+
+    def stop(self):
+        """Stop the flush thread and write out pending last_seen values"""
+        self.running = False
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.flush()
+        logger.info('Presence tracker stopped')
+
+    def set_listener(self, listener):
+        """
+        Args:
+            listener: Object with seen(kind, entity_id) and offline(kind, entity_ids),
+                kind being 'device' or 'gateway'; called from the MQTT threads
+        """
+        self.listener = listener
+
+    def load(self):
+        """Seed the in-memory status maps from devices/gateways"""
+        devices = db.query('SELECT device_id, status FROM devices')
+        gateways = db.query('SELECT gateway_id, status FROM gateways')
+
+        with self.lock:
+            self.device_status = {row['device_id']: row['status'] for row in devices}
+            self.gateway_status = {row['gateway_id']: row['status'] for row in gateways}
+
+    def get_device_status(self, device_id):
+        """Last status written for a device ('online' / 'offline'), None if unknown"""
+        with self.lock:
+            return self.device_status.get(device_id)
+
+    def touch_device(self, device_id, gateway_id, timestamp):
+        """
+        Record that a device was seen.
+
+        Returns True if this was an offline->online transition (written through at once),
+        False if it was coalesced into the next flush, None if the device doesn't exist.
+        """
+        self.touches += 1
+        with self.lock:
+            online = self.device_status.get(device_id) == 'online'
+            if online:
+                self.pending_devices[device_id] = timestamp
+
+        if not online:
+            if not db.query_prepared('device_online', (timestamp, device_id, gateway_id), commit=True):
+                return None
+            with self.lock:
+                self.device_status[device_id] = 'online'
+            self.write_throughs += 1
+            logger.info(f'Device {device_id} is online')
+
+        if self.listener:
+            self.listener.seen('device', device_id)
+        return not online
+
+    def touch_gateway(self, gateway_id, timestamp):
+        """Record a gateway heartbeat; same return convention as touch_device"""
+        self.touches += 1
+        with self.lock:
+            online = self.gateway_status.get(gateway_id) == 'online'
+            if online:
+                self.pending_gateways[gateway_id] = timestamp
+
+        if not online:
+            if not db.query_prepared('gateway_online', (timestamp, gateway_id), commit=True):
+                return None
+            with self.lock:
+                self.gateway_status[gateway_id] = 'online'
+            self.write_throughs += 1
+
+        if self.listener:
+            self.listener.seen('gateway', gateway_id)
+        return not online
+
+    def mark_devices_offline(self, device_ids):
+        """Called after devices were set offline in the database (detector, status messages)"""
+        with self.lock:
+            for device_id in device_ids:
+                self.device_status[device_id] = 'offline'
+                self.pending_devices.pop(device_id, None)
+        if self.listener:
+            self.listener.offline('device', device_ids)
+
+    def mark_gateways_offline(self, gateway_ids):
+        """Called after gateways were set offline in the database"""
+        with self.lock:
+            for gateway_id in gateway_ids:
+                self.gateway_status[gateway_id] = 'offline'
+                self.pending_gateways.pop(gateway_id, None)
+        if self.listener:
+            self.listener.offline('gateway', gateway_ids)
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Error in presence flush loop: {e}', exc_info=True)
+
+    def flush(self):
+        """Write all pending last_seen values with one set-based UPDATE per table"""
+        with self.lock:
+            devices, self.pending_devices = self.pending_devices, {}
+            gateways, self.pending_gateways = self.pending_gateways, {}
+
+        if not devices and not gateways:
+            return
+
+        started = time.perf_counter()
+        row_count = len(devices) + len(gateways)
+
+        try:
+            if devices:
+                db.execute_prepared('device_flush', (list(devices), list(devices.values())))
+                devices = {}
+
+            if gateways:
+                db.execute_prepared('gateway_flush', (list(gateways), list(gateways.values())))
+        except Exception:
+            # Put unwritten entries back unless a newer touch already replaced them
+            with self.lock:
+                for device_id, timestamp in devices.items():
+                    self.pending_devices.setdefault(device_id, timestamp)
+                for gateway_id, timestamp in gateways.items():
+                    self.pending_gateways.setdefault(gateway_id, timestamp)
+            raise
+
+        self.flush_count += 1
+        self.rows_flushed += row_count
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def get_stats(self):
+        """Coalescing counters for monitoring endpoints"""
+        return {
+            'running': self.running,
+            'pending_devices': len(self.pending_devices),
+            'pending_gateways': len(self.pending_gateways),
+            'touches': self.touches,
+            'write_throughs': self.write_throughs,
+            'flush_count': self.flush_count,
+            'rows_flushed': self.rows_flushed,
+            'last_flush_ms': round(self.last_flush_ms, 2)
+        }
+
+# Singleton instance
+presence_tracker = PresenceTracker(flush_interval=settings.PRESENCE_FLUSH_INTERVAL_MS / 1000)
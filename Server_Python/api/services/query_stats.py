@@ -0,0 +1,194 @@
+import logging
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+@lru_cache(maxsize=2048)
+def fingerprint(query_text):
+    """
+    Statement shape used as the stats key: whitespace collapsed and inline
+    literals replaced with '?', so f-string variants of one query group together.
+    %s placeholders are left as they are.
+    """
+    text = _WHITESPACE.sub(' ', query_text).strip()
+    text = _STRING_LITERAL.sub('?', text)
+    return _NUMBER_LITERAL.sub('?', text)
+
+class StatementStats:
+    __slots__ = ('calls', 'errors', 'total', 'max', 'rows', 'pool_wait')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+
+class QueryStats:
+    def __init__(self, enabled=False, slow_ms=0, explain_rate=0.0, explain_interval=300):
+        """
+        Per-statement timing for Database calls, keyed by fingerprint.
+
+        Database checks `active` before taking any timestamps, so with both the
+        stats and the slow log off it costs one attribute read per call.
+
+        Args:
+            enabled: Collect timings (default: False)
+            slow_ms: Log statements slower than this; 0 disables the slow log
+            explain_rate: Share of slow SELECTs that also get EXPLAIN (ANALYZE, BUFFERS)
+            explain_interval: Minimum seconds between EXPLAINs of the same statement
+        """
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.active = enabled or slow_ms > 0
+        self.explain_rate = explain_rate
+        self.explain_interval = explain_interval
+
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.since = time.time()
+
+        # fingerprint -> monotonic time of the last EXPLAIN; one EXPLAIN runs at a time
+        self.last_explained = {}
+        self.explaining = False
+
+        # Stats
+        self.slow_queries = 0
+        self.explains = 0
+
+    def observe(self, database, query_text, params, elapsed, pool_wait, rows, error=False):
+        """Called by Database after every instrumented call"""
+        if self.enabled:
+            self.record(query_text, elapsed, pool_wait, rows, error)
+        if not error and self.is_slow(elapsed):
+            self.log_slow(database, query_text, params, elapsed, rows)
+
+    def record(self, query_text, elapsed, pool_wait, rows, error=False):
+        key = fingerprint(query_text)
+        with self.lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.calls += 1
+            stats.total += elapsed
+            stats.pool_wait += pool_wait
+            if elapsed > stats.max:
+                stats.max = elapsed
+            if error:
+                stats.errors += 1
+            else:
+                stats.rows += rows
+
+    def is_slow(self, elapsed):
+        return self.slow_ms > 0 and elapsed * 1000 >= self.slow_ms
+
+    def log_slow(self, database, query_text, params, elapsed, rows):
+        """Log a slow statement; sampled SELECTs are EXPLAINed on a background thread"""
+        self.slow_queries += 1
+        logger.warning(f'Slow query ({elapsed * 1000:.0f}ms, {rows} rows): {fingerprint(query_text)[:500]}')
+
+        if not self._should_explain(query_text, params):
+            return
+
+        threading.Thread(
+            target=self._explain, args=(database, query_text, params),
+            name='query-explain', daemon=True
+        ).start()
+
+    def _should_explain(self, query_text, params):
+        # EXPLAIN ANALYZE executes the statement, so only plain SELECTs qualify
+        if self.explain_rate <= 0 or not query_text.lstrip().upper().startswith('SELECT'):
+            return False
+        if random.random() >= self.explain_rate:
+            return False
+
+        key = fingerprint(query_text)
+        now = time.monotonic()
+        with self.lock:
+            if self.explaining or now - self.last_explained.get(key, -self.explain_interval) < self.explain_interval:
+                return False
+            self.explaining = True
+            self.last_explained[key] = now
+        return True
+
+    def _explain(self, database, query_text, params):
+        conn = None
+        try:
+            conn = database.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + query_text, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.close()
+            conn.rollback()
+            self.explains += 1
+            logger.warning(f'Plan for slow query {fingerprint(query_text)[:200]}:\n{plan}')
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f'EXPLAIN of slow query failed: {e}')
+        finally:
+            if conn:
+                database.put_connection(conn)
+            with self.lock:
+                self.explaining = False
+
+    def top(self, limit=20, order_by='total'):
+        """
+        Statements sorted by total, mean or max time, or by calls.
+
+        Args:
+            limit: Number of statements returned
+            order_by: 'total', 'mean', 'max' or 'calls'
+        """
+        with self.lock:
+            items = [
+                {
+                    'statement': key,
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'total_ms': round(stats.total * 1000, 2),
+                    'mean_ms': round(stats.total * 1000 / stats.calls, 3),
+                    'max_ms': round(stats.max * 1000, 2),
+                    'rows': stats.rows,
+                    'pool_wait_ms': round(stats.pool_wait * 1000, 2)
+                }
+                for key, stats in self.statements.items()
+            ]
+
+        sort_key = {'total': 'total_ms', 'mean': 'mean_ms', 'max': 'max_ms', 'calls': 'calls'}[order_by]
+        items.sort(key=lambda item: item[sort_key], reverse=True)
+        return items[:limit]
+
+    def reset(self):
+        with self.lock:
+            self.statements = {}
+            self.since = time.time()
+
+    def get_stats(self):
+        """Collector settings and counters for monitoring endpoints"""
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'explain_rate': self.explain_rate,
+            'statements': len(self.statements),
+            'slow_queries': self.slow_queries,
+            'explains': self.explains,
+            'since': self.since
+        }
+
+# Singleton instance
+query_stats = QueryStats(
+    enabled=settings.DB_QUERY_STATS,
+    slow_ms=settings.DB_SLOW_QUERY_MS,
+    explain_rate=settings.DB_SLOW_QUERY_EXPLAIN_RATE
+)
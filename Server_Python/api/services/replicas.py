@@ -0,0 +1,167 @@
+import itertools
+import logging
+import threading
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+logger = logging.getLogger(__name__)
+
+# WAL receiver state and replay lag. Lag is zero when everything received has been
+# replayed, so an idle primary doesn't make a caught-up replica look stale; that only
+# holds while the receiver is streaming, since a disconnected one receives nothing
+# either. Reading the receiver status needs superuser or pg_read_all_stats; without
+# it the status reads NULL and the replica stays out of rotation.
+LAG_QUERY = """
+    SELECT
+        NOT pg_is_in_recovery()
+            OR EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') AS streaming,
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag
+"""
+
+class Replica:
+    def __init__(self, dsn, maxconn):
+        """
+        Args:
+            dsn: libpq connection string or postgresql:// URL
+            maxconn: Pool size for this replica
+        """
+        self.dsn = dsn
+        self.maxconn = maxconn
+        self.pool = None
+        self.healthy = False
+        self.streaming = False
+        self.lag = None
+
+        # Host part only, for logs (the DSN may carry a password)
+        self.name = dsn.split('@')[-1].split('?')[0] if '@' in dsn else dsn.split(' ')[0]
+
+    def check(self):
+        """Open the pool if needed and read receiver state and replay lag; raises on failure"""
+        if self.pool is None:
+            self.pool = ThreadedConnectionPool(minconn=1, maxconn=self.maxconn, dsn=self.dsn)
+        conn = self.pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(LAG_QUERY)
+            streaming, lag = cursor.fetchone()
+            self.streaming = bool(streaming)
+            self.lag = float(lag)
+            cursor.close()
+            conn.rollback()
+        except Exception:
+            self.pool.putconn(conn, close=True)
+            raise
+        self.pool.putconn(conn)
+
+    def close(self):
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
+
+class ReplicaSet:
+    def __init__(self):
+        """
+        Read replicas for read_only queries, with a monitor thread keeping each
+        one's health and replay lag current. Queries go round-robin to replicas
+        that are reachable and within max_lag; with none usable, callers use the primary.
+        """
+        self.replicas = []
+        self.max_lag = 10.0
+        self.check_interval = 5.0
+        self.cycle = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def connect(self, dsns, maxconn=10, max_lag=10.0, check_interval=5.0):
+        """
+        Args:
+            dsns: Replica DSNs; empty leaves every read on the primary
+            maxconn: Pool size per replica (default: 10)
+            max_lag: Replay lag in seconds beyond which a replica is skipped (default: 10)
+            check_interval: Seconds between health/lag checks (default: 5)
+        """
+        self.replicas = [Replica(dsn, maxconn) for dsn in dsns]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        if not self.replicas:
+            return
+
+        self.cycle = itertools.cycle(self.replicas)
+        self.check_all()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._monitor_loop, name='replica-monitor', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+        for replica in self.replicas:
+            replica.close()
+        self.replicas = []
+        self.cycle = None
+
+    def _monitor_loop(self):
+        while not self.stop_event.wait(self.check_interval):
+            self.check_all()
+
+    def check_all(self):
+        for replica in self.replicas:
+            try:
+                replica.check()
+            except PoolError:
+                # Every connection is busy serving reads: the replica is up, keep its state
+                continue
+            except Exception as e:
+                if replica.healthy:
+                    logger.warning(f'Replica {replica.name} unavailable, reads fall back to the primary: {e}')
+                replica.healthy = False
+                continue
+
+            usable = replica.streaming and replica.lag <= self.max_lag
+            if usable != replica.healthy:
+                if usable:
+                    logger.info(f'Replica {replica.name} in service (lag {replica.lag:.1f}s)')
+                elif not replica.streaming:
+                    logger.warning(f'Replica {replica.name} WAL receiver not streaming (or its status is '
+                                   f'not visible without pg_read_all_stats), reads fall back to the primary')
+                else:
+                    logger.warning(f'Replica {replica.name} lagging {replica.lag:.1f}s '
+                                   f'(> {self.max_lag}s), reads fall back to the primary')
+            replica.healthy = usable
+
+    def pick(self):
+        """Next usable replica, or None"""
+        if not self.cycle:
+            return None
+        for _ in range(len(self.replicas)):
+            replica = next(self.cycle)
+            if replica.healthy:
+                return replica
+        return None
+
+    def mark_down(self, replica, error):
+        """A query failed on the replica; skip it until the next successful check"""
+        if replica.healthy:
+            logger.warning(f'Replica {replica.name} query failed, reads fall back to the primary: {error}')
+        replica.healthy = False
+
+    def get_stats(self):
+        return [
+            {
+                'replica': replica.name,
+                'healthy': replica.healthy,
+                'streaming': replica.streaming,
+                'lag_seconds': None if replica.lag is None else round(replica.lag, 2)
+            }
+            for replica in self.replicas
+        ]
+
+# Errors that mean "this replica can't answer right now", as opposed to a bad query:
+# connection loss, and queries cancelled by recovery conflicts
+REPLICA_ERRORS = (psycopg2.OperationalError, psycopg2.extensions.TransactionRollbackError)
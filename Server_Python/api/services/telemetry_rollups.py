@@ -0,0 +1,289 @@
+import re
+from datetime import datetime, timezone
+
+# Continuous aggregates from schema.sql, coarsest first: (view, bucket seconds)
+ROLLUPS = (
+    ('telemetry_1d', 86400),
+    ('telemetry_1h', 3600),
+    ('telemetry_1m', 60)
+)
+
+# telemetry_1d buckets by local day; coarser re-buckets of it keep the same alignment
+LOCAL_TIMEZONE = 'Asia/Ho_Chi_Minh'
+
+# Retention tiers from schema.sql, finest first: (source, bucket seconds, kept seconds)
+TIERS = (
+    ('telemetry', 0, 7 * 86400),
+    ('telemetry_1m', 60, 90 * 86400),
+    ('telemetry_1h', 3600, None)
+)
+
+# Chart resolutions a computed step is rounded up to; each is a whole number of
+# the rollup bucket it will be read from
+NICE_RESOLUTIONS = (
+    60, 120, 300, 600, 900, 1800,
+    3600, 7200, 10800, 21600, 43200,
+    86400, 604800
+)
+
+UNIT_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400, 'week': 604800}
+INTERVAL_RE = re.compile(r'^\s*(\d+)\s*(second|minute|hour|day|week)s?\s*$', re.IGNORECASE)
+
+# Weighted re-aggregation of rollup rows into coarser buckets
+REBUCKET_COLUMNS = """
+    SUM(avg_temperature * temperature_count) / NULLIF(SUM(temperature_count), 0) AS avg_temperature,
+    MIN(min_temperature) AS min_temperature,
+    MAX(max_temperature) AS max_temperature,
+    SUM(avg_humidity * humidity_count) / NULLIF(SUM(humidity_count), 0) AS avg_humidity,
+    MIN(min_humidity) AS min_humidity,
+    MAX(max_humidity) AS max_humidity,
+    SUM(sample_count) AS sample_count
+"""
+
+RAW_COLUMNS = """
+    AVG(temperature) AS avg_temperature,
+    MIN(temperature) AS min_temperature,
+    MAX(temperature) AS max_temperature,
+    AVG(humidity) AS avg_humidity,
+    MIN(humidity) AS min_humidity,
+    MAX(humidity) AS max_humidity,
+    COUNT(*) AS sample_count
+"""
+
+ROLLUP_COLUMNS = """
+    avg_temperature, min_temperature, max_temperature,
+    avg_humidity, min_humidity, max_humidity, sample_count
+"""
+
+def parse_interval(text):
+    """'15 minutes' / '1 hour' -> seconds; ValueError for anything else"""
+    match = INTERVAL_RE.match(text or '')
+    if not match:
+        raise ValueError(f"Unsupported interval '{text}' (use e.g. '5 minutes', '1 hour', '1 day')")
+    return int(match.group(1)) * UNIT_SECONDS[match.group(2).lower()]
+
+def resolution_for(span_seconds, max_points=500):
+    """Smallest nice resolution that keeps span_seconds under max_points buckets"""
+    step = span_seconds / max_points
+    for resolution in NICE_RESOLUTIONS:
+        if resolution >= step:
+            return resolution
+    return NICE_RESOLUTIONS[-1]
+
+def _age_seconds(start):
+    """Seconds between start (datetime or ISO string) and now"""
+    if isinstance(start, str):
+        try:
+            start = datetime.fromisoformat(start.strip().replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid start time '{start}'")
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - start).total_seconds()
+
+def finest_tier(start=None):
+    """
+    Finest retention tier still holding data from start onwards, as
+    (source, bucket seconds); raw telemetry when start is omitted.
+    """
+    age = _age_seconds(start) if start else 0
+    for source, bucket, kept in TIERS:
+        if kept is None or age <= kept:
+            return source, bucket
+    return TIERS[-1][:2]
+
+def fit_resolution(resolution, start=None):
+    """Round resolution up to a whole number of the finest bucket retained at start"""
+    _, bucket = finest_tier(start)
+    if bucket and resolution % bucket:
+        return (resolution // bucket + 1) * bucket
+    return resolution
+
+def pick_source(resolution):
+    """
+    Coarsest continuous aggregate whose bucket divides the resolution, or
+    (None, resolution) when only raw telemetry is fine enough.
+    """
+    for view, bucket in ROLLUPS:
+        if resolution >= bucket and resolution % bucket == 0:
+            return view, bucket
+    return None, resolution
+
+def series_query(resolution, device_id, user_id=None, start=None, end=None, descending=False):
+    """
+    Build the chart query for one device at the given resolution.
+
+    Reads the chosen rollup directly when its bucket equals the resolution,
+    re-buckets it (weighted by per-metric counts) when the resolution is a
+    multiple of the bucket, and falls back to time_bucket over raw telemetry
+    below one minute. Every row has bucket, avg/min/max temperature and
+    humidity, and sample_count. The resolution is first widened to a tier that
+    still retains data at start (see fit_resolution).
+
+    Args:
+        resolution: Bucket width in seconds
+        device_id: Device to chart
+        user_id: Also scope by owner (omit when ownership was already checked)
+        start: Inclusive lower bound on bucket time (optional)
+        end: Inclusive upper bound on bucket time (optional)
+        descending: Newest bucket first
+
+    Returns:
+        (query, params, resolution actually used)
+    """
+    resolution = fit_resolution(resolution, start)
+    view, bucket = pick_source(resolution)
+    time_column = 'bucket' if view else 'time'
+    conditions = ['device_id = %s']
+    params = [device_id]
+
+    if user_id:
+        conditions.append('user_id = %s')
+        params.append(user_id)
+
+    if start:
+        conditions.append(f'{time_column} >= %s')
+        params.append(start)
+
+    if end:
+        conditions.append(f'{time_column} <= %s')
+        params.append(end)
+
+    where = ' AND '.join(conditions)
+    order = 'DESC' if descending else 'ASC'
+
+    if view and bucket == resolution:
+        query = f'SELECT bucket, {ROLLUP_COLUMNS} FROM {view} WHERE {where} ORDER BY bucket {order}'
+        return query, tuple(params), resolution
+
+    columns = REBUCKET_COLUMNS if view else RAW_COLUMNS
+    timezone_arg = f", '{LOCAL_TIMEZONE}'" if view == 'telemetry_1d' else ''
+    query = f"""
+        SELECT time_bucket(make_interval(secs => %s), {time_column}{timezone_arg}) AS bucket, {columns}
+        FROM {view or 'telemetry'}
+        WHERE {where}
+        GROUP BY 1
+        ORDER BY 1 {order}
+    """
+    return query, (resolution, *params), resolution
+
+# How a reading column reads from a rollup tier: averages stand in for the
+# values, and metadata records the rollup and its sample count
+def _rollup_column(source, column):
+    return {
+        'time': 'bucket AS time',
+        'gateway_id': 'NULL AS gateway_id',
+        'temperature': 'avg_temperature AS temperature',
+        'humidity': 'avg_humidity AS humidity',
+        'metadata': f"jsonb_build_object('rollup', '{source}', 'sample_count', sample_count) AS metadata"
+    }.get(column, column)
+
+def _tier_parts(columns, user_id, device_id=None, start=None, end=None):
+    """
+    Per retention tier overlapping start, finest first: (source, time column,
+    SELECT list, WHERE clause, params). Each tier only answers for the range
+    the finer tiers no longer keep, so the parts never overlap.
+    """
+    age = _age_seconds(start) if start else None
+    newer_than = None
+
+    for source, _, kept in TIERS:
+        if newer_than is not None and age is not None and age < newer_than:
+            break  # start falls in a finer tier, nothing older is wanted
+
+        if source == 'telemetry':
+            time_column = 'time'
+            select = ', '.join(columns)
+        else:
+            time_column = 'bucket'
+            select = ', '.join(_rollup_column(source, column) for column in columns)
+
+        conditions = ['user_id = %s']
+        params = [user_id]
+
+        if device_id:
+            conditions.append('device_id = %s')
+            params.append(device_id)
+
+        if start:
+            conditions.append(f'{time_column} >= %s')
+            params.append(start)
+
+        if end:
+            conditions.append(f'{time_column} <= %s')
+            params.append(end)
+
+        if newer_than is not None:
+            conditions.append(f'{time_column} < NOW() - make_interval(secs => %s)')
+            params.append(newer_than)
+
+        if kept is not None:
+            conditions.append(f'{time_column} >= NOW() - make_interval(secs => %s)')
+            params.append(kept)
+
+        yield source, time_column, select, ' AND '.join(conditions), params
+        newer_than = kept
+
+def readings_query(user_id, device_id=None, start=None, end=None, limit=100):
+    """
+    Newest-first readings across the retention tiers: raw rows while they are
+    kept, then 1-minute and hourly rollup buckets for older history. Rollup rows
+    carry their averages as temperature/humidity, no gateway_id, and
+    {'rollup': view, 'sample_count': n} as metadata.
+
+    Args:
+        user_id: Owner
+        device_id: Only this device (optional)
+        start: Inclusive lower bound on time (optional)
+        end: Inclusive upper bound on time (optional)
+        limit: Maximum rows
+
+    Returns:
+        (query, params)
+    """
+    columns = ('time', 'device_id', 'gateway_id', 'user_id', 'temperature', 'humidity', 'metadata')
+    parts = []
+    params = []
+
+    for source, time_column, select, where, tier_params in _tier_parts(columns, user_id, device_id, start, end):
+        parts.append(f"""
+            (SELECT {select} FROM {source}
+             WHERE {where}
+             ORDER BY {time_column} DESC LIMIT %s)
+        """)
+        params.extend(tier_params)
+        params.append(limit)
+
+    query = ' UNION ALL '.join(parts) + ' ORDER BY time DESC LIMIT %s'
+    return query, (*params, limit)
+
+def export_query(columns, user_id, device_id=None, start=None, end=None):
+    """
+    Oldest-first export of every reading across the retention tiers, in the
+    same shape as readings_query. Tiers are chained coarsest first, each in
+    time order; a cursor runs the UNION ALL as a sequential append, so rows
+    stream out in time order without sorting the whole range.
+
+    Args:
+        columns: Output columns, named as in telemetry
+        user_id: Owner
+        device_id: Only this device (optional)
+        start: Inclusive lower bound on time (optional)
+        end: Inclusive upper bound on time (optional)
+
+    Returns:
+        (query, params)
+    """
+    parts = []
+    params = []
+
+    for source, time_column, select, where, tier_params in reversed(
+            list(_tier_parts(columns, user_id, device_id, start, end))):
+        parts.append(f"""
+            (SELECT {select} FROM {source}
+             WHERE {where}
+             ORDER BY {time_column})
+        """)
+        params.extend(tier_params)
+
+    return ' UNION ALL '.join(parts), tuple(params)
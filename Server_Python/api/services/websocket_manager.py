@@ -72,6 +72,14 @@ class WebSocketManager:
         }
         await self.broadcast_to_user(user_id, message)
     
+    async def broadcast_device_status_batch(self, user_id: str, updates: list):
+        """Broadcast many device status updates as one message ([{device_id, data}, ...])"""
+        message = {
+            'type': 'device_status_batch',
+            'devices': updates
+        }
+        await self.broadcast_to_user(user_id, message)
+    
     async def broadcast_alert(self, user_id: str, alert: dict):
         """Broadcast alert to user"""
         message = {
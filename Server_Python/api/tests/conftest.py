@@ -0,0 +1,11 @@
+"""
+Unit tests for the API's pure logic (no database or broker needed).
+
+Run from Server_Python/api:
+    python -m pytest tests
+"""
+import os
+import sys
+
+# Import services/ and config/ the way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
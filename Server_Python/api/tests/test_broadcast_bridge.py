@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from services.broadcast_bridge import BroadcastBridge
+
+def telemetry(device_id, temperature):
+    return {'type': 'telemetry', 'user_id': 'u1', 'data': {'device_id': device_id, 'temperature': temperature}}
+
+def status(device_id, value):
+    return {'type': 'device_status', 'user_id': 'u1', 'device_id': device_id, 'data': {'status': value}}
+
+def access(device_id):
+    return {'type': 'access_event', 'user_id': 'u1', 'data': {'device_id': device_id}}
+
+def make_bridge(**kwargs):
+    bridge = BroadcastBridge(**kwargs)
+    bridge.wakeup = asyncio.Event()
+    return bridge
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        BroadcastBridge(overflow_policy='drop_newest')
+
+def test_drop_oldest_keeps_newest_messages():
+    bridge = make_bridge(max_pending=3)
+    for n in range(5):
+        bridge._enqueue(telemetry('d1', n))
+
+    assert [m['data']['temperature'] for m in bridge.pending.values()] == [2, 3, 4]
+    assert bridge.dropped == 2
+    assert bridge.coalesced == 0
+
+def test_coalesce_replaces_in_place():
+    bridge = make_bridge(overflow_policy='coalesce')
+    bridge._enqueue(telemetry('d1', 20))
+    bridge._enqueue(telemetry('d2', 30))
+    bridge._enqueue(telemetry('d1', 21))
+
+    messages = list(bridge.pending.values())
+    # d1 keeps its original position but carries the newest reading
+    assert [m['data']['device_id'] for m in messages] == ['d1', 'd2']
+    assert messages[0]['data']['temperature'] == 21
+    assert bridge.coalesced == 1
+    assert bridge.published == 3
+
+def test_coalesce_keys_status_separately_from_telemetry():
+    bridge = make_bridge(overflow_policy='coalesce')
+    bridge._enqueue(telemetry('d1', 20))
+    bridge._enqueue(status('d1', 'online'))
+    bridge._enqueue(status('d1', 'offline'))
+
+    assert len(bridge.pending) == 2
+    assert list(bridge.pending.values())[1]['data']['status'] == 'offline'
+
+def test_coalesce_never_merges_access_events():
+    bridge = make_bridge(overflow_policy='coalesce')
+    for _ in range(3):
+        bridge._enqueue(access('d1'))
+
+    assert len(bridge.pending) == 3
+    assert bridge.coalesced == 0
+
+def test_coalesce_still_bounded():
+    bridge = make_bridge(max_pending=2, overflow_policy='coalesce')
+    for device_id in ('d1', 'd2', 'd3'):
+        bridge._enqueue(telemetry(device_id, 20))
+
+    assert [m['data']['device_id'] for m in bridge.pending.values()] == ['d2', 'd3']
+    assert bridge.dropped == 1
+
+def test_publish_before_start_is_dropped():
+    bridge = BroadcastBridge()
+    bridge.publish(telemetry('d1', 20))
+
+    assert bridge.dropped == 1
+    assert not bridge.pending
+
+def test_publish_goes_to_relay_when_set():
+    relayed = []
+    bridge = BroadcastBridge()
+    bridge.set_relay(lambda message: relayed.append(message) or True)
+    bridge.publish(telemetry('d1', 20))
+
+    assert relayed == [telemetry('d1', 20)]
+    assert bridge.relayed == 1
+
+def test_failed_relay_counts_as_dropped():
+    bridge = BroadcastBridge()
+    bridge.set_relay(lambda message: False)
+    bridge.publish(telemetry('d1', 20))
+
+    assert bridge.dropped == 1
@@ -0,0 +1,81 @@
+from services.offline_detector import DeadlineScheduler
+
+DEVICE = ('device', 'd1')
+OTHER = ('device', 'd2')
+GATEWAY = ('gateway', 'g1')
+
+def test_pop_due_returns_expired_keys_only():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 100)
+    scheduler.arm(GATEWAY, 200)
+
+    assert scheduler.pop_due(99) == []
+    assert scheduler.pop_due(150) == [DEVICE]
+    assert scheduler.pop_due(250) == [GATEWAY]
+    assert len(scheduler) == 0
+
+def test_expiry_order_follows_deadlines_not_arm_order():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(GATEWAY, 300)
+    scheduler.arm(OTHER, 200)
+    scheduler.arm(DEVICE, 100)
+
+    assert scheduler.pop_due(1000) == [DEVICE, OTHER, GATEWAY]
+
+def test_deadline_at_now_is_due():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 100)
+    assert scheduler.pop_due(100) == [DEVICE]
+
+def test_sighting_pushes_deadline_out():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 100)
+    scheduler.arm(DEVICE, 190)
+
+    # The early heap entry surfaces, is re-queued at the new deadline, and expires later
+    assert scheduler.pop_due(150) == []
+    assert scheduler.next_deadline() == 190
+    assert scheduler.pop_due(190) == [DEVICE]
+
+def test_arm_never_pulls_deadline_in():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 200)
+    assert scheduler.arm(DEVICE, 100) is False
+
+    assert scheduler.pop_due(150) == []
+    assert scheduler.pop_due(200) == [DEVICE]
+
+def test_extending_keeps_one_heap_entry():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 100)
+    for deadline in range(101, 200):
+        scheduler.arm(DEVICE, deadline)
+
+    assert len(scheduler.heap) == 1
+    assert len(scheduler) == 1
+
+def test_arm_reports_new_earliest_deadline():
+    scheduler = DeadlineScheduler()
+    assert scheduler.arm(DEVICE, 200) is True
+    assert scheduler.arm(OTHER, 100) is True    # new head: the loop must wake sooner
+    assert scheduler.arm(GATEWAY, 300) is False
+
+def test_forgotten_key_never_expires():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 100)
+    scheduler.arm(OTHER, 100)
+    scheduler.forget(DEVICE)
+
+    assert scheduler.pop_due(200) == [OTHER]
+
+def test_rearm_after_expiry():
+    scheduler = DeadlineScheduler()
+    scheduler.arm(DEVICE, 100)
+    assert scheduler.pop_due(100) == [DEVICE]
+
+    scheduler.arm(DEVICE, 300)
+    assert scheduler.pop_due(200) == []
+    assert scheduler.pop_due(300) == [DEVICE]
+
+def test_next_deadline_empty():
+    assert DeadlineScheduler().next_deadline() is None
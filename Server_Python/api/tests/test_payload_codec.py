@@ -0,0 +1,62 @@
+import json
+import pytest
+from services import payload_codec
+from services.payload_codec import decode_payload, is_msgpack, epoch_ms_to_iso, PayloadError
+
+@pytest.mark.parametrize('raw', [b'{"a": 1}', b' {"a": 1}', b'\n{}'])
+def test_json_is_not_msgpack(raw):
+    assert not is_msgpack(raw)
+
+@pytest.mark.parametrize('first', [0x80, 0x85, 0x8f, 0xde, 0xdf])
+def test_msgpack_maps_are_sniffed(first):
+    assert is_msgpack(bytes([first]) + b'\x00')
+
+def test_empty_payload_is_not_msgpack():
+    assert not is_msgpack(b'')
+
+def test_content_type_overrides_sniffing():
+    assert is_msgpack(b'{"a": 1}', content_type='application/msgpack')
+    assert not is_msgpack(b'\x81\xa1a\x01', content_type='application/json')
+
+def test_epoch_ms_to_iso_is_utc():
+    assert epoch_ms_to_iso(1704067200123) == '2024-01-01T00:00:00.123000+00:00'
+
+def test_decode_json_object():
+    assert decode_payload(json.dumps({'device_id': 'd1', 'timestamp': '2024-01-01T00:00:00Z'}).encode()) == {
+        'device_id': 'd1', 'timestamp': '2024-01-01T00:00:00Z'
+    }
+
+@pytest.mark.parametrize('raw', [b'[1, 2]', b'not json', b'"text"'])
+def test_decode_rejects_non_object_json(raw):
+    with pytest.raises(PayloadError):
+        decode_payload(raw)
+
+def test_msgpack_without_library_is_a_payload_error(monkeypatch):
+    monkeypatch.setattr(payload_codec, 'msgpack', None)
+    with pytest.raises(PayloadError):
+        decode_payload(b'\x80')
+
+@pytest.fixture
+def msgpack():
+    # Optional dependency, as in payload_codec itself
+    return pytest.importorskip('msgpack')
+
+def test_msgpack_epoch_ms_timestamps_become_iso(msgpack):
+    raw = msgpack.packb({'device_id': 'd1', 'timestamp': 1704067200000, 'time': 1704067200500})
+    data = decode_payload(raw)
+
+    assert data['timestamp'] == '2024-01-01T00:00:00+00:00'
+    assert data['time'] == '2024-01-01T00:00:00.500000+00:00'
+    assert data['device_id'] == 'd1'
+
+def test_msgpack_string_timestamps_are_left_alone(msgpack):
+    raw = msgpack.packb({'timestamp': '2024-01-01T00:00:00Z'})
+    assert decode_payload(raw)['timestamp'] == '2024-01-01T00:00:00Z'
+
+def test_msgpack_non_map_is_rejected(msgpack):
+    with pytest.raises(PayloadError):
+        decode_payload(msgpack.packb([1, 2]), content_type='application/msgpack')
+
+def test_msgpack_garbage_is_rejected(msgpack):
+    with pytest.raises(PayloadError):
+        decode_payload(b'\xde\xff', content_type='application/msgpack')
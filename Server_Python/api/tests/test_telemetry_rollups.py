@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from services.telemetry_rollups import (
+    parse_interval, resolution_for, pick_source, finest_tier, fit_resolution, series_query
+)
+
+DAY = 86400
+
+def days_ago(days):
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+@pytest.mark.parametrize('text, seconds', [
+    ('30 seconds', 30), ('5 minutes', 300), ('1 hour', 3600), ('2 Days', 2 * DAY), ('1 week', 7 * DAY)
+])
+def test_parse_interval(text, seconds):
+    assert parse_interval(text) == seconds
+
+@pytest.mark.parametrize('text', ['', 'hour', '1 fortnight', '-1 hour', None])
+def test_parse_interval_rejects(text):
+    with pytest.raises(ValueError):
+        parse_interval(text)
+
+@pytest.mark.parametrize('span, max_points, resolution', [
+    (3600, 500, 60),            # finer than a minute still rounds up to the smallest step
+    (DAY, 500, 300),            # 172.8s step
+    (DAY, 1440, 60),            # exactly one minute per point
+    (7 * DAY, 500, 1800),       # 1209.6s step
+    (30 * DAY, 500, 7200),      # 5184s step
+    (3650 * DAY, 500, 604800),  # beyond the largest step, capped at a week
+])
+def test_resolution_for(span, max_points, resolution):
+    assert resolution_for(span, max_points) == resolution
+
+@pytest.mark.parametrize('resolution, source', [
+    (30, (None, 30)),
+    (60, ('telemetry_1m', 60)),
+    (90, (None, 90)),            # not a whole number of minutes: raw telemetry
+    (300, ('telemetry_1m', 60)),
+    (3600, ('telemetry_1h', 3600)),
+    (10800, ('telemetry_1h', 3600)),
+    (5400, ('telemetry_1m', 60)),
+    (DAY, ('telemetry_1d', DAY)),
+    (7 * DAY, ('telemetry_1d', DAY)),
+])
+def test_pick_source_takes_coarsest_dividing_rollup(resolution, source):
+    assert pick_source(resolution) == source
+
+@pytest.mark.parametrize('start, tier', [
+    (None, ('telemetry', 0)),
+    (days_ago(6.9), ('telemetry', 0)),
+    (days_ago(7.1), ('telemetry_1m', 60)),
+    (days_ago(89.9), ('telemetry_1m', 60)),
+    (days_ago(90.1), ('telemetry_1h', 3600)),
+    (days_ago(3650), ('telemetry_1h', 3600)),
+])
+def test_finest_tier_at_retention_boundaries(start, tier):
+    assert finest_tier(start) == tier
+
+def test_finest_tier_accepts_iso_strings():
+    assert finest_tier((days_ago(30)).isoformat().replace('+00:00', 'Z')) == ('telemetry_1m', 60)
+
+def test_finest_tier_rejects_bad_start():
+    with pytest.raises(ValueError):
+        finest_tier('yesterday')
+
+@pytest.mark.parametrize('resolution, start, fitted', [
+    (30, None, 30),             # raw telemetry kept: any resolution
+    (30, days_ago(10), 60),     # only minute rollups left
+    (90, days_ago(10), 120),
+    (300, days_ago(10), 300),
+    (300, days_ago(100), 3600), # only hourly rollups left
+    (5400, days_ago(100), 7200),
+    (DAY, days_ago(100), DAY),
+])
+def test_fit_resolution_rounds_up_to_retained_bucket(resolution, start, fitted):
+    assert fit_resolution(resolution, start) == fitted
+
+def test_series_query_reads_rollup_directly_at_its_bucket():
+    query, params, resolution = series_query(3600, 'd1', user_id='u1')
+    assert 'FROM telemetry_1h' in query
+    assert 'time_bucket' not in query
+    assert params == ('d1', 'u1')
+    assert resolution == 3600
+
+def test_series_query_rebuckets_coarser_resolutions():
+    query, params, resolution = series_query(7200, 'd1')
+    assert 'FROM telemetry_1h' in query
+    assert 'time_bucket' in query
+    assert params == (7200, 'd1')
+
+def test_series_query_rebuckets_days_in_local_time():
+    query, _, _ = series_query(7 * DAY, 'd1')
+    assert 'FROM telemetry_1d' in query
+    assert "'Asia/Ho_Chi_Minh'" in query
+
+def test_series_query_widens_old_ranges():
+    query, _, resolution = series_query(30, 'd1', start=days_ago(100))
+    assert resolution == 3600
+    assert 'FROM telemetry_1h' in query
@@ -60,6 +60,25 @@ CREATE INDEX IF NOT EXISTS idx_devices_type ON devices(device_type);
 CREATE INDEX IF NOT EXISTS idx_devices_status ON devices(status);
 CREATE INDEX IF NOT EXISTS idx_devices_last_seen ON devices(last_seen);
 
+-- Notify the API's in-memory device registry when routing fields change.
+-- last_seen/status updates are deliberately excluded so ingest doesn't trigger reloads.
+CREATE OR REPLACE FUNCTION notify_devices_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM pg_notify('devices_changed', OLD.device_id);
+    END IF;
+    IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.device_id <> OLD.device_id) THEN
+        PERFORM pg_notify('devices_changed', NEW.device_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS devices_changed_notify ON devices;
+CREATE TRIGGER devices_changed_notify
+    AFTER INSERT OR DELETE OR UPDATE OF device_id, gateway_id, user_id, device_type ON devices
+    FOR EACH ROW EXECUTE FUNCTION notify_devices_changed();
+
 -- Passwords table: passwords for keypad door access
 CREATE TABLE IF NOT EXISTS passwords (
     password_id TEXT PRIMARY KEY,
@@ -106,12 +125,32 @@ CREATE TABLE telemetry (
     metadata JSONB -- Additional sensor data (battery, signal strength, etc.)
 );
 
-SELECT create_hypertable('telemetry', 'time', if_not_exists => TRUE);
+-- One-day chunks: a 100-device fleet at 10 s intervals writes ~0.9M rows/day,
+-- which keeps the open chunk and its indexes well inside a small VPS's memory
+SELECT create_hypertable('telemetry', 'time',
+    chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE);
 
 CREATE INDEX IF NOT EXISTS idx_telemetry_user_time ON telemetry(user_id, time DESC);
 CREATE INDEX IF NOT EXISTS idx_telemetry_device_time ON telemetry(device_id, time DESC);
 CREATE INDEX IF NOT EXISTS idx_telemetry_gateway_time ON telemetry(gateway_id, time DESC);
 
+-- Latest reading per device, upserted by the ingest flush in the same transaction
+-- as the telemetry INSERT. Temperature and humidity keep their own timestamps so
+-- a reading missing one metric doesn't blank the other. No FK to devices: a
+-- device deleted mid-flush must not fail the telemetry batch.
+CREATE TABLE IF NOT EXISTS telemetry_latest (
+    device_id TEXT PRIMARY KEY,
+    gateway_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    time TIMESTAMPTZ NOT NULL, -- Newest reading of either metric
+    temperature DOUBLE PRECISION,
+    temperature_time TIMESTAMPTZ,
+    humidity DOUBLE PRECISION,
+    humidity_time TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_telemetry_latest_user ON telemetry_latest(user_id);
+
 -- Access logs table: RFID and password access attempts
 CREATE TABLE access_logs (
     time TIMESTAMPTZ NOT NULL, -- Timestamp from gateway, not server
@@ -126,7 +165,9 @@ CREATE TABLE access_logs (
     metadata JSONB -- Additional context (source, command_id, etc.)
 );
 
-SELECT create_hypertable('access_logs', 'time', if_not_exists => TRUE);
+-- Low volume: wider chunks give compression enough rows per device to work with
+SELECT create_hypertable('access_logs', 'time',
+    chunk_time_interval => INTERVAL '14 days', if_not_exists => TRUE);
 
 CREATE INDEX IF NOT EXISTS idx_access_logs_user_time ON access_logs(user_id, time DESC);
 CREATE INDEX IF NOT EXISTS idx_access_logs_device_time ON access_logs(device_id, time DESC);
@@ -148,7 +189,8 @@ CREATE TABLE system_logs (
     metadata JSONB -- Additional event data
 );
 
-SELECT create_hypertable('system_logs', 'time', if_not_exists => TRUE);
+SELECT create_hypertable('system_logs', 'time',
+    chunk_time_interval => INTERVAL '14 days', if_not_exists => TRUE);
 
 CREATE INDEX IF NOT EXISTS idx_system_logs_user_time ON system_logs(user_id, time DESC);
 CREATE INDEX IF NOT EXISTS idx_system_logs_gateway_time ON system_logs(gateway_id, time DESC);
@@ -173,18 +215,58 @@ CREATE TABLE command_logs (
     metadata JSONB
 );
 
-SELECT create_hypertable('command_logs', 'time', if_not_exists => TRUE);
+SELECT create_hypertable('command_logs', 'time',
+    chunk_time_interval => INTERVAL '7 days', if_not_exists => TRUE);
 
 CREATE INDEX IF NOT EXISTS idx_command_logs_device_time ON command_logs(device_id, time DESC);
 CREATE INDEX IF NOT EXISTS idx_command_logs_status ON command_logs(status);
 CREATE INDEX IF NOT EXISTS idx_command_logs_command_id ON command_logs(command_id);
 
+-- ============================================================================
+-- COMPRESSION (columnar storage for cold chunks)
+-- ============================================================================
+-- Segmented by the columns every query filters on, so reads of one user's or
+-- device's history decompress only that segment; ordered newest first like the
+-- dashboards read. Log chunks compress once they are past the 7-day window in
+-- which gateway backlogs arrive; raw telemetry is only kept for that window, so
+-- it compresses after 2 days (late rows still insert into compressed chunks).
+
+ALTER TABLE telemetry SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'user_id, device_id',
+    timescaledb.compress_orderby = 'time DESC'
+);
+SELECT add_compression_policy('telemetry', INTERVAL '2 days', if_not_exists => TRUE);
+
+ALTER TABLE access_logs SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'user_id, device_id',
+    timescaledb.compress_orderby = 'time DESC'
+);
+SELECT add_compression_policy('access_logs', INTERVAL '7 days', if_not_exists => TRUE);
+
+-- device_id is NULL for gateway-level logs; everything reads them by user
+ALTER TABLE system_logs SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'user_id',
+    timescaledb.compress_orderby = 'time DESC'
+);
+SELECT add_compression_policy('system_logs', INTERVAL '7 days', if_not_exists => TRUE);
+
+ALTER TABLE command_logs SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'device_id',
+    timescaledb.compress_orderby = 'time DESC'
+);
+SELECT add_compression_policy('command_logs', INTERVAL '7 days', if_not_exists => TRUE);
+
 -- ============================================================================
 -- RETENTION POLICIES (Auto-cleanup old data)
 -- ============================================================================
 
--- Keep telemetry data for 90 days
-SELECT add_retention_policy('telemetry', INTERVAL '90 days', if_not_exists => TRUE);
+-- Keep raw telemetry for 7 days; older history lives in the rollups below
+-- (1-minute for 90 days, hourly and daily indefinitely)
+SELECT add_retention_policy('telemetry', INTERVAL '7 days', if_not_exists => TRUE);
 
 -- Keep access logs for 180 days (6 months)
 SELECT add_retention_policy('access_logs', INTERVAL '180 days', if_not_exists => TRUE);
@@ -195,6 +277,210 @@ SELECT add_retention_policy('system_logs', INTERVAL '90 days', if_not_exists =>
 -- Keep command logs for 30 days
 SELECT add_retention_policy('command_logs', INTERVAL '30 days', if_not_exists => TRUE);
 
+-- ============================================================================
+-- CONTINUOUS AGGREGATES (telemetry rollups for charts)
+-- ============================================================================
+-- Built straight from telemetry (not stacked) so averages stay exact. Counts are
+-- kept per metric so coarser buckets can be re-aggregated as weighted averages.
+-- materialized_only = false adds the not-yet-materialized tail from raw rows.
+-- Refresh windows reach back past typical gateway/spool backlogs; only
+-- invalidated buckets are recomputed, so the wide window is cheap. They must
+-- stay within the 7-day raw retention: refreshing a range whose raw chunks were
+-- dropped empties it, so never refresh these over the full range once
+-- retention has run.
+
+-- Chart resolution up to a few hours
+CREATE MATERIALIZED VIEW IF NOT EXISTS telemetry_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 minute', time) AS bucket,
+    user_id,
+    device_id,
+    AVG(temperature) AS avg_temperature,
+    MIN(temperature) AS min_temperature,
+    MAX(temperature) AS max_temperature,
+    COUNT(temperature) AS temperature_count,
+    AVG(humidity) AS avg_humidity,
+    MIN(humidity) AS min_humidity,
+    MAX(humidity) AS max_humidity,
+    COUNT(humidity) AS humidity_count,
+    COUNT(*) AS sample_count
+FROM telemetry
+GROUP BY bucket, user_id, device_id
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_telemetry_1m_device_bucket ON telemetry_1m(device_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('telemetry_1m',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 minute',
+    schedule_interval => INTERVAL '1 minute',
+    if_not_exists => TRUE);
+
+-- Day/week charts
+CREATE MATERIALIZED VIEW IF NOT EXISTS telemetry_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', time) AS bucket,
+    user_id,
+    device_id,
+    AVG(temperature) AS avg_temperature,
+    MIN(temperature) AS min_temperature,
+    MAX(temperature) AS max_temperature,
+    COUNT(temperature) AS temperature_count,
+    AVG(humidity) AS avg_humidity,
+    MIN(humidity) AS min_humidity,
+    MAX(humidity) AS max_humidity,
+    COUNT(humidity) AS humidity_count,
+    COUNT(*) AS sample_count
+FROM telemetry
+GROUP BY bucket, user_id, device_id
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_telemetry_1h_device_bucket ON telemetry_1h(device_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('telemetry_1h',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
+
+-- Month and longer ranges, in local days (the database timezone)
+CREATE MATERIALIZED VIEW IF NOT EXISTS telemetry_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 day', time, 'Asia/Ho_Chi_Minh') AS bucket,
+    user_id,
+    device_id,
+    AVG(temperature) AS avg_temperature,
+    MIN(temperature) AS min_temperature,
+    MAX(temperature) AS max_temperature,
+    COUNT(temperature) AS temperature_count,
+    AVG(humidity) AS avg_humidity,
+    MIN(humidity) AS min_humidity,
+    MAX(humidity) AS max_humidity,
+    COUNT(humidity) AS humidity_count,
+    COUNT(*) AS sample_count
+FROM telemetry
+GROUP BY bucket, user_id, device_id
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_telemetry_1d_device_bucket ON telemetry_1d(device_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('telemetry_1d',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
+-- Tiered retention: 1-minute rollups for 90 days, hourly and daily indefinitely.
+-- Rollups compress once they are past their refresh window.
+SELECT add_retention_policy('telemetry_1m', INTERVAL '90 days', if_not_exists => TRUE);
+
+ALTER MATERIALIZED VIEW telemetry_1m SET (timescaledb.compress = true);
+SELECT add_compression_policy('telemetry_1m', compress_after => INTERVAL '14 days', if_not_exists => TRUE);
+
+ALTER MATERIALIZED VIEW telemetry_1h SET (timescaledb.compress = true);
+SELECT add_compression_policy('telemetry_1h', compress_after => INTERVAL '30 days', if_not_exists => TRUE);
+
+ALTER MATERIALIZED VIEW telemetry_1d SET (timescaledb.compress = true);
+SELECT add_compression_policy('telemetry_1d', compress_after => INTERVAL '30 days', if_not_exists => TRUE);
+
+-- ============================================================================
+-- CONTINUOUS AGGREGATES (access and alert counts for dashboard statistics)
+-- ============================================================================
+-- Dashboard/system stats sum these instead of counting raw rows, so page load
+-- cost follows the number of buckets rather than the amount of history.
+-- materialized_only = false merges the open bucket from raw rows.
+
+-- Last-24h counters
+CREATE MATERIALIZED VIEW IF NOT EXISTS access_logs_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', time) AS bucket,
+    user_id,
+    device_id,
+    method,
+    result,
+    COUNT(*) AS attempts
+FROM access_logs
+GROUP BY bucket, user_id, device_id, method, result
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_access_logs_1h_user_bucket ON access_logs_1h(user_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('access_logs_1h',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
+
+-- Access-by-day charts, in local days (the database timezone)
+CREATE MATERIALIZED VIEW IF NOT EXISTS access_logs_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 day', time, 'Asia/Ho_Chi_Minh') AS bucket,
+    user_id,
+    device_id,
+    method,
+    result,
+    COUNT(*) AS attempts
+FROM access_logs
+GROUP BY bucket, user_id, device_id, method, result
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_access_logs_1d_user_bucket ON access_logs_1d(user_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('access_logs_1d',
+    start_offset => INTERVAL '30 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
+-- Last-24h alert counter
+CREATE MATERIALIZED VIEW IF NOT EXISTS system_alerts_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', time) AS bucket,
+    user_id,
+    event,
+    severity,
+    COUNT(*) AS alert_count
+FROM system_logs
+WHERE log_type = 'alert'
+GROUP BY bucket, user_id, event, severity
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_system_alerts_1h_user_bucket ON system_alerts_1h(user_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('system_alerts_1h',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
+
+-- Alerts-by-type over 30 days
+CREATE MATERIALIZED VIEW IF NOT EXISTS system_alerts_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 day', time, 'Asia/Ho_Chi_Minh') AS bucket,
+    user_id,
+    event,
+    severity,
+    COUNT(*) AS alert_count
+FROM system_logs
+WHERE log_type = 'alert'
+GROUP BY bucket, user_id, event, severity
+WITH NO DATA;
+
+CREATE INDEX IF NOT EXISTS idx_system_alerts_1d_user_bucket ON system_alerts_1d(user_id, bucket DESC);
+
+SELECT add_continuous_aggregate_policy('system_alerts_1d',
+    start_offset => INTERVAL '30 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
 -- ============================================================================
 -- VIEWS FOR COMMON QUERIES
 -- ============================================================================
@@ -455,4 +741,33 @@ FROM GENERATE_SERIES(
     '2025-11-06 23:00:00+07'::TIMESTAMPTZ,
     '4 hours'::INTERVAL * RANDOM()
 ) gs
-LIMIT 50;
\ No newline at end of file
+LIMIT 50;
+
+-- ========================================================================
+-- Materialize the seeded history (older than the refresh policies' windows)
+-- ========================================================================
+CALL refresh_continuous_aggregate('telemetry_1m', NULL, NULL);
+CALL refresh_continuous_aggregate('telemetry_1h', NULL, NULL);
+CALL refresh_continuous_aggregate('telemetry_1d', NULL, NULL);
+CALL refresh_continuous_aggregate('access_logs_1h', NULL, NULL);
+CALL refresh_continuous_aggregate('access_logs_1d', NULL, NULL);
+CALL refresh_continuous_aggregate('system_alerts_1h', NULL, NULL);
+CALL refresh_continuous_aggregate('system_alerts_1d', NULL, NULL);
+
+-- Seed telemetry_latest from the history above
+INSERT INTO telemetry_latest (device_id, gateway_id, user_id, time, temperature, temperature_time, humidity, humidity_time)
+SELECT latest.device_id, latest.gateway_id, latest.user_id, latest.time,
+       temp.temperature, temp.time, hum.humidity, hum.time
+FROM (
+    SELECT DISTINCT ON (device_id) device_id, gateway_id, user_id, time
+    FROM telemetry ORDER BY device_id, time DESC
+) latest
+LEFT JOIN (
+    SELECT DISTINCT ON (device_id) device_id, temperature, time
+    FROM telemetry WHERE temperature IS NOT NULL ORDER BY device_id, time DESC
+) temp USING (device_id)
+LEFT JOIN (
+    SELECT DISTINCT ON (device_id) device_id, humidity, time
+    FROM telemetry WHERE humidity IS NOT NULL ORDER BY device_id, time DESC
+) hum USING (device_id)
+ON CONFLICT (device_id) DO NOTHING;
@@ -4,6 +4,9 @@ from ..utils.helpers import now_iso
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
+# Target number of points in the temperature chart
+CHART_POINTS = 300
+
 
 @dashboard_bp.get("/overview")
 def overview_dashboard():
@@ -69,23 +72,39 @@ def temperature_chart():
     
         device_id = dev_row["device_id"]
 
-    # 2️⃣ Lấy dữ liệu theo khoảng thời gian
+    # 2️⃣ Chart: ~CHART_POINTS buckets from the continuous aggregates (not every raw row)
+    step_minutes = max(1, -(-hours * 60 // CHART_POINTS))
+    if step_minutes >= 60:
+        step_minutes = -(-step_minutes // 60) * 60
+        source = "telemetry_1h"
+    else:
+        source = "telemetry_1m"
+
     cur.execute(f"""
-        SELECT time, temperature, humidity
-        FROM telemetry
+        SELECT time_bucket(make_interval(mins => %s), bucket) AS time,
+               SUM(avg_temperature * temperature_count) / NULLIF(SUM(temperature_count), 0) AS temperature,
+               SUM(avg_humidity * humidity_count) / NULLIF(SUM(humidity_count), 0) AS humidity
+        FROM {source}
         WHERE device_id = %s
-          AND time >= NOW() - INTERVAL '{hours} hours'
-        ORDER BY time ASC
-    """, (device_id,))
+          AND bucket >= NOW() - make_interval(hours => %s)
+        GROUP BY 1
+        ORDER BY 1 ASC
+    """, (step_minutes, device_id, hours))
     rows = cur.fetchall()
 
-    if not rows:
+    # Latest reading from the per-device table the API keeps on ingest
+    cur.execute("""
+        SELECT time, temperature, humidity
+        FROM telemetry_latest
+        WHERE device_id = %s
+          AND time >= NOW() - make_interval(hours => %s)
+    """, (device_id, hours))
+    latest = cur.fetchone()
+
+    if not rows or not latest:
         conn.close()
         return jsonify({"ok": False, "error": "no_data"}), 404
 
-
-    # Latest reading is the last record (most recent)
-    latest = rows[-1]
     latest_temp = latest["temperature"]
     latest_hum = latest["humidity"]
     latest_time = latest["time"]